@@ -0,0 +1,53 @@
+"""
+Python-side overhead of a ContractWrapper call, without any RPC.
+
+Compares resolving a contract function the way the wrapper used to (a new Contract
+per call plus a linear scan of all_functions()) with the current wrapper.
+
+    python -m benchmarks.contract_overhead [--number 2000]
+"""
+import argparse
+import timeit
+
+from web3 import Web3
+
+from contracts_api import ContractWrapper, load_contract_data
+
+PRIVATE_KEY = 'a3d3eb24d66c13a91f085e8431526540c243f88d147613a24edb05110d732a6a'
+ADDRESSES = [Web3.toChecksumAddress(f'0x{index:040x}') for index in range(1, 9)]
+FUNCTIONS = ('state', 'sent', 'confirmReceived', 'refund')
+
+
+def legacy(w3: Web3, contract_data: dict):
+    for address in ADDRESSES:
+        contract = w3.eth.contract(abi=contract_data['abi'], bytecode=contract_data['bytecode'], address=address)
+        for function_name in FUNCTIONS:
+            if function_name in list(map(lambda x: x.fn_name, contract.all_functions())):
+                contract.get_function_by_name(function_name)()
+
+
+def current(wrapper: ContractWrapper):
+    for address in ADDRESSES:
+        contract = wrapper.get_contract(address)
+        for function_name in FUNCTIONS:
+            if wrapper._function_check(function_name):
+                contract.functions[function_name]()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200, help='repetitions of every case')
+    args = parser.parse_args()
+
+    w3 = Web3()
+    wrapper = ContractWrapper('', PRIVATE_KEY, w3=w3)
+    contract_data = load_contract_data()
+
+    calls = len(ADDRESSES) * len(FUNCTIONS)
+    for name, case in (('legacy', lambda: legacy(w3, contract_data)), ('current', lambda: current(wrapper))):
+        seconds = min(timeit.repeat(case, number=args.number, repeat=3))
+        print(f'{name:>8}: {seconds / args.number / calls * 1e6:8.1f} us per resolved function call')
+
+
+if __name__ == '__main__':
+    main()
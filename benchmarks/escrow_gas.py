@@ -0,0 +1,91 @@
+"""
+Gas report of the escrow contract on the in-process test chain (needs eth-tester).
+
+Deploys the escrow of a truffle artifact and runs every lifecycle (confirm, refund, no_refund)
+once, reporting the gas used by the constructor and each function. Reports are written to a
+JSON file; pass the report of another build, or the truffle artifact of another build, with
+--compare to print the difference. An artifact is measured in the same run:
+
+    python -m benchmarks.escrow_gas [--artifact truffle/Contract.json] [--output gas.json]
+                                    [--compare Contract.before.json] [--problem-length 64]
+"""
+import argparse
+import json
+import pathlib
+from typing import Dict
+
+from web3 import Web3
+
+from contracts_api.artifact import CONTRACT_PATH
+from contracts_api.providers import TestChain
+
+LIFECYCLES = {
+    'confirm': ('sent', 'confirmReceived'),
+    'refund': ('sent', 'problem', 'refund'),
+    'no_refund': ('sent', 'problem', 'no_refund'),
+}
+ESCROW_VALUE = Web3.toWei(1, 'ether')
+
+
+def measure(artifact: pathlib.Path, problem_length: int) -> Dict[str, int]:
+    with open(artifact) as input_file:
+        contract_data = json.load(input_file)
+
+    chain = TestChain()
+    w3 = chain.w3
+    buyer, seller, solver = chain.accounts[:3]
+    senders = {'sent': seller, 'confirmReceived': buyer, 'problem': buyer, 'refund': solver, 'no_refund': solver}
+    factory = w3.eth.contract(abi=contract_data['abi'], bytecode=contract_data['bytecode'])
+
+    gas = {}
+    for lifecycle, functions in LIFECYCLES.items():
+        tx_hash = factory.constructor(seller, solver, '1').transact({'from': buyer, 'value': ESCROW_VALUE})
+        receipt = w3.eth.waitForTransactionReceipt(tx_hash)
+        gas['constructor'] = receipt['gasUsed']
+
+        escrow = factory(address=receipt['contractAddress'])
+        for name in functions:
+            args = ['x' * problem_length] if name == 'problem' else []
+            tx_hash = escrow.functions[name](*args).transact({'from': senders[name]})
+            receipt = w3.eth.waitForTransactionReceipt(tx_hash)
+            if receipt['status'] != 1:
+                raise RuntimeError(f"'{name}' of the {lifecycle} lifecycle reverted")
+            gas[name] = receipt['gasUsed']
+
+    return gas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--artifact', type=pathlib.Path, default=CONTRACT_PATH, help='truffle artifact of Escrow')
+    parser.add_argument('--output', default='escrow-gas.json')
+    parser.add_argument('--compare', help='report or truffle artifact of another build to compare with')
+    parser.add_argument('--problem-length', type=int, default=64, help='length of the problem description')
+    args = parser.parse_args()
+
+    gas = measure(args.artifact, args.problem_length)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({'artifact': str(args.artifact), 'problem_length': args.problem_length, 'gas': gas},
+                  output_file, indent=2)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as input_file:
+            compared = json.load(input_file)
+        # a report of an earlier run, or the truffle artifact of another build to measure now
+        baseline = compared['gas'] if 'gas' in compared else measure(pathlib.Path(args.compare), args.problem_length)
+
+    if baseline and baseline == gas:
+        print(f'{args.artifact} and {args.compare} use the same gas, is the artifact rebuilt (truffle compile)?')
+
+    print(f"{'function':<16}{'gas':>10}" + (f"{'before':>10}{'change':>9}" if baseline else ''))
+    for name, used in gas.items():
+        line = f'{name:<16}{used:>10}'
+        if name in baseline:
+            line += f'{baseline[name]:>10}{(used - baseline[name]) / baseline[name]:>+9.1%}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Escrow lifecycles on the in-process test chain (needs eth-tester, see contracts_api/README.md).
+
+Drives create -> sent -> confirmReceived and create -> sent -> problem -> refund / no_refund
+through ContractWrapper ("wrapper") or the Celery tasks of catalogue/tasks.py ("tasks", run
+in-process against a throwaway test database), with N escrows in flight at once. Reports latency
+percentiles and RPC requests per operation, lifecycles per second and peak traced memory, and
+writes everything to a JSON file to compare releases.
+
+    python -m benchmarks.escrow_lifecycle [--driver wrapper tasks] [--escrows 20] [--concurrency 1 8]
+                                          [--output benchmark.json] [--settings smartcontract.settings]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import web3
+
+LIFECYCLES = {
+    'confirm': ('create', 'send', 'confirm'),
+    'refund': ('create', 'send', 'problem', 'refund'),
+    'no_refund': ('create', 'send', 'problem', 'no_refund'),
+}
+ESCROW_VALUE = 1000
+
+
+def percentile(values: List[float], percent: int) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+class Recorder:
+    """Latencies and RPC requests per operation, attributed to the operation running on the calling thread."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.requests: Dict[str, Counter] = defaultdict(Counter)
+
+    def middleware(self, make_request: Callable, w3: web3.Web3) -> Callable:
+        def count(method, params):
+            operation = getattr(self._local, 'operation', None)
+            if operation is not None:
+                with self._lock:
+                    self.requests[operation][method] += 1
+            return make_request(method, params)
+
+        return count
+
+    @contextmanager
+    def measure(self, operation: str):
+        self._local.operation = operation
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._local.operation = None
+            with self._lock:
+                self.latencies[operation].append(elapsed)
+
+    def report(self) -> Dict[str, dict]:
+        report = {}
+        for operation, latencies in self.latencies.items():
+            requests = self.requests[operation]
+            report[operation] = {
+                'count': len(latencies),
+                'mean_ms': statistics.mean(latencies) * 1e3,
+                'p50_ms': percentile(latencies, 50) * 1e3,
+                'p90_ms': percentile(latencies, 90) * 1e3,
+                'p99_ms': percentile(latencies, 99) * 1e3,
+                'rpc_per_operation': sum(requests.values()) / len(latencies),
+                'rpc_methods': {method: count / len(latencies) for method, count in sorted(requests.items())},
+            }
+        return report
+
+
+class WrapperDriver:
+    """Lifecycle steps as ContractWrapper calls of the buyer, seller and solver of the test chain."""
+    name = 'wrapper'
+
+    def __init__(self, chain, recorder: Recorder) -> None:
+        from contracts_api import ContractWrapperPool, LocalNonceManager
+
+        self._chain = chain
+        self._pool = ContractWrapperPool('', provider_backend='tester', nonce_manager=LocalNonceManager())
+        self._pool.get_w3().middleware_onion.add(recorder.middleware, 'benchmark_recorder')
+        self._buyer, self._seller, self._solver = (self._pool.get(key) for key in chain.private_keys[:3])
+
+    def start(self, index: int) -> dict:
+        return {'item_id': str(index)}
+
+    def create(self, escrow: dict) -> None:
+        result = self._buyer.create(self._chain.accounts[1], self._chain.accounts[2], ESCROW_VALUE, escrow['item_id'])
+        escrow['address'] = result['receipt']['contractAddress']
+
+    def send(self, escrow: dict) -> None:
+        self._seller.send(escrow['address'])
+
+    def confirm(self, escrow: dict) -> None:
+        self._buyer.confirm(escrow['address'])
+
+    def problem(self, escrow: dict) -> None:
+        self._buyer.build(escrow['address'], 'problem', 'description')
+
+    def refund(self, escrow: dict) -> None:
+        self._solver.build(escrow['address'], 'refund')
+
+    def no_refund(self, escrow: dict) -> None:
+        self._solver.build(escrow['address'], 'no_refund')
+
+    def close(self) -> None:
+        self._pool.reset()
+
+
+class TaskDriver:
+    """Lifecycle steps as the catalogue Celery tasks, applied in-process on products of a test database."""
+    name = 'tasks'
+
+    def __init__(self, chain, recorder: Recorder) -> None:
+        from django.db import connection
+
+        from accounts.models import User
+        from catalogue import tasks
+
+        self._tasks = tasks
+        self._connection = connection
+        self._old_database = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # a shared in-memory database locks whole tables, concurrent tasks need a file
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+        tasks.get_pool().get_w3().middleware_onion.add(recorder.middleware, 'benchmark_recorder')
+
+        self._users = [
+            User.objects.create_user(f'{role}@benchmark.local', role, 'Benchmark', 'benchmark',
+                                     escrow_hash=address, private_hash=key)
+            for role, address, key in zip(('buyer', 'seller', 'solver'), chain.accounts, chain.private_keys)
+        ]
+
+    def start(self, index: int) -> dict:
+        from catalogue.models import Product
+
+        buyer, seller, solver = self._users
+        product = Product.objects.create(name=f'Benchmark {index}', price=ESCROW_VALUE, owner=seller, buyer=buyer,
+                                         final_solver=solver)
+        return {'product_id': product.id}
+
+    def _apply(self, task, *args) -> None:
+        result = task.apply(args=args)
+        result.get(propagate=True)
+
+    def _address(self, escrow: dict) -> str:
+        from catalogue.models import Product
+
+        return Product.objects.values_list('contract_address', flat=True).get(id=escrow['product_id'])
+
+    def create(self, escrow: dict) -> None:
+        buyer, seller, solver = self._users
+        self._apply(self._tasks.submit_new_smart_contract, seller.escrow_hash, solver.escrow_hash,
+                    buyer.private_hash, ESCROW_VALUE, escrow['product_id'])
+
+    def send(self, escrow: dict) -> None:
+        self._apply(self._tasks.send_product, self._users[1].private_hash, self._address(escrow), escrow['product_id'])
+
+    def confirm(self, escrow: dict) -> None:
+        self._apply(self._tasks.receive_product, self._users[0].private_hash, self._address(escrow),
+                    escrow['product_id'])
+
+    def problem(self, escrow: dict) -> None:
+        self._apply(self._tasks.problem, self._users[0].private_hash, self._address(escrow), escrow['product_id'])
+
+    def refund(self, escrow: dict) -> None:
+        self._apply(self._tasks.refund, self._users[2].private_hash, self._address(escrow), escrow['product_id'])
+
+    def no_refund(self, escrow: dict) -> None:
+        self._apply(self._tasks.no_refund, self._users[2].private_hash, self._address(escrow), escrow['product_id'])
+
+    def close(self) -> None:
+        self._tasks.get_pool().reset()
+        self._connection.creation.destroy_test_db(self._old_database, verbosity=0)
+
+
+def run_lifecycles(driver, recorder: Recorder, lifecycle: str, escrows: int, concurrency: int) -> dict:
+    def run_one(index: int) -> None:
+        escrow = driver.start(index)
+        for operation in LIFECYCLES[lifecycle]:
+            with recorder.measure(operation):
+                getattr(driver, operation)(escrow)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(run_one, index) for index in range(escrows)]:
+            future.result()
+    seconds = time.perf_counter() - started
+
+    return {
+        'seconds': seconds,
+        'lifecycles_per_second': escrows / seconds,
+    }
+
+
+def peak_memory(driver, recorder: Recorder, lifecycle: str, escrows: int, concurrency: int) -> int:
+    """Peak of memory allocated by Python while the lifecycles run, measured in a separate (slower) pass."""
+    tracemalloc.start()
+    try:
+        run_lifecycles(driver, recorder, lifecycle, escrows, concurrency)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--driver', nargs='+', choices=('wrapper', 'tasks'), default=['wrapper', 'tasks'])
+    parser.add_argument('--lifecycle', nargs='+', choices=tuple(LIFECYCLES), default=list(LIFECYCLES))
+    parser.add_argument('--escrows', type=int, default=20, help='lifecycles per run')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8], help='escrows in flight at once')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--settings', default='smartcontract.settings', help='Django settings of the tasks driver')
+    args = parser.parse_args()
+
+    # the tasks connect to the test chain, allocate nonces and cache escrow fields in-process
+    os.environ['CONTRACT_PROVIDER'] = 'tester'
+    os.environ['NONCE_REDIS_URL'] = ''
+    os.environ['ESCROW_FIELD_CACHE_REDIS_URL'] = ''
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', args.settings)
+
+    from contracts_api import get_test_chain
+
+    chain = get_test_chain()
+    results = []
+
+    for driver_name in args.driver:
+        if driver_name == 'tasks':
+            import django
+            django.setup()
+
+        recorder = Recorder()
+        driver = (WrapperDriver if driver_name == 'wrapper' else TaskDriver)(chain, recorder)
+
+        try:
+            for lifecycle in args.lifecycle:
+                for concurrency in args.concurrency:
+                    recorder.reset()
+                    result = run_lifecycles(driver, recorder, lifecycle, args.escrows, concurrency)
+                    result.update({
+                        'driver': driver_name,
+                        'lifecycle': lifecycle,
+                        'escrows': args.escrows,
+                        'concurrency': concurrency,
+                        'operations': recorder.report(),
+                    })
+                    result['peak_traced_bytes'] = peak_memory(driver, recorder, lifecycle, args.escrows, concurrency)
+                    results.append(result)
+
+                    print(f"{driver_name:>8} {lifecycle:>10} x{concurrency:<3}: "
+                          f"{result['lifecycles_per_second']:7.2f} lifecycles/s, "
+                          f"peak {result['peak_traced_bytes'] / 2 ** 20:6.1f} MiB")
+                    for operation, stats in result['operations'].items():
+                        print(f"{'':>26}{operation:>10}: p50 {stats['p50_ms']:7.1f} ms, "
+                              f"p99 {stats['p99_ms']:7.1f} ms, {stats['rpc_per_operation']:5.1f} rpc")
+        finally:
+            driver.close()
+
+    report = {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'web3': web3.__version__,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    print(f'Results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
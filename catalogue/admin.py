@@ -1,5 +1,7 @@
 from django.contrib import admin
 
-from catalogue.models import Product
+from catalogue.models import Product, PendingTransaction, IndexerCheckpoint
 
 admin.site.register(Product)
+admin.site.register(PendingTransaction)
+admin.site.register(IndexerCheckpoint)
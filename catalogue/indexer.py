@@ -0,0 +1,135 @@
+import logging
+import time
+
+from django.utils import timezone
+
+from catalogue.models import Product, PurchaseStatus, IndexerCheckpoint
+from contracts_api import EscrowEventScanner
+
+EVENT_STATUSES = {
+    "Sent": PurchaseStatus.SENT,
+    "ItemNotOk": PurchaseStatus.PROBLEM,
+    "Refund": PurchaseStatus.REFUND_BY_SOLVER,
+    "ItemReceived": PurchaseStatus.RECEIVED,
+}
+
+# no_refund() emits ItemReceived as well, it is told apart by the state it was called in
+NO_REFUND_FROM = (PurchaseStatus.PROBLEM, PurchaseStatus.PENDING_REFUND, PurchaseStatus.PENDING_NO_REFUND)
+
+
+class EscrowEventIndexer:
+    """
+    Moves products to the status their escrow contract reached on chain.
+
+    Events of all known escrow addresses are read in block ranges of `batch_size`
+    blocks, lagging `confirmations` blocks behind the head. Progress is stored in
+    an IndexerCheckpoint, so a restarted indexer continues where it stopped.
+    """
+
+    def __init__(self, w3, name="escrow", batch_size=1000, confirmations=2):
+        self._w3 = w3
+        self._name = name
+        self._batch_size = batch_size
+        self._confirmations = confirmations
+        self._scanner = EscrowEventScanner(w3)
+
+    def _checkpoint(self):
+        checkpoint = IndexerCheckpoint.objects.filter(name=self._name).first()
+        if checkpoint is None:
+            # nothing indexed yet: follow the chain from now on, use replay() for history
+            checkpoint = IndexerCheckpoint.objects.create(name=self._name, block_number=self._head())
+        return checkpoint
+
+    def _head(self):
+        return self._w3.eth.blockNumber - self._confirmations
+
+    def replay(self, from_block):
+        IndexerCheckpoint.objects.update_or_create(name=self._name, defaults={"block_number": from_block - 1})
+        return self.run_once()
+
+    def run_once(self):
+        """Index all blocks up to the confirmed head, returns the number of updated products."""
+        checkpoint = self._checkpoint()
+        head = self._head()
+        updated = 0
+        addresses = list(
+            Product.objects.exclude(contract_address__isnull=True).exclude(contract_address="")
+            .values_list("contract_address", flat=True)
+        )
+
+        while checkpoint.block_number < head:
+            from_block = checkpoint.block_number + 1
+            to_block = min(from_block + self._batch_size - 1, head)
+
+            if addresses:
+                events = self._scanner.scan(addresses, from_block, to_block)
+                if events:
+                    updated += self.apply(events, self._products(events))
+
+            checkpoint.block_number = to_block
+            checkpoint.save(update_fields=["block_number", "updated_at"])
+
+        return updated
+
+    def run_forever(self, interval=15):
+        while True:
+            updated = self.run_once()
+            logging.info(f"Escrow indexer updated {updated} products")
+            time.sleep(interval)
+
+    @staticmethod
+    def _products(events):
+        """Products of the escrows which emitted `events`, by lower case address."""
+        addresses = {event.address for event in events}
+        addresses |= {address.lower() for address in addresses}
+        return {
+            product.contract_address.lower(): product
+            for product in Product.objects.filter(contract_address__in=addresses)
+        }
+
+    @staticmethod
+    def _status_after(status, events):
+        for event in events:
+            if event.name == "ItemReceived" and status in NO_REFUND_FROM:
+                status = PurchaseStatus.NO_REFUND_BY_SOLVER
+            else:
+                status = EVENT_STATUSES[event.name]
+        return status
+
+    @staticmethod
+    def apply(events, products):
+        """
+        Moves `products` (by lower case address) to the status after `events`.
+
+        Every product is updated only if its status is still the one it was loaded with,
+        a product moved by a view or task meanwhile is reloaded and its events applied again.
+        """
+        product_events = {}
+
+        for event in events:
+            product = products.get(event.address.lower())
+
+            if product is None or event.name not in EVENT_STATUSES:
+                logging.info(f"Escrow indexer skipped {event.name} of {event.address}")
+                continue
+
+            product_events.setdefault(product.id, (product, []))[1].append(event)
+
+        updated = 0
+        for product, events in product_events.values():
+            for attempt in range(2):
+                status = EscrowEventIndexer._status_after(product.status, events)
+                if status == product.status:
+                    break
+
+                if Product.objects.filter(id=product.id, status=product.status).update(
+                        status=status, updated_at=timezone.now()):
+                    product.status = status
+                    updated += 1
+                    break
+
+                product.refresh_from_db(fields=["status"])
+            else:
+                logging.warning(f"Escrow indexer skipped product {product.id}, its status keeps changing")
+
+        return updated
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from catalogue.indexer import EscrowEventIndexer
+from catalogue.tasks import get_pool
+
+
+class Command(BaseCommand):
+    help = "Update product statuses from the events of their escrow contracts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from-block", type=int, help="replay events starting with this block")
+        parser.add_argument("--once", action="store_true", help="index up to the current head and exit")
+        parser.add_argument("--interval", type=float, default=15, help="seconds between polls of the chain")
+        parser.add_argument("--batch-size", type=int, default=1000, help="blocks per eth_getLogs request")
+        parser.add_argument("--confirmations", type=int, default=2, help="blocks to stay behind the head")
+
+    def handle(self, *args, **options):
+        indexer = EscrowEventIndexer(
+            get_pool().get_w3(),
+            batch_size=options["batch_size"],
+            confirmations=options["confirmations"],
+        )
+
+        if options["from_block"] is not None:
+            updated = indexer.replay(options["from_block"])
+            self.stdout.write(f"Replayed events from block {options['from_block']}, updated {updated} products")
+
+        if options["once"]:
+            updated = indexer.run_once()
+            self.stdout.write(f"Updated {updated} products")
+        else:
+            indexer.run_forever(options["interval"])
@@ -0,0 +1,27 @@
+# Generated by Django 3.1.6 on 2026-10-18 18:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogue', '0006_auto_20210331_0522'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingTransaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tx_hash', models.CharField(max_length=66, unique=True)),
+                ('success_status', models.CharField(choices=[('new', 'NEW'), ('pending_order', 'PENDING ORDER'), ('order', 'ORDER'), ('pending_send', 'PENDING SEND'), ('sent', 'SENT'), ('pending_received', 'PENDING RECEIVED'), ('received', 'RECEIVED'), ('pending_problem', 'PENDING_PROBLEM'), ('problem', 'PROBLEM'), ('pending_refund', 'PENDING_REFUND'), ('pending_no_refund', 'PENDING_NO_REFUND'), ('refund', 'REFUND_BY_SOLVER'), ('no_refund', 'NO_REFUND_BY_SOLVER')], max_length=20)),
+                ('failure_status', models.CharField(choices=[('new', 'NEW'), ('pending_order', 'PENDING ORDER'), ('order', 'ORDER'), ('pending_send', 'PENDING SEND'), ('sent', 'SENT'), ('pending_received', 'PENDING RECEIVED'), ('received', 'RECEIVED'), ('pending_problem', 'PENDING_PROBLEM'), ('problem', 'PROBLEM'), ('pending_refund', 'PENDING_REFUND'), ('pending_no_refund', 'PENDING_NO_REFUND'), ('refund', 'REFUND_BY_SOLVER'), ('no_refund', 'NO_REFUND_BY_SOLVER')], max_length=20)),
+                ('succeeded', models.BooleanField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_transactions', to='catalogue.product')),
+            ],
+        ),
+    ]
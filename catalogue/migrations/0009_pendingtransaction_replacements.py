@@ -0,0 +1,34 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogue', '0008_indexercheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingtransaction',
+            name='signer',
+            field=models.CharField(blank=True, default='', max_length=42),
+        ),
+        migrations.AddField(
+            model_name='pendingtransaction',
+            name='transaction',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pendingtransaction',
+            name='replacement_hashes',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='pendingtransaction',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.6 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+def confirm_existing_addresses(apps, schema_editor):
+    # addresses stored before they were precomputed came from receipts
+    Product = apps.get_model('catalogue', 'Product')
+    Product.objects.exclude(contract_address__isnull=True).exclude(contract_address='').update(contract_confirmed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogue', '0009_pendingtransaction_replacements'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='contract_confirmed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(confirm_existing_addresses, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+import logging
+
 from django.db import models
+from django.utils import timezone
 
 from accounts.models import User
 
@@ -32,8 +35,81 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     contract_address = models.CharField(max_length=255, blank=True, null=True)
+    # contract_address is precomputed when the escrow is submitted and confirmed by its receipt
+    contract_confirmed = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
 
 
+class PendingTransaction(models.Model):
+    """
+    Transaction which was broadcast without waiting for its receipt.
+
+    The product moves to `success_status` once the transaction is mined successfully,
+    or to `failure_status` if it reverted. Stuck transactions are re-sent with a higher
+    gas price, the hashes of these replacements are kept in `replacement_hashes`.
+    """
+    tx_hash = models.CharField(max_length=66, unique=True)
+    signer = models.CharField(max_length=42, blank=True, default="")
+    transaction = models.JSONField(null=True, blank=True)
+    replacement_hashes = models.JSONField(default=list, blank=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="pending_transactions")
+    success_status = models.CharField(max_length=20, choices=PurchaseStatus.choices)
+    failure_status = models.CharField(max_length=20, choices=PurchaseStatus.choices)
+    succeeded = models.BooleanField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    submitted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.tx_hash
+
+    @property
+    def tx_hashes(self):
+        return [self.tx_hash, *self.replacement_hashes]
+
+    def replaced(self, transaction, tx_hash):
+        self.transaction = transaction
+        self.replacement_hashes.append(tx_hash)
+        self.submitted_at = timezone.now()
+        self.save(update_fields=["transaction", "replacement_hashes", "submitted_at"])
+
+    def resolve(self, receipt):
+        self.succeeded = receipt["status"] == 1
+        self.resolved_at = timezone.now()
+        self.save(update_fields=["succeeded", "resolved_at"])
+
+        apply_receipt(self.product, receipt, self.success_status, self.failure_status)
+
+
+def apply_receipt(product, receipt, success_status, failure_status):
+    update_fields = ["status", "updated_at"]
+
+    if receipt["status"] == 1:
+        product.status = success_status
+        if receipt.get("contractAddress"):
+            if product.contract_address and product.contract_address != receipt["contractAddress"]:
+                logging.warning(f"Escrow of product {product.id} was deployed to {receipt['contractAddress']}, "
+                                f"not to the precomputed {product.contract_address}")
+            product.contract_address = receipt["contractAddress"]
+            product.contract_confirmed = True
+            update_fields += ["contract_address", "contract_confirmed"]
+    else:
+        product.status = failure_status
+        if failure_status == PurchaseStatus.NEW and not product.contract_confirmed:
+            # the precomputed address of a failed deployment holds no escrow
+            product.contract_address = None
+            update_fields.append("contract_address")
+
+    product.save(update_fields=update_fields)
+
+
+class IndexerCheckpoint(models.Model):
+    """Last block whose escrow events were applied by a catalogue.indexer.EscrowEventIndexer."""
+    name = models.CharField(max_length=50, unique=True)
+    block_number = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.block_number}"
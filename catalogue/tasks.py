@@ -1,87 +1,390 @@
-from catalogue.models import Product, PurchaseStatus
-from contracts_api import ContractWrapper
-from smartcontract.settings import INFURA_KEY
+import glob
+import logging
+import os
+from collections import defaultdict
+from datetime import timedelta
+
+from celery.signals import worker_init
+from django.utils import timezone
+from web3 import Web3
+
+from accounts.models import User
+from catalogue.models import Product, PurchaseStatus, PendingTransaction, apply_receipt
+from contracts_api import (
+    ContractWrapper,
+    ContractWrapperPool,
+    LocalEscrowFieldCache,
+    LocalNonceManager,
+    LocalRateLimiter,
+    Metrics,
+    RedisEscrowFieldCache,
+    RedisNonceManager,
+    RedisRateLimiter,
+    TransactionSimulationException,
+    fetch_receipts,
+    get_wrapper_pool,
+    start_metrics_server,
+    transaction_function,
+)
+from smartcontract.settings import (
+    INFURA_KEY,
+    CONTRACT_PROVIDER,
+    CONTRACT_PROVIDER_URI,
+    RPC_RECORD_CASSETTE,
+    CONTRACT_METRICS,
+    CONTRACT_METRICS_PORT,
+    RPC_RATE_LIMIT,
+    RPC_RATE_LIMIT_BURST,
+    RPC_RATE_LIMIT_WAIT,
+    RPC_RATE_LIMIT_MAX_WAIT,
+    RPC_RATE_LIMIT_REDIS_URL,
+    ESCROW_FIELD_CACHE_REDIS_URL,
+    ESCROW_FIELD_CACHE_BLOCK_TTL,
+    CONTRACT_WRAPPER_POOL_SIZE,
+    CONTRACT_WRAPPER_HEALTH_CHECK_INTERVAL,
+    CONTRACT_WRAPPER_TIMEOUT,
+    NONCE_REDIS_URL,
+    ASYNC_TX_CONFIRMATION,
+    RESOLVE_RECEIPTS_BY_BLOCK,
+    CONTRACT_GAS_TIER,
+    GAS_PRICE_TTL,
+    GAS_LIMIT_MARGIN,
+    STUCK_TRANSACTION_AFTER,
+    MAX_GAS_PRICE,
+    CONTRACT_PREFLIGHT_IN_VIEWS,
+)
 from smartcontract import celery_app
 
+# without redis nonces are only consistent within one worker process
+nonce_manager = RedisNonceManager(NONCE_REDIS_URL) if NONCE_REDIS_URL else LocalNonceManager()
+
+if ESCROW_FIELD_CACHE_REDIS_URL:
+    field_cache = RedisEscrowFieldCache(ESCROW_FIELD_CACHE_REDIS_URL, block_ttl=ESCROW_FIELD_CACHE_BLOCK_TTL)
+else:
+    field_cache = LocalEscrowFieldCache()
+
+metrics = Metrics() if CONTRACT_METRICS else None
+
+if not RPC_RATE_LIMIT:
+    rate_limiter = None
+elif RPC_RATE_LIMIT_REDIS_URL:
+    rate_limiter = RedisRateLimiter(RPC_RATE_LIMIT_REDIS_URL, RPC_RATE_LIMIT, RPC_RATE_LIMIT_BURST,
+                                    max_wait=RPC_RATE_LIMIT_MAX_WAIT)
+else:
+    rate_limiter = LocalRateLimiter(RPC_RATE_LIMIT, RPC_RATE_LIMIT_BURST, max_wait=RPC_RATE_LIMIT_MAX_WAIT)
+
+
+@worker_init.connect
+def serve_metrics(**kwargs):
+    # one exporter per worker node, in its main process: pool processes come and go
+    # (worker_max_tasks_per_child), their values stay in PROMETHEUS_MULTIPROC_DIR
+    if metrics is None:
+        return
+
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        # values of a previous run of the node
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+    elif CONTRACT_METRICS_PORT:
+        logging.warning("PROMETHEUS_MULTIPROC_DIR is not set, metrics of the pool processes can't be served")
+
+    if CONTRACT_METRICS_PORT:
+        start_metrics_server(CONTRACT_METRICS_PORT, metrics)
+
+
+def get_pool() -> ContractWrapperPool:
+    return get_wrapper_pool(
+        INFURA_KEY,
+        max_size=CONTRACT_WRAPPER_POOL_SIZE,
+        timeout=CONTRACT_WRAPPER_TIMEOUT,
+        health_check_interval=CONTRACT_WRAPPER_HEALTH_CHECK_INTERVAL,
+        nonce_manager=nonce_manager,
+        resolve_receipts_by_block=RESOLVE_RECEIPTS_BY_BLOCK,
+        gas_price_ttl=GAS_PRICE_TTL,
+        gas_limit_margin=GAS_LIMIT_MARGIN,
+        stuck_after=STUCK_TRANSACTION_AFTER,
+        max_gas_price=Web3.toWei(MAX_GAS_PRICE, 'gwei'),
+        provider_backend=CONTRACT_PROVIDER,
+        provider_uri=CONTRACT_PROVIDER_URI,
+        record_rpc_to=RPC_RECORD_CASSETTE,
+        metrics=metrics,
+        rate_limiter=rate_limiter,
+        rate_limit_wait=RPC_RATE_LIMIT_WAIT,
+        field_cache=field_cache,
+    )
+
+
+def get_wrapper(private_key: str) -> ContractWrapper:
+    return get_pool().get(private_key)
+
+
+def preflight(private_key, method, *args):
+    """
+    Dry-run a wrapper transaction method (create, send, confirm, build) before queueing its task.
+
+    Returns the reason the transaction would revert, or None. Nodes which can't be reached
+    don't block the task, it simulates the transaction again before signing.
+    """
+    if not CONTRACT_PREFLIGHT_IN_VIEWS:
+        return None
+
+    try:
+        getattr(get_wrapper(private_key), method)(*args, dry_run=True)
+    except TransactionSimulationException as e:
+        return e.reason
+    except Exception as e:
+        logging.warning(f"Preflight of '{method}' could not be run: {e}")
+
+    return None
+
+
+def track_transaction(product_obj, result, success_status, failure_status):
+    """Apply the receipt right away, or leave it to confirm_pending_transactions if it is not mined yet."""
+    if result["receipt"] is None:
+        PendingTransaction.objects.create(
+            tx_hash=result["tx_hash"],
+            signer=result["transaction"]["from"],
+            transaction=result["transaction"],
+            product=product_obj,
+            success_status=success_status,
+            failure_status=failure_status,
+        )
+    else:
+        apply_receipt(product_obj, result["receipt"], success_status, failure_status)
+
 
 @celery_app.task
 def submit_new_smart_contract(seller_hash, solver_hash, buyer_private_key, price, product_id):
-    wrapper = ContractWrapper(INFURA_KEY, buyer_private_key, timeout=600)  # default timeout value is 600
+    wrapper = get_wrapper(buyer_private_key)
 
     seller_address = seller_hash
     solver_address = solver_hash
 
     product_obj = Product.objects.get(id=product_id)
 
+    def store_contract_address(result):
+        # shown (unconfirmed) while the deployment is mined
+        product_obj.contract_address = result["contract_address"]
+        product_obj.save(update_fields=["contract_address", "updated_at"])
+
     result = wrapper.create(
         seller_address,  # str
         solver_address,  # str
         int(float(price)),  # price of the product: should be int
-        str(product_id)  # product id: should be int casted to string
+        str(product_id),  # product id: should be int casted to string
+        wait=not ASYNC_TX_CONFIRMATION,
+        gas_tier=CONTRACT_GAS_TIER,
+        on_broadcast=store_contract_address
     )
-    product_obj.contract_address = result["receipt"]["contractAddress"]
-    product_obj.status = PurchaseStatus.ORDER
-    product_obj.save()
+    track_transaction(product_obj, result, PurchaseStatus.ORDER, PurchaseStatus.NEW)
 
 
 @celery_app.task
 def send_product(solver_private_hash, contract_address, product_id):
-    wrapper = ContractWrapper(INFURA_KEY, solver_private_hash, timeout=600)  # default timeout value is 600
+    wrapper = get_wrapper(solver_private_hash)
     product_obj = Product.objects.get(id=product_id)
 
     result = wrapper.send(
         contract_address,  # smart contract address: str
+        wait=not ASYNC_TX_CONFIRMATION,
+        gas_tier=CONTRACT_GAS_TIER
     )
-    product_obj.status = PurchaseStatus.SENT
-    product_obj.save()
+    track_transaction(product_obj, result, PurchaseStatus.SENT, PurchaseStatus.ORDER)
 
 
 @celery_app.task
 def receive_product(buyer_private_hash, contract_address, product_id):
-    wrapper = ContractWrapper(INFURA_KEY, buyer_private_hash, timeout=600)  # default timeout value is 600
+    wrapper = get_wrapper(buyer_private_hash)
     product_obj = Product.objects.get(id=product_id)
 
-    wrapper.confirm(
+    result = wrapper.confirm(
         contract_address,  # smart contract address: str
+        wait=not ASYNC_TX_CONFIRMATION,
+        gas_tier=CONTRACT_GAS_TIER
     )
-    product_obj.status = PurchaseStatus.RECEIVED
-    product_obj.save()
+    track_transaction(product_obj, result, PurchaseStatus.RECEIVED, PurchaseStatus.SENT)
 
 
 @celery_app.task
 def refund(solver_private_hash, contract_address, product_id):
-    wrapper = ContractWrapper(INFURA_KEY, solver_private_hash, timeout=600)  # default timeout value is 600
+    wrapper = get_wrapper(solver_private_hash)
     product_obj = Product.objects.get(id=product_id)
 
-    wrapper.build(
+    result = wrapper.build(
         contract_address,  # smart contract address: str,
-        'refund'
+        'refund',
+        wait=not ASYNC_TX_CONFIRMATION,
+        gas_tier=CONTRACT_GAS_TIER
     )
-    product_obj.status = PurchaseStatus.REFUND_BY_SOLVER
-    product_obj.save()
+    track_transaction(product_obj, result, PurchaseStatus.REFUND_BY_SOLVER, PurchaseStatus.PROBLEM)
 
 
 @celery_app.task
 def no_refund(solver_private_hash, contract_address, product_id):
-    wrapper = ContractWrapper(INFURA_KEY, solver_private_hash, timeout=600)  # default timeout value is 600
+    wrapper = get_wrapper(solver_private_hash)
     product_obj = Product.objects.get(id=product_id)
 
-    wrapper.build(
+    result = wrapper.build(
         contract_address,  # smart contract address: str
-        'no_refund'
+        'no_refund',
+        wait=not ASYNC_TX_CONFIRMATION,
+        gas_tier=CONTRACT_GAS_TIER
     )
-    product_obj.status = PurchaseStatus.NO_REFUND_BY_SOLVER
-    product_obj.save()
+    track_transaction(product_obj, result, PurchaseStatus.NO_REFUND_BY_SOLVER, PurchaseStatus.PROBLEM)
 
 
 @celery_app.task
 def problem(buyer_private_hash, contract_address, product_id):
-    wrapper = ContractWrapper(INFURA_KEY, buyer_private_hash, timeout=600)  # default timeout value is 600
+    wrapper = get_wrapper(buyer_private_hash)
     product_obj = Product.objects.get(id=product_id)
 
-    wrapper.build(
+    result = wrapper.build(
         contract_address,  # smart contract address: str
-        'problem', 'description'
+        'problem', 'description',
+        wait=not ASYNC_TX_CONFIRMATION,
+        gas_tier=CONTRACT_GAS_TIER
+    )
+    track_transaction(product_obj, result, PurchaseStatus.PROBLEM, PurchaseStatus.SENT)
+
+
+# action: (product field of the signer, wrapper method and its arguments after the escrow, success and failure status)
+TRANSITIONS = {
+    "send": ("owner", ("send",), PurchaseStatus.PENDING_SEND, PurchaseStatus.SENT, PurchaseStatus.ORDER),
+    "receive": ("buyer", ("confirm",), PurchaseStatus.PENDING_RECEIVED, PurchaseStatus.RECEIVED, PurchaseStatus.SENT),
+    "problem": ("buyer", ("build", "problem", "description"),
+                PurchaseStatus.PENDING_PROBLEM, PurchaseStatus.PROBLEM, PurchaseStatus.SENT),
+    "refund": ("final_solver", ("build", "refund"),
+               PurchaseStatus.PENDING_REFUND, PurchaseStatus.REFUND_BY_SOLVER, PurchaseStatus.PROBLEM),
+    "no_refund": ("final_solver", ("build", "no_refund"),
+                  PurchaseStatus.PENDING_NO_REFUND, PurchaseStatus.NO_REFUND_BY_SOLVER, PurchaseStatus.PROBLEM),
+}
+
+
+def _rewind(product_obj, action, pending_status, failure_status):
+    # the product may have moved on since the transition was requested, e.g. by a confirmed event
+    if product_obj.status != pending_status:
+        logging.warning(f"Transition '{action}' of product {product_obj.id} failed, "
+                        f"keeping its status {product_obj.status}")
+        return False
+
+    product_obj.status = failure_status
+    return True
+
+
+@celery_app.task
+def transition_products(transitions):
+    """
+    Submit the transactions of many (product_id, action) pairs, actions are the keys of TRANSITIONS.
+
+    Transactions are grouped by signer and broadcast back to back with sequential nonces before
+    any receipt is awaited. Products and pending transactions are written in bulk at the end.
+    """
+    products = Product.objects.select_related("owner", "buyer", "final_solver").in_bulk(
+        {product_id for product_id, _ in transitions}
+    )
+
+    by_signer = defaultdict(list)
+    for product_id, action in transitions:
+        product_obj = products.get(product_id)
+        signer = getattr(product_obj, TRANSITIONS[action][0]) if product_obj and action in TRANSITIONS else None
+        if signer is None or not signer.private_hash:
+            logging.warning(f"Transition '{action}' of product {product_id} has no signer, skipping it")
+            continue
+        by_signer[signer.private_hash].append((product_obj, action))
+
+    submitted = []
+    changed = []
+    for private_key, signer_transitions in by_signer.items():
+        wrapper = get_wrapper(private_key)
+
+        for product_obj, action in signer_transitions:
+            _, (method, *args), pending_status, _, failure_status = TRANSITIONS[action]
+            try:
+                result = getattr(wrapper, method)(
+                    product_obj.contract_address,
+                    *args,
+                    wait=False,
+                    gas_tier=CONTRACT_GAS_TIER
+                )
+            except Exception as e:
+                logging.warning(f"Transition '{action}' of product {product_obj.id} failed: {e}")
+                if _rewind(product_obj, action, pending_status, failure_status):
+                    changed.append(product_obj)
+                continue
+
+            submitted.append((wrapper, product_obj, action, result))
+
+    pending = []
+    for wrapper, product_obj, action, result in submitted:
+        _, _, pending_status, success_status, failure_status = TRANSITIONS[action]
+
+        if not ASYNC_TX_CONFIRMATION:
+            try:
+                receipt = wrapper.wait(result)
+            except Exception as e:
+                # still pending, confirm_pending_transactions picks it up
+                logging.warning(f"Receipt of transition '{action}' of product {product_obj.id} is unknown: {e}")
+            else:
+                if receipt["status"] == 1:
+                    product_obj.status = success_status
+                    changed.append(product_obj)
+                elif _rewind(product_obj, action, pending_status, failure_status):
+                    changed.append(product_obj)
+                continue
+
+        pending.append(PendingTransaction(
+            tx_hash=result["tx_hash"],
+            signer=result["transaction"]["from"],
+            transaction=result["transaction"],
+            product=product_obj,
+            success_status=success_status,
+            failure_status=failure_status,
+        ))
+
+    PendingTransaction.objects.bulk_create(pending)
+
+    # bulk_update skips auto_now
+    now = timezone.now()
+    for product_obj in changed:
+        product_obj.updated_at = now
+    Product.objects.bulk_update(changed, ["status", "updated_at"])
+
+
+@celery_app.task
+def confirm_pending_transactions():
+    pending_transactions = list(PendingTransaction.objects.filter(resolved_at__isnull=True).select_related("product"))
+    if not pending_transactions:
+        return
+
+    receipts = fetch_receipts(
+        get_pool().get_w3(),
+        [tx_hash for pending in pending_transactions for tx_hash in pending.tx_hashes]
     )
-    product_obj.status = PurchaseStatus.PROBLEM
-    product_obj.save()
\ No newline at end of file
+
+    stuck_before = timezone.now() - timedelta(seconds=STUCK_TRANSACTION_AFTER)
+
+    for pending in pending_transactions:
+        receipt = next((receipts[tx_hash] for tx_hash in pending.tx_hashes if receipts.get(tx_hash)), None)
+        if receipt is not None:
+            pending.resolve(receipt)
+            if metrics is not None and pending.transaction:
+                metrics.observe_receipt(
+                    transaction_function(pending.transaction),
+                    (pending.resolved_at - pending.created_at).total_seconds(),
+                    receipt
+                )
+        elif pending.transaction and pending.submitted_at <= stuck_before:
+            replace_stuck_transaction(pending)
+
+
+def replace_stuck_transaction(pending):
+    """Re-send a pending transaction with the same nonce and a higher gas price."""
+    signer = User.objects.filter(escrow_hash__iexact=pending.signer).exclude(private_hash="").first()
+    if signer is None:
+        return
+
+    replacement = get_wrapper(signer.private_hash).replace_transaction(pending.transaction)
+    if replacement is not None:
+        pending.replaced(*replacement)
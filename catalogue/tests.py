@@ -1,3 +1,340 @@
+import signal
+from datetime import timedelta
+from unittest.mock import patch, MagicMock
+
 from django.test import TestCase
+from django.utils import timezone
+from web3.exceptions import TimeExhausted
+
+from accounts.models import User
+from catalogue import tasks
+from catalogue.indexer import EscrowEventIndexer
+from catalogue.models import Product, PurchaseStatus, PendingTransaction, IndexerCheckpoint
+from contracts_api import EscrowEvent, TransactionSimulationException
+from smartcontract.celery import app
+from smartcontract.worker import run_worker_nodes, worker_argv
+
+CONTRACT_ADDRESS = '0xAC4Ec8a1d878923388395381BDA9FC2E7760b6c0'
+SIGNER_ADDRESS = '0xE4EAB7DAa6582307118DD8b415a385A763A45eFA'
+
+
+class ContractTaskTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller@mail.com', 'John', 'Doe', 'test')
+        self.product = Product.objects.create(
+            name='Book', price=100, owner=self.seller, status=PurchaseStatus.PENDING_SEND,
+            contract_address=CONTRACT_ADDRESS
+        )
+
+        self.wrapper = MagicMock()
+        patcher = patch.object(tasks, 'get_wrapper', return_value=self.wrapper)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_blocking_send_applies_receipt(self):
+        self.wrapper.send.return_value = {'tx_hash': '0x01', 'receipt': {'status': 1}}
+
+        tasks.send_product('key', CONTRACT_ADDRESS, self.product.id)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, PurchaseStatus.SENT)
+        self.assertFalse(PendingTransaction.objects.exists())
+
+    def test_reverted_send_restores_previous_status(self):
+        self.wrapper.send.return_value = {'tx_hash': '0x01', 'receipt': {'status': 0}}
+
+        tasks.send_product('key', CONTRACT_ADDRESS, self.product.id)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, PurchaseStatus.ORDER)
+
+    @patch.object(tasks, 'ASYNC_TX_CONFIRMATION', True)
+    def test_async_send_is_confirmed_later(self):
+        self.wrapper.send.return_value = {
+            'tx_hash': '0x01', 'receipt': None, 'transaction': {'from': SIGNER_ADDRESS, 'nonce': 1, 'gasPrice': 10}
+        }
+
+        tasks.send_product('key', CONTRACT_ADDRESS, self.product.id)
+
+        self.wrapper.send.assert_called_once_with(CONTRACT_ADDRESS, wait=False, gas_tier='standard')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, PurchaseStatus.PENDING_SEND)
+
+        with patch.object(tasks, 'get_pool'), patch.object(tasks, 'fetch_receipts') as fetch_receipts:
+            fetch_receipts.return_value = {'0x01': None}
+            tasks.confirm_pending_transactions()
+            self.product.refresh_from_db()
+            self.assertEqual(self.product.status, PurchaseStatus.PENDING_SEND)
+
+            fetch_receipts.return_value = {'0x01': {'status': 1}}
+            tasks.confirm_pending_transactions()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, PurchaseStatus.SENT)
+        self.assertTrue(PendingTransaction.objects.get(tx_hash='0x01').succeeded)
+
+    def test_stuck_transaction_is_replaced(self):
+        self.seller.escrow_hash = SIGNER_ADDRESS.lower()
+        self.seller.private_hash = 'key'
+        self.seller.save()
+
+        transaction = {'from': SIGNER_ADDRESS, 'nonce': 1, 'gasPrice': 10}
+        PendingTransaction.objects.create(
+            tx_hash='0x01', signer=SIGNER_ADDRESS, transaction=transaction, product=self.product,
+            success_status=PurchaseStatus.SENT, failure_status=PurchaseStatus.ORDER,
+            submitted_at=timezone.now() - timedelta(seconds=tasks.STUCK_TRANSACTION_AFTER + 1)
+        )
+        self.wrapper.replace_transaction.return_value = ({**transaction, 'gasPrice': 12}, '0x02')
+
+        with patch.object(tasks, 'get_pool'), patch.object(tasks, 'fetch_receipts') as fetch_receipts:
+            fetch_receipts.return_value = {'0x01': None}
+            tasks.confirm_pending_transactions()
+
+            self.wrapper.replace_transaction.assert_called_once_with(transaction)
+            pending = PendingTransaction.objects.get(tx_hash='0x01')
+            self.assertEqual(pending.replacement_hashes, ['0x02'])
+            self.assertEqual(pending.transaction['gasPrice'], 12)
+
+            # the replacement was mined
+            fetch_receipts.return_value = {'0x01': None, '0x02': {'status': 1}}
+            tasks.confirm_pending_transactions()
+
+        self.assertEqual(fetch_receipts.call_args[0][1], ['0x01', '0x02'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, PurchaseStatus.SENT)
+
+    @patch.object(tasks, 'CONTRACT_PREFLIGHT_IN_VIEWS', True)
+    def test_preflight_reports_revert_reason(self):
+        self.wrapper.build.side_effect = TransactionSimulationException('refund', 'execution reverted')
+
+        self.assertEqual(tasks.preflight('key', 'build', CONTRACT_ADDRESS, 'refund'), 'execution reverted')
+        self.wrapper.build.assert_called_once_with(CONTRACT_ADDRESS, 'refund', dry_run=True)
+
+    @patch.object(tasks, 'CONTRACT_PREFLIGHT_IN_VIEWS', True)
+    def test_preflight_ignores_unreachable_node(self):
+        self.wrapper.send.side_effect = ConnectionError
+
+        self.assertIsNone(tasks.preflight('key', 'send', CONTRACT_ADDRESS))
+
+    @patch.object(tasks, 'ASYNC_TX_CONFIRMATION', True)
+    def test_precomputed_address_is_stored_at_submit(self):
+        product = Product.objects.create(name='Pen', price=10, owner=self.seller, status=PurchaseStatus.PENDING_ORDER)
+        result = {
+            'tx_hash': '0x02', 'receipt': None, 'contract_address': CONTRACT_ADDRESS,
+            'transaction': {'from': SIGNER_ADDRESS, 'nonce': 2, 'gasPrice': 10}
+        }
+
+        def create(*args, on_broadcast, **kwargs):
+            on_broadcast(result)
+            return result
+
+        self.wrapper.create.side_effect = create
+
+        tasks.submit_new_smart_contract(SIGNER_ADDRESS, SIGNER_ADDRESS, 'key', '10', product.id)
+
+        product.refresh_from_db()
+        self.assertEqual((product.contract_address, product.contract_confirmed), (CONTRACT_ADDRESS, False))
+
+        PendingTransaction.objects.get(tx_hash='0x02').resolve({'status': 1, 'contractAddress': CONTRACT_ADDRESS})
+        product.refresh_from_db()
+        self.assertEqual((product.status, product.contract_confirmed), (PurchaseStatus.ORDER, True))
+
+    def test_failed_deployment_clears_precomputed_address(self):
+        product = Product.objects.create(
+            name='Pen', price=10, owner=self.seller, status=PurchaseStatus.PENDING_ORDER,
+            contract_address=CONTRACT_ADDRESS
+        )
+        self.wrapper.create.return_value = {'tx_hash': '0x02', 'receipt': {'status': 0}}
+
+        tasks.submit_new_smart_contract(SIGNER_ADDRESS, SIGNER_ADDRESS, 'key', '10', product.id)
+
+        product.refresh_from_db()
+        self.assertEqual((product.status, product.contract_address), (PurchaseStatus.NEW, None))
+
+
+class TransitionProductsTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller@mail.com', 'John', 'Doe', 'test')
+        self.buyer = User.objects.create_user('buyer@mail.com', 'Jane', 'Doe', 'test')
+        for user, key in ((self.seller, 'seller-key'), (self.buyer, 'buyer-key')):
+            user.private_hash = key
+            user.save()
+
+        self.products = [
+            Product.objects.create(name=f'Book {index}', price=100, owner=self.seller, buyer=self.buyer,
+                                   status=status, contract_address=CONTRACT_ADDRESS)
+            for index, status in enumerate((PurchaseStatus.PENDING_SEND, PurchaseStatus.PENDING_SEND,
+                                            PurchaseStatus.PENDING_RECEIVED))
+        ]
+
+        self.wrappers = {'seller-key': MagicMock(), 'buyer-key': MagicMock()}
+        for key, wrapper in self.wrappers.items():
+            for method in ('send', 'confirm'):
+                getattr(wrapper, method).side_effect = self.submit(key)
+        patcher = patch.object(tasks, 'get_wrapper', side_effect=self.wrappers.__getitem__)
+        self.get_wrapper = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def submit(key):
+        nonces = iter(range(100))
+
+        def submit(address, wait, gas_tier):
+            nonce = next(nonces)
+            return {'tx_hash': f'0x{key}{nonce}', 'receipt': None, 'transaction': {'from': key, 'nonce': nonce}}
+
+        return submit
+
+    def transitions(self):
+        return [(self.products[0].id, 'send'), (self.products[2].id, 'receive'), (self.products[1].id, 'send')]
+
+    @patch.object(tasks, 'ASYNC_TX_CONFIRMATION', True)
+    def test_transactions_are_submitted_per_signer_without_waiting(self):
+        tasks.transition_products(self.transitions())
+
+        self.assertEqual(self.get_wrapper.call_count, 2)
+        self.assertEqual(self.wrappers['seller-key'].send.call_count, 2)
+        self.wrappers['buyer-key'].confirm.assert_called_once_with(CONTRACT_ADDRESS, wait=False, gas_tier='standard')
+        self.assertEqual(
+            sorted(PendingTransaction.objects.values_list('tx_hash', 'product', 'success_status')),
+            [('0xbuyer-key0', self.products[2].id, PurchaseStatus.RECEIVED),
+             ('0xseller-key0', self.products[0].id, PurchaseStatus.SENT),
+             ('0xseller-key1', self.products[1].id, PurchaseStatus.SENT)]
+        )
+
+    def test_statuses_are_written_in_bulk(self):
+        self.wrappers['seller-key'].send.side_effect = [
+            TransactionSimulationException('sent', 'execution reverted'),
+            {'tx_hash': '0x02', 'receipt': None, 'transaction': {'from': 'seller-key', 'nonce': 0}},
+        ]
+        self.wrappers['seller-key'].wait.return_value = {'status': 1}
+        self.wrappers['buyer-key'].wait.return_value = {'status': 0}
+
+        with self.assertNumQueries(2):
+            tasks.transition_products(self.transitions())
+
+        statuses = [Product.objects.get(id=product.id).status for product in self.products]
+        self.assertEqual(statuses, [PurchaseStatus.ORDER, PurchaseStatus.SENT, PurchaseStatus.SENT])
+
+    def test_failed_submit_keeps_a_product_which_moved_on(self):
+        # e.g. the send transaction of an earlier request was confirmed meanwhile
+        Product.objects.filter(id=self.products[0].id).update(status=PurchaseStatus.SENT)
+        self.wrappers['seller-key'].send.side_effect = [
+            TransactionSimulationException('sent', 'execution reverted'),
+            {'tx_hash': '0x02', 'receipt': None, 'transaction': {'from': 'seller-key', 'nonce': 0}},
+        ]
+        self.wrappers['seller-key'].wait.return_value = {'status': 1}
+        self.wrappers['buyer-key'].wait.return_value = {'status': 1}
+
+        tasks.transition_products(self.transitions())
+
+        statuses = [Product.objects.get(id=product.id).status for product in self.products]
+        self.assertEqual(statuses, [PurchaseStatus.SENT, PurchaseStatus.SENT, PurchaseStatus.RECEIVED])
+
+    def test_failed_wait_keeps_the_status_and_tracks_the_transaction(self):
+        self.wrappers['seller-key'].wait.side_effect = [TimeExhausted('not mined'), {'status': 1}]
+        self.wrappers['buyer-key'].wait.return_value = {'status': 1}
+
+        tasks.transition_products(self.transitions())
+
+        statuses = [Product.objects.get(id=product.id).status for product in self.products]
+        self.assertEqual(statuses, [PurchaseStatus.PENDING_SEND, PurchaseStatus.SENT, PurchaseStatus.RECEIVED])
+        self.assertEqual(list(PendingTransaction.objects.values_list('tx_hash', 'product', 'success_status')),
+                         [('0xseller-key0', self.products[0].id, PurchaseStatus.SENT)])
+
+
+class EscrowEventIndexerTests(TestCase):
+    def setUp(self):
+        seller = User.objects.create_user('seller@mail.com', 'John', 'Doe', 'test')
+        self.product = Product.objects.create(
+            name='Book', price=100, owner=seller, status=PurchaseStatus.ORDER, contract_address=CONTRACT_ADDRESS
+        )
+
+        self.w3 = MagicMock()
+        self.w3.eth.blockNumber = 2500
+        self.w3.eth.getLogs.return_value = []
+        self.indexer = EscrowEventIndexer(self.w3, batch_size=1000, confirmations=0)
+
+    def event(self, name, block_number):
+        return EscrowEvent(CONTRACT_ADDRESS, name, block_number, 0, '0x01')
+
+    def test_applies_events_in_order(self):
+        products = {CONTRACT_ADDRESS.lower(): self.product}
+        events = [self.event('Sent', 1), self.event('ItemNotOk', 2), self.event('ItemReceived', 3)]
+
+        self.assertEqual(EscrowEventIndexer.apply(events, products), 1)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, PurchaseStatus.NO_REFUND_BY_SOLVER)
+
+    def test_product_moved_meanwhile_is_not_overwritten(self):
+        products = {CONTRACT_ADDRESS.lower(): self.product}
+        Product.objects.filter(id=self.product.id).update(status=PurchaseStatus.PENDING_NO_REFUND)
+
+        self.assertEqual(EscrowEventIndexer.apply([self.event('ItemReceived', 1)], products), 1)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.status, PurchaseStatus.NO_REFUND_BY_SOLVER)
+
+    def test_loads_only_products_of_fetched_logs(self):
+        Product.objects.create(name='Pen', price=10, owner=self.product.owner, status=PurchaseStatus.ORDER,
+                               contract_address=SIGNER_ADDRESS)
+
+        with patch.object(self.indexer._scanner, 'scan', return_value=[self.event('Sent', 2400)]), \
+                patch.object(EscrowEventIndexer, 'apply', return_value=1) as apply:
+            IndexerCheckpoint.objects.create(name='escrow', block_number=2000)
+            self.indexer.run_once()
+
+        self.assertEqual(list(apply.call_args[0][1].values()), [self.product])
+
+    def test_starts_at_head_and_checkpoints(self):
+        self.indexer.run_once()
+        self.assertEqual(IndexerCheckpoint.objects.get(name='escrow').block_number, 2500)
+        self.w3.eth.getLogs.assert_not_called()
+
+    def test_replay_scans_block_ranges(self):
+        self.indexer.replay(1)
+
+        ranges = [(c[0][0]['fromBlock'], c[0][0]['toBlock']) for c in self.w3.eth.getLogs.call_args_list]
+        self.assertEqual(ranges, [(1, 1000), (1001, 2000), (2001, 2500)])
+        self.assertEqual(IndexerCheckpoint.objects.get(name='escrow').block_number, 2500)
+
+
+class TaskRoutingTests(TestCase):
+    def route(self, name):
+        options = app.amqp.router.route({}, name)
+        return options['queue'].name
+
+    def test_transitions_take_the_priority_lane(self):
+        self.assertEqual(self.route('catalogue.tasks.send_product'), 'priority')
+        self.assertEqual(self.route('catalogue.tasks.submit_new_smart_contract'), 'deploy')
+        self.assertEqual(self.route('accounts.tasks.send_confirmation_email'), 'email')
+
+    def test_worker_node_per_queue(self):
+        with self.settings(WORKER_QUEUE_CONCURRENCY={'priority': 4, 'transitions': 2, 'deploy': 2}):
+            argvs = [worker_argv(queue, ['--loglevel', 'debug']) for queue in ('priority', 'transitions')]
+
+            self.assertEqual([argv[argv.index('--queues') + 1] for argv in argvs], ['priority', 'transitions'])
+            self.assertEqual([argv[argv.index('--concurrency') + 1] for argv in argvs], ['4', '2'])
+            self.assertEqual([argv[argv.index('--hostname') + 1] for argv in argvs], ['priority@%h', 'transitions@%h'])
+            self.assertEqual(argvs[0][-2:], ['--loglevel', 'debug'])
+
+            with self.assertRaises(ValueError):
+                worker_argv('email')
+
+    @patch.dict('os.environ', {'PROMETHEUS_MULTIPROC_DIR': '/tmp/prometheus'})
+    def test_worker_nodes_are_stopped_together(self):
+        nodes = [MagicMock(pid=1, returncode=None), MagicMock(pid=2, returncode=None)]
+        nodes[0].poll.return_value = None
+        nodes[1].poll.side_effect = lambda: setattr(nodes[1], 'returncode', 3) or 3
+
+        with self.settings(WORKER_QUEUE_CONCURRENCY={'priority': 4, 'transitions': 2}, CONTRACT_METRICS_PORT=9100), \
+                patch('smartcontract.worker.subprocess.Popen', side_effect=nodes) as popen, \
+                patch('smartcontract.worker.signal.signal'):
+            self.assertEqual(run_worker_nodes(['priority', 'transitions']), 3)
 
-# Create your tests here.
+        self.assertEqual([call[1]['env']['PROMETHEUS_MULTIPROC_DIR'] for call in popen.call_args_list],
+                         ['/tmp/prometheus/priority', '/tmp/prometheus/transitions'])
+        self.assertEqual([call[1]['env']['CONTRACT_METRICS_PORT'] for call in popen.call_args_list], ['9100', '9101'])
+        nodes[0].send_signal.assert_called_once_with(signal.SIGTERM)
+        nodes[1].send_signal.assert_not_called()
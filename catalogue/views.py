@@ -6,7 +6,7 @@ from django.views.generic import DetailView
 from accounts.models import User
 from catalogue.forms import ProductForm, SolversForm
 from catalogue.models import Product, PurchaseStatus
-from .tasks import submit_new_smart_contract, send_product, receive_product, problem, refund, no_refund
+from .tasks import preflight, submit_new_smart_contract, send_product, receive_product, problem, refund, no_refund
 
 
 def home(request):
@@ -22,8 +22,13 @@ def product_view(request, product_id):
         if form.is_valid():
             solver = form.cleaned_data["solver"]
             solver_obj = User.objects.filter(pk=solver).first()
-            product.final_solver = solver_obj
             buyer = request.user
+            error = preflight(buyer.private_hash, "create", product.owner.escrow_hash, solver_obj.escrow_hash,
+                              int(float(product.price)), str(product.id))
+            if error:
+                messages.error(request, f"The contract can't be created: {error}")
+                return redirect(reverse("product-detail", args=[product.id]))
+            product.final_solver = solver_obj
             product.buyer = buyer
             product.status = PurchaseStatus.PENDING_ORDER
             product.save()
@@ -75,6 +80,10 @@ def create_new_sale(request):
 
 def approve_send_view(request, product_id):
     product = Product.objects.get(pk=product_id)
+    error = preflight(product.owner.private_hash, "send", product.contract_address)
+    if error:
+        messages.error(request, f"The transaction would fail: {error}")
+        return redirect(reverse("my-sales"))
     product.status = PurchaseStatus.PENDING_SEND
     product.save()
     send_product.delay(product.owner.private_hash, product.contract_address, product.id)
@@ -83,6 +92,10 @@ def approve_send_view(request, product_id):
 
 def approve_receive_view(request, product_id):
     product = Product.objects.get(pk=product_id)
+    error = preflight(product.buyer.private_hash, "confirm", product.contract_address)
+    if error:
+        messages.error(request, f"The transaction would fail: {error}")
+        return redirect(reverse("my-shopping"))
     product.status = PurchaseStatus.PENDING_RECEIVED
     product.save()
     receive_product.delay(product.buyer.private_hash, product.contract_address, product.id)
@@ -91,6 +104,10 @@ def approve_receive_view(request, product_id):
 
 def approve_error_view(request, product_id):
     product = Product.objects.get(pk=product_id)
+    error = preflight(product.buyer.private_hash, "build", product.contract_address, "problem", "description")
+    if error:
+        messages.error(request, f"The transaction would fail: {error}")
+        return redirect(reverse("my-shopping"))
     product.status = PurchaseStatus.PENDING_PROBLEM
     product.save()
     problem.delay(product.buyer.private_hash, product.contract_address, product.id)
@@ -100,6 +117,10 @@ def approve_error_view(request, product_id):
 
 def refund_view(request, product_id):
     product = Product.objects.get(pk=product_id)
+    error = preflight(request.user.private_hash, "build", product.contract_address, "refund")
+    if error:
+        messages.error(request, f"The transaction would fail: {error}")
+        return redirect(reverse("solver-page"))
     product.status = PurchaseStatus.PENDING_REFUND
     product.save()
     refund.delay(request.user.private_hash, product.contract_address, product.id)
@@ -108,6 +129,10 @@ def refund_view(request, product_id):
 
 def no_refund_view(request, product_id):
     product = Product.objects.get(pk=product_id)
+    error = preflight(request.user.private_hash, "build", product.contract_address, "no_refund")
+    if error:
+        messages.error(request, f"The transaction would fail: {error}")
+        return redirect(reverse("solver-page"))
     product.status = PurchaseStatus.PENDING_NO_REFUND
     product.save()
     no_refund.delay(request.user.private_hash, product.contract_address, product.id)
@@ -1 +1,18 @@
+from .addresses import *
+from .aio import *
+from .artifact import *
+from .balancer import *
+from .batch import *
+from .cassette import *
 from .contract_wrapper import *
+from .events import *
+from .exceptions import *
+from .fieldcache import *
+from .gas import *
+from .metrics import *
+from .nonce import *
+from .pool import *
+from .providers import *
+from .ratelimit import *
+from .receipts import *
+from .supervisor import *
@@ -0,0 +1,24 @@
+import argparse
+import logging
+import pathlib
+
+from .artifact import CONTRACT_PATH, SLIM_CONTRACT_PATH, build_artifact
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m contracts_api')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    artifact = commands.add_parser('build-artifact', help='extract abi and bytecode of the truffle artifact')
+    artifact.add_argument('source', nargs='?', type=pathlib.Path, default=CONTRACT_PATH)
+    artifact.add_argument('target', nargs='?', type=pathlib.Path, default=SLIM_CONTRACT_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == 'build-artifact':
+        build_artifact(args.source, args.target)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,11 @@
+import rlp
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+
+__all__ = [
+    'create_address'
+]
+
+
+def create_address(deployer: str, nonce: int) -> str:
+    """Checksum address of the contract which the transaction of `deployer` with `nonce` creates (CREATE)."""
+    return to_checksum_address(keccak(rlp.encode([to_canonical_address(deployer), nonce]))[12:])
@@ -0,0 +1,664 @@
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NoReturn, Sequence, Tuple, Type, Union
+
+import websockets
+from eth_account import Account
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.method_formatters import get_result_formatters
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3.contract import Contract, ContractConstructor, ContractFunction
+from web3.exceptions import TimeExhausted
+from web3.types import TxReceipt
+
+from .artifact import CONTRACT_PATH, load_contract_data, load_function_index
+from .batch import BatchRequestException
+from .exceptions import (
+    FunctionNotFoundException,
+    TransactionSimulationException,
+    W3ProviderNotConnectedException
+)
+from .gas import GAS_TIERS, GasEstimationException, GasEstimator, block_gas_prices, block_requests, tier_prices
+from .nonce import LocalNonceManager, NonceManager, is_nonce_error, is_underpriced_error
+from .supervisor import TrackedTransaction, TransactionSupervisor
+
+__all__ = [
+    'AsyncRPCClient',
+    'AsyncGasPriceOracle',
+    'AsyncContractWrapper'
+]
+
+
+class AsyncRPCClient:
+    """
+    JSON-RPC client multiplexing any number of concurrent requests over one websocket.
+
+    Responses are matched to requests by id, so callers never wait for each other's round
+    trips. At most `max_concurrency` requests (a batch counts once) are in flight at a time.
+    """
+
+    def __init__(self, endpoint_uri: str, max_concurrency: int = 64, request_timeout: float = 60) -> None:
+        self.endpoint_uri = endpoint_uri
+        self._request_timeout = request_timeout
+        self._max_concurrency = max_concurrency
+
+        # formats results the way w3.eth returns them, no provider needed
+        self._eth = Web3().eth
+        self._ids = itertools.count(1)
+        self._ws = None
+        self._reader: Union[None, asyncio.Task] = None
+        self._semaphore: Union[None, asyncio.Semaphore] = None
+        self._connect_lock: Union[None, asyncio.Lock] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._subscriptions: Dict[str, Callable[[dict], Any]] = {}
+
+    async def __aenter__(self) -> 'AsyncRPCClient':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> NoReturn:
+        await self.close()
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and self._reader is not None and not self._reader.done()
+
+    async def connect(self) -> NoReturn:
+        if self._connect_lock is None:
+            # created lazily, on the loop the client is used from
+            self._connect_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async with self._connect_lock:
+            if self.connected:
+                return
+
+            self._ws = await websockets.connect(self.endpoint_uri, max_size=None)
+            self._reader = asyncio.ensure_future(self._read(self._ws))
+
+    async def close(self) -> NoReturn:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+        self._ws = None
+        self._reader = None
+
+    async def request(self, method: str, params: Sequence) -> Any:
+        """Result of one call, formatted as w3.eth would return it. Node errors raise ValueError."""
+        response, = await self._send([{'jsonrpc': '2.0', 'method': method, 'params': list(params)}], batch=False)
+
+        if 'error' in response:
+            raise ValueError(response['error'])
+
+        return self._format(method, response.get('result'))
+
+    async def batch(self, calls: Sequence[Tuple[str, Sequence]]) -> List[Any]:
+        """Same as contracts_api.make_batch_request, as one websocket message."""
+        if not calls:
+            return []
+
+        payload = [{'jsonrpc': '2.0', 'method': method, 'params': list(params)} for method, params in calls]
+        responses = await self._send(payload, batch=True)
+
+        results = []
+        for response, (method, _) in zip(responses, calls):
+            if 'error' in response:
+                results.append(BatchRequestException(response['error']))
+            else:
+                results.append(self._format(method, response.get('result')))
+
+        return results
+
+    async def subscribe(self, event: str, callback: Callable[[dict], Any]) -> str:
+        """eth_subscribe on the shared connection, `callback` gets the result of every notification."""
+        subscription_id = await self.request('eth_subscribe', [event])
+        self._subscriptions[subscription_id] = callback
+        return subscription_id
+
+    async def unsubscribe(self, subscription_id: str) -> NoReturn:
+        self._subscriptions.pop(subscription_id, None)
+
+        if self.connected:
+            await self.request('eth_unsubscribe', [subscription_id])
+
+    def _format(self, method: str, result: Any) -> Any:
+        if result is None:
+            return None
+
+        return get_result_formatters(method, self._eth)(result)
+
+    async def _send(self, payload: List[dict], batch: bool) -> List[dict]:
+        await self.connect()
+
+        loop = asyncio.get_event_loop()
+        futures = []
+        for request in payload:
+            request['id'] = next(self._ids)
+            futures.append(self._pending.setdefault(request['id'], loop.create_future()))
+
+        try:
+            async with self._semaphore:
+                await self._ws.send(json.dumps(payload if batch else payload[0]))
+                return await asyncio.wait_for(asyncio.gather(*futures), timeout=self._request_timeout)
+        finally:
+            for request in payload:
+                self._pending.pop(request['id'], None)
+
+    async def _read(self, ws) -> NoReturn:
+        try:
+            async for message in ws:
+                message = json.loads(message)
+
+                for response in message if isinstance(message, list) else [message]:
+                    self._dispatch(response)
+        except Exception as e:
+            logging.warning(f"RPC connection to {self.endpoint_uri} was lost: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(f"RPC connection to {self.endpoint_uri} was closed"))
+
+            # subscriptions don't survive the connection
+            self._subscriptions.clear()
+
+    def _dispatch(self, response: dict) -> NoReturn:
+        if response.get('method') == 'eth_subscription':
+            callback = self._subscriptions.get(response['params']['subscription'])
+            if callback is not None:
+                callback(response['params']['result'])
+            return
+
+        future = self._pending.get(response.get('id'))
+        if future is not None and not future.done():
+            future.set_result(response)
+        elif 'error' in response:
+            # e.g. a batch rejected as a whole, its requests run into the request timeout
+            logging.warning(f"Unmatched RPC error response: {response['error']}")
+
+
+class AsyncGasPriceOracle:
+    """GasPriceOracle for the AsyncRPCClient: tier prices sampled from recent blocks, cached for `ttl` seconds."""
+
+    def __init__(
+            self,
+            client: AsyncRPCClient,
+            ttl: float = 30,
+            sample_blocks: int = 20,
+            min_price: int = Web3.toWei(1, 'gwei'),
+            max_price: int = Web3.toWei(500, 'gwei')
+    ) -> None:
+        self._client = client
+        self._ttl = ttl
+        self._sample_blocks = sample_blocks
+        self._min_price = min_price
+        self._max_price = max_price
+
+        self._lock: Union[None, asyncio.Lock] = None
+        self._prices: Dict[str, int] = {}
+        self._sampled_at = 0.0
+
+    async def price(self, tier: str = 'standard') -> int:
+        if tier not in GAS_TIERS:
+            raise ValueError(f"Unknown gas tier '{tier}', expected one of {', '.join(GAS_TIERS)}")
+
+        return (await self.prices())[tier]
+
+    async def prices(self) -> Dict[str, int]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if not self._prices or time.monotonic() - self._sampled_at >= self._ttl:
+                self._prices = await self._sample()
+                self._sampled_at = time.monotonic()
+
+                logging.info(f"Sampled gas prices: {self._prices}")
+
+            return self._prices
+
+    async def _sample(self) -> Dict[str, int]:
+        head = await self._client.request('eth_blockNumber', [])
+        blocks = await self._client.batch(block_requests(head, self._sample_blocks))
+
+        gas_prices = block_gas_prices(blocks)
+        if not gas_prices:
+            gas_prices = [await self._client.request('eth_gasPrice', [])]
+
+        return tier_prices(gas_prices, self._min_price, self._max_price)
+
+
+class AsyncContractWrapper:
+    """
+    asyncio counterpart of ContractWrapper, with the same create/call/build/send/confirm/get_contract surface.
+
+    All escrows of the signer share one AsyncRPCClient connection, so any number of
+    operations and receipt waits can run concurrently on one event loop. Pending receipts
+    are resolved with one batched request per new block (eth_subscribe newHeads on the
+    same connection). `max_concurrency` bounds the RPC requests in flight.
+
+    Nonces come from the `nonce_manager`, pass the RedisNonceManager of the synchronous
+    workers when they sign for the same keys. Transactions pending longer than `stuck_after`
+    seconds are re-sent with a higher gas price, like ContractWrapper does (see TransactionSupervisor).
+    """
+    NEW_BLOCK_TIMEOUT = 60
+
+    def __init__(
+            self,
+            infura_key: str,
+            metamask_private_key: str,
+            timeout: int = 600,
+            client: Union[None, AsyncRPCClient] = None,
+            max_concurrency: int = 64,
+            contract_cache_size: int = 128,
+            gas_price_oracle: Union[None, AsyncGasPriceOracle] = None,
+            gas_estimator: Union[None, GasEstimator] = None,
+            nonce_manager: Union[None, NonceManager] = None,
+            stuck_after: float = 180,
+            max_gas_price: int = Web3.toWei(200, 'gwei')
+    ) -> None:
+        logging.info("Initialized Async Contract Wrapper")
+
+        self._infura_key = infura_key
+        self._client = client if client is not None else self.connect(infura_key, max_concurrency)
+        self._account = Account.from_key(metamask_private_key)
+        self._timeout = timeout
+
+        # contracts are only used to encode calls, all requests go through the client
+        self._w3 = Web3()
+        self._contract_data = load_contract_data(CONTRACT_PATH)
+        self._function_index = load_function_index(CONTRACT_PATH)
+        self._contract_factory = self._w3.eth.contract(
+            abi=self._contract_data['abi'],
+            bytecode=self._contract_data['bytecode']
+        )
+        self._contracts: 'OrderedDict[str, Contract]' = OrderedDict()
+        self._contract_cache_size = contract_cache_size
+
+        self._gas_price_oracle = gas_price_oracle if gas_price_oracle is not None else AsyncGasPriceOracle(self._client)
+        self._gas_estimator = gas_estimator if gas_estimator is not None else GasEstimator()
+
+        self._nonce_manager = nonce_manager if nonce_manager is not None else LocalNonceManager()
+        # only bumps gas prices, replacements are sent through the client
+        self._supervisor = TransactionSupervisor(self._w3, self._account, max_gas_price=max_gas_price)
+        self._stuck_after = stuck_after
+
+        self._chain_id: Union[None, int] = None
+
+        self._receipts: Dict[str, asyncio.Future] = {}
+        self._follower: Union[None, asyncio.Task] = None
+        self._new_block: Union[None, asyncio.Event] = None
+
+    @staticmethod
+    def connect(infura_key: str, max_concurrency: int = 64) -> AsyncRPCClient:
+        return AsyncRPCClient(f'wss://ropsten.infura.io/ws/v3/{infura_key}', max_concurrency=max_concurrency)
+
+    async def __aenter__(self) -> 'AsyncContractWrapper':
+        if not await self.ready_check():
+            raise W3ProviderNotConnectedException(
+                f'Async client is not connected to the websocket provider: {self._infura_key}'
+            )
+        return self
+
+    async def __aexit__(self, *exc_info) -> NoReturn:
+        await self.close()
+
+    async def close(self) -> NoReturn:
+        if self._follower is not None:
+            self._follower.cancel()
+            await asyncio.gather(self._follower, return_exceptions=True)
+            self._follower = None
+
+        await self._client.close()
+
+    async def ready_check(self) -> bool:
+        try:
+            await self._client.request('eth_blockNumber', [])
+        except Exception as e:
+            logging.warning(f"Async client is not ready: {e}")
+            return False
+
+        return True
+
+    def get_contract(self, address: str = None) -> Union[Type[Contract], Contract]:
+        if address is None:
+            return self._contract_factory
+
+        contract = self._contracts.get(address)
+        if contract is not None:
+            self._contracts.move_to_end(address)
+            return contract
+
+        contract = self._contracts[address] = self._w3.eth.contract(address=address, abi=self._contract_data['abi'])
+        if len(self._contracts) > self._contract_cache_size:
+            self._contracts.popitem(last=False)
+
+        return contract
+
+    async def call(self, address: str, function_name: str, *args: list, **kwargs: dict) -> Any:
+        if function_name not in self._function_index:
+            raise FunctionNotFoundException
+
+        function = self.get_contract(address).functions[function_name](*args, **kwargs)
+        data = await self._client.request(
+            'eth_call',
+            [{'to': function.address, 'data': function._encode_transaction_data()}, 'latest']
+        )
+
+        return self._decode_output(self._function_index[function_name], data)
+
+    async def create(
+            self,
+            seller: str,
+            solver: str,
+            value: int,
+            item_id: str,
+            wait: bool = True,
+            gas_tier: str = 'standard',
+            dry_run: bool = False
+    ) -> Dict:
+        logging.info(f"Building contract with arguments = [{seller}, {solver}, {value}, {item_id}]")
+
+        return await self._build_transaction(
+            self.get_contract().constructor(seller, solver, item_id),
+            value=value,
+            wait=wait,
+            gas_tier=gas_tier,
+            dry_run=dry_run
+        )
+
+    async def build(
+            self,
+            address: str,
+            function_name: str,
+            *args: list,
+            wait: bool = True,
+            gas_tier: str = 'standard',
+            dry_run: bool = False,
+            **kwargs: dict
+    ) -> Dict:
+        if function_name not in self._function_index:
+            raise FunctionNotFoundException
+
+        return await self._build_transaction(
+            self.get_contract(address).functions[function_name](*args, **kwargs),
+            wait=wait,
+            gas_tier=gas_tier,
+            dry_run=dry_run
+        )
+
+    async def send(self, address: str, wait: bool = True, gas_tier: str = 'standard', dry_run: bool = False) -> Dict:
+        return await self.build(address, 'sent', wait=wait, gas_tier=gas_tier, dry_run=dry_run)
+
+    async def confirm(self, address: str, wait: bool = True, gas_tier: str = 'standard', dry_run: bool = False) -> Dict:
+        return await self.build(address, 'confirmReceived', wait=wait, gas_tier=gas_tier, dry_run=dry_run)
+
+    async def get_receipt(self, tx_hash: str) -> Union[None, TxReceipt]:
+        return await self._client.request('eth_getTransactionReceipt', [HexBytes(tx_hash).hex()])
+
+    async def wait_for_receipt(self, tx_hash: str, timeout: Union[None, float] = None) -> TxReceipt:
+        """Receipt of the transaction once it is mined, waits share one batched receipt request per block."""
+        tx_hash = HexBytes(tx_hash).hex()
+        timeout = self._timeout if timeout is None else timeout
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._watch(tx_hash)), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._receipts.pop(tx_hash, None)
+            raise TimeExhausted(f"Transaction {tx_hash} is not in the chain after {timeout} seconds")
+
+    async def wait(self, result: Dict) -> TxReceipt:
+        """Receipt of a transaction submitted with wait=False, which is re-sent with a higher gas price if stuck."""
+        tracked = TrackedTransaction(result['transaction'], result['tx_hash'])
+        deadline = time.monotonic() + self._timeout
+
+        while True:
+            wait_seconds = max(0.0, min(deadline, tracked.submitted_at + self._stuck_after) - time.monotonic())
+            done, _ = await asyncio.wait(
+                [self._watch(tx_hash) for tx_hash in tracked.tx_hashes],
+                timeout=wait_seconds,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if done:
+                self._forget(tracked.tx_hashes)
+                return next(iter(done)).result()
+
+            now = time.monotonic()
+            if now >= deadline:
+                self._forget(tracked.tx_hashes)
+                raise TimeExhausted(
+                    f"Transactions {', '.join(tracked.tx_hashes)} are not in the chain after {self._timeout} seconds"
+                )
+
+            if now - tracked.submitted_at >= self._stuck_after:
+                replacement = await self.replace_transaction(tracked.transaction)
+                if replacement is not None:
+                    tracked.replaced(*replacement)
+                else:
+                    tracked.submitted_at = now
+
+    async def replace_transaction(self, transaction: Dict) -> Union[None, Tuple[Dict, str]]:
+        """Same as ContractWrapper.replace_transaction."""
+        bumped = transaction
+        while True:
+            bumped = self._supervisor.bumped(bumped)
+            if bumped is None:
+                logging.warning(f"Transaction with nonce {transaction['nonce']} is stuck at the maximal gas price")
+                return None
+
+            signed = self._account.sign_transaction({key: value for key, value in bumped.items() if key != 'from'})
+
+            try:
+                tx_hash = await self._client.request('eth_sendRawTransaction', [signed.rawTransaction.hex()])
+                break
+            except ValueError as e:
+                if is_underpriced_error(e):
+                    # the node wants a bigger raise, the transactions sent so far are still pending
+                    logging.info(f"Replacement with nonce {transaction['nonce']} is underpriced, bumping again: {e}")
+                    continue
+                if is_nonce_error(e):
+                    # one of the earlier versions was mined in the meantime
+                    logging.info(f"Transaction with nonce {transaction['nonce']} can't be replaced anymore: {e}")
+                    return None
+                raise
+
+        tx_hash = HexBytes(tx_hash).hex()
+        logging.info(
+            f"Replaced stuck transaction with nonce {transaction['nonce']}: {tx_hash}, gas price {bumped['gasPrice']}"
+        )
+
+        return bumped, tx_hash
+
+    def _watch(self, tx_hash: str) -> asyncio.Future:
+        future = self._receipts.get(tx_hash)
+        if future is None:
+            future = self._receipts[tx_hash] = asyncio.get_event_loop().create_future()
+
+        if self._follower is None or self._follower.done():
+            self._new_block = asyncio.Event()
+            self._follower = asyncio.ensure_future(self._follow_blocks())
+
+        return future
+
+    def _forget(self, tx_hashes: List[str]) -> NoReturn:
+        for tx_hash in tx_hashes:
+            self._receipts.pop(tx_hash, None)
+
+    async def _build_transaction(
+            self,
+            contract: Union[ContractConstructor, ContractFunction],
+            value: int = 0,
+            wait: bool = True,
+            gas_tier: str = 'standard',
+            dry_run: bool = False
+    ) -> Dict:
+        is_constructor = isinstance(contract, ContractConstructor)
+        name = 'constructor' if is_constructor else contract.fn_name
+
+        call = {'from': self._account.address, 'value': hex(value)}
+        if is_constructor:
+            call['data'] = contract.data_in_transaction
+        else:
+            call['to'] = contract.address
+            call['data'] = contract._encode_transaction_data()
+
+        # fail before signing (and paying for) a transaction which would revert
+        try:
+            result = await self._client.request('eth_call', [call, 'latest'])
+        except ValueError as e:
+            raise TransactionSimulationException(name, str(e)) from e
+
+        if dry_run:
+            if not is_constructor:
+                result = self._decode_output(self._function_index[name], result)
+
+            return {
+                'tx_hash': None,
+                'receipt': None,
+                'transaction': None,
+                'result': result
+            }
+
+        gas, gas_price, chain_id = await asyncio.gather(
+            self._estimate_gas(contract, call),
+            self._gas_price_oracle.price(gas_tier),
+            self._get_chain_id()
+        )
+
+        transaction = {
+            'value': value,
+            'gas': gas,
+            'gasPrice': gas_price,
+            'chainId': chain_id,
+            'data': call['data'],
+        }
+        if not is_constructor:
+            transaction['to'] = call['to']
+
+        nonce = await self._allocate_nonce()
+        transaction['nonce'] = nonce
+
+        try:
+            signed = self._account.sign_transaction(transaction)
+            tx_hash = await self._client.request('eth_sendRawTransaction', [signed.rawTransaction.hex()])
+        except Exception as e:
+            await self._release_nonce(nonce, e)
+            raise
+
+        tx_hash = HexBytes(tx_hash).hex()
+        transaction['from'] = self._account.address
+
+        logging.info(f"Transaction building started: {tx_hash}")
+
+        result = {
+            'tx_hash': tx_hash,
+            'receipt': None,
+            'transaction': transaction
+        }
+        if wait:
+            result['receipt'] = await self.wait(result)
+
+        return result
+
+    async def _estimate_gas(self, contract: Union[ContractConstructor, ContractFunction], call: Dict) -> int:
+        key = self._gas_estimator.key(contract, int(call['value'], 16))
+
+        limit = self._gas_estimator.lookup(key)
+        if limit is not None:
+            return limit
+
+        try:
+            gas = await self._client.request('eth_estimateGas', [call])
+        except ValueError as e:
+            raise GasEstimationException(f"Gas estimation of '{key[0]}' failed: {e}") from e
+
+        return self._gas_estimator.store(key, gas)
+
+    async def _get_chain_id(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = await self._client.request('eth_chainId', [])
+        return self._chain_id
+
+    async def _allocate_nonce(self) -> int:
+        address = self._account.address
+
+        nonce = await self._run_sync(self._nonce_manager.allocate_tracked, address)
+        if nonce is None:
+            chain_nonce = await self._client.request('eth_getTransactionCount', [address, 'pending'])
+            await self._run_sync(self._nonce_manager.seed, address, chain_nonce)
+            nonce = await self._run_sync(self._nonce_manager.allocate_tracked, address)
+
+        return nonce
+
+    async def _release_nonce(self, nonce: int, error: Exception) -> NoReturn:
+        address = self._account.address
+
+        if is_nonce_error(error):
+            logging.warning(f"Nonce {nonce} of {address} was rejected, resyncing: {error}")
+            chain_nonce = await self._client.request('eth_getTransactionCount', [address, 'pending'])
+            await self._run_sync(self._nonce_manager.seed, address, chain_nonce, overwrite=True)
+        else:
+            await self._run_sync(self._nonce_manager.release, address, nonce)
+
+    @staticmethod
+    async def _run_sync(function: Callable, *args: Any, **kwargs: Any) -> Any:
+        # the redis nonce manager blocks on its round trips
+        return await asyncio.get_event_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+    async def _follow_blocks(self) -> NoReturn:
+        while self._receipts:
+            subscription_id = None
+            try:
+                subscription_id = await self._client.subscribe('newHeads', lambda head: self._new_block.set())
+
+                while self._receipts:
+                    await self._resolve_pending()
+
+                    try:
+                        await asyncio.wait_for(self._new_block.wait(), timeout=self.NEW_BLOCK_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        # resolve anyway, in case notifications got lost
+                        pass
+                    self._new_block.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Async receipt resolver lost the block feed, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                # every attempt subscribes again, the old subscription must not keep notifying
+                if subscription_id is not None:
+                    try:
+                        await self._client.unsubscribe(subscription_id)
+                    except Exception as e:
+                        logging.info(f"Async receipt resolver could not unsubscribe {subscription_id}: {e}")
+
+    async def _resolve_pending(self) -> NoReturn:
+        tx_hashes = [tx_hash for tx_hash, future in self._receipts.items() if not future.done()]
+        if not tx_hashes:
+            return
+
+        receipts = await self._client.batch([('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes])
+
+        for tx_hash, receipt in zip(tx_hashes, receipts):
+            if receipt is None or isinstance(receipt, Exception):
+                continue
+
+            future = self._receipts.pop(tx_hash, None)
+            if future is not None and not future.done():
+                future.set_result(receipt)
+
+    def _decode_output(self, fn_abi: dict, data: bytes) -> Any:
+        output_types = get_abi_output_types(fn_abi)
+        output = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, self._w3.codec.decode_abi(output_types, data))
+
+        return output[0] if len(output) == 1 else output
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import pathlib
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Tuple
+
+__all__ = [
+    'CONTRACT_PATH',
+    'SLIM_CONTRACT_PATH',
+    'build_artifact',
+    'load_contract_data',
+    'load_function_index'
+]
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent
+
+CONTRACT_PATH = PROJECT_ROOT / 'truffle' / 'Contract.json'
+SLIM_CONTRACT_PATH = PROJECT_ROOT / 'truffle' / 'Contract.slim.json'
+CONTRACTS_DIR = PROJECT_ROOT / 'truffle' / 'contracts'
+
+# the only truffle artifact keys contracts_api uses
+ARTIFACT_KEYS = ('abi', 'bytecode')
+
+_cache: Dict[Tuple[pathlib.Path, pathlib.Path], Dict] = {}
+_function_index_cache: Dict[Tuple[pathlib.Path, pathlib.Path], Mapping[str, dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def _source_hash(source: pathlib.Path) -> str:
+    return hashlib.sha256(source.read_bytes()).hexdigest()
+
+
+def _slim(source: pathlib.Path) -> Dict:
+    with open(source) as input_file:
+        contract_data = json.load(input_file)
+
+    # truffle artifacts embed the source they were compiled from
+    contract_path = CONTRACTS_DIR / f"{contract_data.get('contractName')}.sol"
+    if 'source' in contract_data and contract_path.exists() and contract_path.read_text() != contract_data['source']:
+        logging.warning(f"{source} was not compiled from the current {contract_path}, run truffle compile")
+
+    return {
+        'source_sha256': _source_hash(source),
+        **{key: contract_data[key] for key in ARTIFACT_KEYS}
+    }
+
+
+def build_artifact(source: pathlib.Path = CONTRACT_PATH, target: pathlib.Path = SLIM_CONTRACT_PATH) -> Dict:
+    """Extract abi and bytecode of the truffle artifact into a compact json file."""
+    artifact = _slim(source)
+
+    with open(target, 'w') as output_file:
+        json.dump(artifact, output_file, separators=(',', ':'))
+
+    logging.info(f"Slim contract artifact was built: {target}")
+
+    return artifact
+
+
+def _load(source: pathlib.Path, target: pathlib.Path) -> Dict:
+    try:
+        with open(target) as input_file:
+            artifact = json.load(input_file)
+    except (OSError, ValueError):
+        artifact = None
+
+    if artifact is not None and artifact.get('source_sha256') == _source_hash(source):
+        return artifact
+
+    logging.warning(f"Slim contract artifact is missing or stale, rebuilding from: {source}")
+
+    try:
+        return build_artifact(source, target)
+    except OSError:
+        # read-only deployments still work, they just pay for the full parse
+        return _slim(source)
+
+
+def load_contract_data(source: pathlib.Path = CONTRACT_PATH, target: pathlib.Path = SLIM_CONTRACT_PATH) -> Dict:
+    """
+    Abi and bytecode of the contract, loaded once per process.
+
+    The slim artifact is validated against the sha256 of the source artifact and
+    rebuilt when they do not match.
+    """
+    key = (source, target)
+
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = _load(source, target)
+        return _cache[key]
+
+
+def load_function_index(
+        source: pathlib.Path = CONTRACT_PATH,
+        target: pathlib.Path = SLIM_CONTRACT_PATH
+) -> Mapping[str, dict]:
+    """Read-only function name -> abi entry index of the contract, built once per process."""
+    contract_data = load_contract_data(source, target)
+    key = (source, target)
+
+    with _cache_lock:
+        if key not in _function_index_cache:
+            _function_index_cache[key] = MappingProxyType({
+                entry['name']: entry for entry in contract_data['abi'] if entry['type'] == 'function'
+            })
+        return _function_index_cache[key]
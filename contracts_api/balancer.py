@@ -0,0 +1,247 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Sequence, Tuple, Union
+
+from web3 import Web3
+from web3.providers import BaseProvider
+from web3.types import MiddlewareOnion, RPCEndpoint, RPCResponse
+from websockets.exceptions import WebSocketException
+
+from .batch import _send_batch, supports_batch
+from .exceptions import ContractException
+
+__all__ = [
+    'NoHealthyEndpointException',
+    'Endpoint',
+    'LoadBalancedProvider'
+]
+
+# sent to the primary endpoint first: broadcasts, and nonces which depend on its transaction pool
+PRIMARY_METHODS = frozenset({
+    'eth_sendRawTransaction',
+    'eth_sendTransaction',
+    'eth_getTransactionCount',
+    'eth_subscribe',
+    'eth_unsubscribe',
+})
+
+# failures of the endpoint itself (connection, timeout), not of the request
+ENDPOINT_ERRORS = (OSError, asyncio.TimeoutError, WebSocketException)
+
+# JSON-RPC errors of endpoints which are rate limited or overloaded
+RATE_LIMIT_CODES = (-32005, 429)
+RATE_LIMIT_MESSAGES = ('rate limit', 'limit exceeded', 'too many requests')
+
+
+class NoHealthyEndpointException(ContractException):
+    pass
+
+
+def _is_rate_limited(response: Any) -> bool:
+    if not isinstance(response, dict) or not isinstance(response.get('error'), dict):
+        return False
+
+    error = response['error']
+    message = str(error.get('message', '')).lower()
+
+    return error.get('code') in RATE_LIMIT_CODES or any(text in message for text in RATE_LIMIT_MESSAGES)
+
+
+class Endpoint:
+    """
+    Rolling latency and error rate of one provider, over its last `window` requests, and its circuit breaker.
+
+    The breaker opens after `failure_threshold` failures in a row and keeps the endpoint out of
+    rotation for `reset_after` seconds. Then one request is let through: the breaker closes
+    if it succeeds and opens again if it fails.
+    """
+
+    def __init__(
+            self,
+            provider: BaseProvider,
+            window: int = 50,
+            failure_threshold: int = 5,
+            reset_after: float = 30
+    ) -> None:
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+
+        self.request: Callable[[RPCEndpoint, Any], RPCResponse] = provider.make_request
+
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._opened_at: Union[None, float] = None
+        self._trial_running = False
+
+    def __repr__(self) -> str:
+        return f"Endpoint({getattr(self.provider, 'endpoint_uri', None) or self.provider!r})"
+
+    @property
+    def latency(self) -> float:
+        """Mean latency of the window, 0 before the first request so new endpoints are tried."""
+        with self._lock:
+            return sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return 'half-open'
+            return 'open'
+
+    def acquire(self) -> bool:
+        """Whether a request may be sent to the endpoint now; half-open endpoints take one at a time."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_after:
+                return False
+
+            self._trial_running = True
+            return True
+
+    def succeeded(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self._outcomes.append(True)
+            self._consecutive_failures = 0
+
+            if self._opened_at is not None:
+                logging.info(f"{self!r} recovered, closing its circuit breaker")
+            self._opened_at = None
+            self._trial_running = False
+
+    def failed(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            self._outcomes.append(False)
+            self._consecutive_failures += 1
+
+            if self._opened_at is not None or self._consecutive_failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logging.warning(f"{self!r} failed {self._consecutive_failures} times, opening its circuit breaker")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {'latency': self.latency, 'error_rate': self.error_rate, 'state': self.state}
+
+
+class LoadBalancedProvider(BaseProvider):
+    """
+    Spreads requests over several providers of the same chain.
+
+    Reads go to the healthy endpoint with the lowest rolling latency, broadcasts and nonce
+    reads (PRIMARY_METHODS) to the first, primary, provider. Requests failing on an endpoint
+    (connection errors, timeouts, rate limits) are retried on the next one; endpoints which keep
+    failing are taken out of rotation by their circuit breaker (see Endpoint). When no endpoint
+    is healthy all of them are tried anyway.
+    """
+
+    def __init__(
+            self,
+            providers: Sequence[BaseProvider],
+            window: int = 50,
+            failure_threshold: int = 5,
+            reset_after: float = 30
+    ) -> None:
+        if not providers:
+            raise NoHealthyEndpointException("A load balanced provider needs at least one provider")
+
+        self.endpoints = [Endpoint(provider, window, failure_threshold, reset_after) for provider in providers]
+        self.request_counter = itertools.count()
+        self.supports_batch = any(supports_batch(provider) for provider in providers)
+
+    def request_func(self, web3: Web3, outer_middlewares: MiddlewareOnion) -> Callable[..., RPCResponse]:
+        # provider level middlewares of every endpoint (e.g. eth-tester's) run inside the balancing
+        for endpoint in self.endpoints:
+            endpoint.request = endpoint.provider.request_func(web3, ())
+        return super().request_func(web3, outer_middlewares)
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        endpoints = self._route(method in PRIMARY_METHODS)
+        return self._send(endpoints, method, lambda endpoint: endpoint.request(method, params))
+
+    def send_batch(self, payload: List[dict]) -> List[dict]:
+        endpoints = [endpoint for endpoint in self._route(False) if supports_batch(endpoint.provider)]
+        return self._send(endpoints, 'batch', lambda endpoint: _send_batch(endpoint.provider, payload))
+
+    def isConnected(self) -> bool:
+        return any(endpoint.provider.isConnected() for endpoint in self.endpoints)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+    def _route(self, primary_first: bool) -> List[Endpoint]:
+        if primary_first:
+            return self.endpoints
+
+        # endpoints with errors sort after the fast ones, the breakers keep out the failing ones
+        return sorted(self.endpoints, key=lambda endpoint: (endpoint.error_rate > 0.5, endpoint.latency))
+
+    def _send(self, endpoints: List[Endpoint], method: str, send: Callable[[Endpoint], Any]) -> Any:
+        failures: List[str] = []
+        response = None
+
+        for endpoint in endpoints:
+            if endpoint.acquire():
+                done, response = self._attempt(endpoint, method, send, failures)
+                if done:
+                    return response
+
+        if not failures:
+            # nothing healthy: better a request to an open breaker than none at all
+            for endpoint in endpoints:
+                done, response = self._attempt(endpoint, method, send, failures)
+                if done:
+                    return response
+
+        if response is not None:
+            # rate limited everywhere, the caller sees the node's error
+            return response
+
+        raise NoHealthyEndpointException(f"{method} failed on all {len(endpoints)} endpoints: {'; '.join(failures)}")
+
+    @staticmethod
+    def _attempt(
+            endpoint: Endpoint,
+            method: str,
+            send: Callable[[Endpoint], Any],
+            failures: List[str]
+    ) -> Tuple[bool, Any]:
+        started = time.perf_counter()
+        try:
+            response = send(endpoint)
+        except ENDPOINT_ERRORS as e:
+            endpoint.failed(time.perf_counter() - started)
+            logging.warning(f"{method} failed on {endpoint!r}: {e}")
+            failures.append(f'{endpoint!r}: {e}')
+            return False, None
+        except Exception:
+            # the request was bad, not the endpoint
+            endpoint.succeeded(time.perf_counter() - started)
+            raise
+
+        if _is_rate_limited(response):
+            endpoint.failed(time.perf_counter() - started)
+            logging.warning(f"{method} was rate limited on {endpoint!r}")
+            failures.append(f'{endpoint!r}: rate limited')
+            return False, response
+
+        endpoint.succeeded(time.perf_counter() - started)
+        return True, response
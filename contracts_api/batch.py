@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import json
+import logging
+from typing import Any, Callable, List, Sequence, Tuple
+
+from web3 import Web3
+from web3._utils.method_formatters import get_result_formatters
+from web3._utils.request import make_post_request
+from web3.providers import BaseProvider, HTTPProvider, WebsocketProvider
+from web3.types import MiddlewareOnion, RPCEndpoint, RPCResponse
+
+from .exceptions import ContractException
+
+__all__ = [
+    'BatchRequestException',
+    'make_batch_request'
+]
+
+
+class BatchRequestException(ContractException):
+    pass
+
+
+def supports_batch(provider: Any) -> bool:
+    # providers declaring it (see contracts_api.cassette) tell for themselves
+    if hasattr(type(provider), 'supports_batch'):
+        return provider.supports_batch
+
+    return isinstance(provider, (HTTPProvider, WebsocketProvider))
+
+
+def _send_batch(provider: Any, payload: List[dict]) -> List[dict]:
+    if hasattr(type(provider), 'send_batch'):
+        return provider.send_batch(payload)
+
+    data = json.dumps(payload).encode('utf-8')
+
+    if isinstance(provider, WebsocketProvider):
+        # reuse the connection the provider already holds, on the loop that owns it
+        future = asyncio.run_coroutine_threadsafe(provider.coro_make_request(data), WebsocketProvider._loop)
+        return future.result()
+
+    return json.loads(make_post_request(provider.endpoint_uri, data, **provider.get_request_kwargs()))
+
+
+class WrappingProvider(BaseProvider):
+    """
+    Base of providers which pass every request on to the wrapped `provider`.
+
+    The wrapped provider's own middlewares (e.g. eth-tester's) run inside the wrapper, and
+    JSON-RPC batches are sent as batches if the wrapped provider supports them.
+    """
+
+    supports_batch = False
+
+    def __init__(self, provider: BaseProvider) -> None:
+        self.provider = provider
+        self.request_counter = getattr(provider, 'request_counter', itertools.count())
+        self.supports_batch = supports_batch(provider)
+
+        self._request = provider.make_request
+
+    def __getattr__(self, name: str) -> Any:
+        # endpoint_uri, ... of the wrapped provider
+        if name == 'provider':
+            raise AttributeError(name)
+        return getattr(self.provider, name)
+
+    def request_func(self, web3: Web3, outer_middlewares: MiddlewareOnion) -> Callable[..., RPCResponse]:
+        self._request = self.provider.request_func(web3, ())
+        return super().request_func(web3, outer_middlewares)
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self._request(method, params)
+
+    def send_batch(self, payload: List[dict]) -> List[dict]:
+        return _send_batch(self.provider, payload)
+
+    def isConnected(self) -> bool:
+        return self.provider.isConnected()
+
+
+def make_batch_request(w3: Web3, calls: Sequence[Tuple[str, Sequence]]) -> List[Any]:
+    """
+    Send many JSON-RPC calls in one round trip.
+
+    Returns one entry per call, in order: the formatted result (as `w3.eth` would
+    return it) or a BatchRequestException for calls the node answered with an error.
+    Providers without batch support fall back to one request per call.
+    """
+    if not calls:
+        return []
+
+    provider = w3.provider
+
+    if not supports_batch(provider):
+        results = []
+        for method, params in calls:
+            try:
+                results.append(w3.manager.request_blocking(method, params))
+            except ValueError as e:
+                results.append(BatchRequestException(e))
+        return results
+
+    payload = [
+        {'jsonrpc': '2.0', 'method': method, 'params': list(params), 'id': next(provider.request_counter)}
+        for method, params in calls
+    ]
+
+    responses = _send_batch(provider, payload)
+
+    if not isinstance(responses, list):
+        # nodes answer a whole batch they can't process with a single error object
+        raise BatchRequestException(responses.get('error', responses))
+
+    by_id = {response.get('id'): response for response in responses}
+
+    logging.debug(f"Batch request of {len(payload)} calls finished")
+
+    results = []
+    for request, (method, _) in zip(payload, calls):
+        response = by_id.get(request['id'])
+
+        if response is None:
+            results.append(BatchRequestException(f"No response for request {request['id']} ({method})"))
+        elif 'error' in response:
+            results.append(BatchRequestException(response['error']))
+        elif response.get('result') is None:
+            results.append(None)
+        else:
+            results.append(get_result_formatters(method, w3.eth)(response['result']))
+
+    return results
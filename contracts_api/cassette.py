@@ -0,0 +1,152 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, NoReturn, Tuple
+
+from hexbytes import HexBytes
+from web3.providers import BaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .batch import WrappingProvider
+from .exceptions import ContractException
+
+__all__ = [
+    'CassetteMissException',
+    'RecordingProvider',
+    'ReplayProvider'
+]
+
+# method of cassette entries holding a whole JSON-RPC batch
+BATCH = 'batch'
+
+
+class CassetteMissException(ContractException):
+    pass
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return HexBytes(value).hex()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _key(method: str, params: Any) -> Tuple[str, str]:
+    return method, json.dumps(params, sort_keys=True, default=_default)
+
+
+def _batch_params(payload: List[dict]) -> List[list]:
+    # request ids differ between runs
+    return [[request['method'], request['params']] for request in payload]
+
+
+class RecordingProvider(WrappingProvider):
+    """
+    Passes every request to `provider` and appends it, with the response and its duration,
+    to the JSONL cassette at `path`. JSON-RPC batches are recorded as one entry.
+    """
+
+    def __init__(self, provider: BaseProvider, path: str) -> None:
+        super().__init__(provider)
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._file = open(path, 'a')
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        started = time.perf_counter()
+        response = super().make_request(method, params)
+        self._record(method, params, response, started)
+        return response
+
+    def send_batch(self, payload: List[dict]) -> List[dict]:
+        started = time.perf_counter()
+        responses = super().send_batch(payload)
+
+        if isinstance(responses, list):
+            by_id = {response.get('id'): response for response in responses}
+            responses = [by_id.get(request['id'], {'error': 'no response'}) for request in payload]
+
+        self._record(BATCH, _batch_params(payload), responses, started)
+        return responses
+
+    def close(self) -> NoReturn:
+        with self._lock:
+            self._file.close()
+
+    def _record(self, method: str, params: Any, response: Any, started: float) -> NoReturn:
+        entry = json.dumps({
+            'method': method,
+            'params': params,
+            'response': response,
+            'at': started - self._started,
+            'elapsed': time.perf_counter() - started,
+        }, default=_default)
+
+        with self._lock:
+            self._file.write(entry + '\n')
+            self._file.flush()
+
+
+class ReplayProvider(BaseProvider):
+    """
+    Serves the responses of a cassette written by RecordingProvider, without a network.
+
+    Requests are matched by method and params; repeated requests get the recorded responses
+    in order, and the last one once they are used up. With `realtime` every response takes
+    as long as it did when it was recorded, otherwise responses are immediate.
+    """
+
+    supports_batch = False
+
+    def __init__(self, path: str, realtime: bool = False) -> None:
+        self.path = path
+        self.realtime = realtime
+
+        self.request_counter = itertools.count()
+
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Deque[dict]] = defaultdict(deque)
+
+        with open(path) as cassette:
+            for line in cassette:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[_key(entry['method'], entry['params'])].append(entry)
+
+        # batches are replayed as such only if they were sent as such
+        self.supports_batch = any(method == BATCH for method, _ in self._entries)
+
+        logging.info(f"Loaded {sum(map(len, self._entries.values()))} recorded requests from {path}")
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self._replay(method, params)
+
+    def send_batch(self, payload: List[dict]) -> List[dict]:
+        responses = self._replay(BATCH, _batch_params(payload))
+
+        if not isinstance(responses, list):
+            return responses
+
+        return [{**response, 'id': request['id']} for request, response in zip(payload, responses)]
+
+    def isConnected(self) -> bool:
+        return True
+
+    def _replay(self, method: str, params: Any) -> Any:
+        key = _key(method, params)
+
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissException(f"No recorded response for {method} {key[1]}")
+
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+
+        if self.realtime:
+            time.sleep(entry['elapsed'])
+
+        return entry['response']
@@ -1,56 +1,121 @@
-import json
 import logging
 import pathlib
-from typing import NoReturn, Union, Type, Dict, Any
+import time
+from collections import OrderedDict, defaultdict
+from typing import (
+    TYPE_CHECKING, Callable, NoReturn, Union, Type, Dict, Any, Iterable, Mapping, NamedTuple, Sequence, Tuple
+)
 
 from web3 import Web3
+from web3._utils.abi import get_abi_output_types, map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
 from web3.contract import ContractConstructor, Contract, ContractFunction
+from web3.exceptions import ContractLogicError, TransactionNotFound
+from web3.types import TxReceipt
+
+from .addresses import create_address
+from .artifact import load_contract_data, load_function_index
+from .batch import make_batch_request
+from .exceptions import (
+    ContractException,
+    W3ProviderNotConnectedException,
+    FunctionNotFoundException,
+    TransactionSimulationException
+)
+from .fieldcache import IMMUTABLE_ESCROW_FIELDS, EscrowFieldCache, split_fields
+from .gas import GasEstimator, GasPriceOracle
+from .metrics import Metrics
+from .nonce import NonceManager, is_nonce_error
+from .providers import make_provider
+from .supervisor import TrackedTransaction, TransactionSupervisor
+
+if TYPE_CHECKING:
+    from .receipts import ReceiptResolver
 
 __all__ = [
     'ContractException',
     'W3ProviderNotConnectedException',
     'FunctionNotFoundException',
+    'ESCROW_VIEW_FUNCTIONS',
+    'EscrowSnapshot',
     'ContractWrapper'
 ]
 
+ESCROW_VIEW_FUNCTIONS = ('state', 'value', 'buyer', 'seller', 'solver', 'problem_description')
 
-class ContractException(Exception):
-    pass
 
-
-class W3ProviderNotConnectedException(ContractException):
-    pass
-
-
-class FunctionNotFoundException(ContractException):
-    pass
-
-
-class InvalidContractFunctionCall(ContractException):
-    pass
+class EscrowSnapshot(NamedTuple):
+    """Values of escrow view functions, None for the ones which were not read."""
+    state: Union[None, int] = None
+    value: Union[None, int] = None
+    reward: Union[None, int] = None
+    buyer: Union[None, str] = None
+    seller: Union[None, str] = None
+    solver: Union[None, str] = None
+    admin: Union[None, str] = None
+    item: Union[None, str] = None
+    problem_description: Union[None, str] = None
 
 
 class ContractWrapper:
     PROJECT_ROOT = pathlib.Path(__file__).parent.parent
 
-    def __init__(self, infura_key: str, metamask_private_key: str, timeout: int = 600) -> None:
+    def __init__(
+            self,
+            infura_key: str,
+            metamask_private_key: str,
+            timeout: int = 600,
+            w3: Union[None, Web3] = None,
+            nonce_manager: Union[None, NonceManager] = None,
+            receipt_resolver: Union[None, 'ReceiptResolver'] = None,
+            contract_cache_size: int = 128,
+            gas_price_oracle: Union[None, GasPriceOracle] = None,
+            gas_estimator: Union[None, GasEstimator] = None,
+            stuck_after: float = 180,
+            max_gas_price: int = Web3.toWei(200, 'gwei'),
+            metrics: Union[None, Metrics] = None,
+            field_cache: Union[None, EscrowFieldCache] = None
+    ) -> None:
         logging.info("Initialized Contract Wrapper")
 
         self._infura_key = infura_key
         self._metamask_private_key = metamask_private_key
 
-        self._w3 = Web3(Web3.WebsocketProvider(f'wss://ropsten.infura.io/ws/v3/{self._infura_key}'))
+        # a shared w3 instance is health checked by its owner (see ContractWrapperPool)
+        self._check_connection = w3 is None
+        self._w3 = w3 if w3 is not None else self.connect(infura_key)
         self._account = self._w3.eth.account.privateKeyToAccount(self._metamask_private_key)
         self._contract_data = None
+        self._contract_factory: Union[None, Type[Contract]] = None
+        self._function_index: Mapping[str, dict] = {}
+        self._contracts: 'OrderedDict[str, Contract]' = OrderedDict()
+        self._contract_cache_size = contract_cache_size
+        self._nonce_manager = nonce_manager
+        self._receipt_resolver = receipt_resolver
+        self._gas_price_oracle = gas_price_oracle if gas_price_oracle is not None else GasPriceOracle(self._w3)
+        self._gas_estimator = gas_estimator if gas_estimator is not None else GasEstimator()
+        self._supervisor = TransactionSupervisor(
+            self._w3,
+            self._account,
+            stuck_after=stuck_after,
+            max_gas_price=max_gas_price,
+            receipt_resolver=receipt_resolver
+        )
 
+        self._metrics = metrics
+        self._field_cache = field_cache
         self._timeout = timeout
 
         self._prepare()
 
+    @staticmethod
+    def connect(infura_key: str) -> Web3:
+        return Web3(make_provider('websocket', infura_key=infura_key))
+
     def _prepare(self) -> NoReturn:
         self._read_contract_data()
 
-        if not self.ready_check():
+        if self._check_connection and not self.ready_check():
             raise W3ProviderNotConnectedException(
                 f'w3.py is not connected to the websocket provider: {self._infura_key}'
             )
@@ -58,64 +123,211 @@ class ContractWrapper:
         logging.info("Contract Wrapper Initialized Successfully")
 
     def _read_contract_data(self) -> NoReturn:
-        with open(self.PROJECT_ROOT / 'truffle' / 'Contract.json') as input_file:
-            self._contract_data = json.load(input_file)
+        source = self.PROJECT_ROOT / 'truffle' / 'Contract.json'
 
-    def _build_contract(self, address: str = None) -> Union[Type[Contract], Contract]:
-        return self._w3.eth.contract(
+        self._contract_data = load_contract_data(source)
+        self._function_index = load_function_index(source)
+        self._contract_factory = self._w3.eth.contract(
             abi=self._contract_data['abi'],
-            bytecode=self._contract_data['bytecode'],
-            address=address
+            bytecode=self._contract_data['bytecode']
         )
 
+    def _build_contract(self, address: str = None) -> Union[Type[Contract], Contract]:
+        if address is None:
+            return self._contract_factory
+
+        contract = self._contracts.get(address)
+        if contract is not None:
+            self._contracts.move_to_end(address)
+            return contract
+
+        contract = self._contracts[address] = self._contract_factory(address=address)
+        if len(self._contracts) > self._contract_cache_size:
+            self._contracts.popitem(last=False)
+
+        return contract
+
     def _build_transaction(
             self,
             contract: Union[ContractConstructor, ContractFunction],
-            opts: Union[None, dict] = None
+            opts: Union[None, dict] = None,
+            wait: bool = True,
+            gas_tier: str = 'standard',
+            dry_run: bool = False,
+            on_broadcast: Union[None, Callable[[Dict], Any]] = None
     ) -> Dict:
         if opts is None:
             opts = {}
 
-        construct_txn = contract.buildTransaction({
-            'from': self._account.address,
-            'nonce': self._w3.eth.getTransactionCount(self._account.address),
-            'gas': 5500000,
-            'gasPrice': self._w3.toWei('1', 'gwei'),
-            **opts
-        })
+        opts = {'from': self._account.address, **opts}
+
+        # fail before signing (and paying for) a transaction which would revert
+        result = self._simulate(contract, opts)
+
+        if dry_run:
+            return {
+                'tx_hash': None,
+                'receipt': None,
+                'transaction': None,
+                'result': result
+            }
+
+        if 'gas' not in opts:
+            opts['gas'] = self._gas_estimator.estimate(contract, opts)
+        if 'gasPrice' not in opts:
+            opts['gasPrice'] = self._gas_price_oracle.price(gas_tier)
+
+        nonce = self._allocate_nonce()
+
+        try:
+            construct_txn = contract.buildTransaction({
+                'nonce': nonce,
+                **opts
+            })
 
-        signed = self._account.signTransaction(construct_txn)
+            if self._metrics is None:
+                signed = self._account.signTransaction(construct_txn)
+            else:
+                with self._metrics.timer('transaction_sign_seconds', self._function_name(contract)):
+                    signed = self._account.signTransaction(construct_txn)
 
-        tx_hash = self._w3.eth.sendRawTransaction(signed.rawTransaction)
+            tx_hash = self._w3.eth.sendRawTransaction(signed.rawTransaction)
+        except Exception as e:
+            self._release_nonce(nonce, e)
+            raise
+
+        broadcast_at = time.monotonic()
 
         logging.info(f"Transaction building started: {tx_hash.hex()}")
 
-        receipt = self._w3.eth.waitForTransactionReceipt(tx_hash, timeout=self._timeout)
+        result = {
+            'tx_hash': tx_hash.hex(),
+            'receipt': None,
+            'transaction': construct_txn
+        }
+
+        if isinstance(contract, ContractConstructor):
+            # known before mining: replacements of a stuck deployment keep the nonce
+            result['contract_address'] = create_address(self._account.address, nonce)
+
+        if on_broadcast is not None:
+            try:
+                on_broadcast(result)
+            except Exception as e:
+                logging.warning(f"Broadcast callback of {tx_hash.hex()} failed: {e}")
 
-        logging.info(f"Transaction was built successfully: {tx_hash.hex()}")
+        if not wait:
+            return result
+
+        # the mined transaction may be a gas bumped replacement of the submitted one
+        receipt = self._supervisor.wait(TrackedTransaction(construct_txn, tx_hash.hex()), timeout=self._timeout)
+
+        if self._metrics is not None:
+            self._metrics.observe_receipt(self._function_name(contract), time.monotonic() - broadcast_at, receipt)
+
+        logging.info(f"Transaction was built successfully: {receipt['transactionHash'].hex()}")
 
         return {
-            'tx_hash': tx_hash.hex(),
+            **result,
+            'tx_hash': receipt['transactionHash'].hex(),
             'receipt': receipt
         }
 
     @staticmethod
-    def _function_check(contract: Contract, function_name: str) -> bool:
-        return function_name in list(map(lambda x: x.fn_name, contract.all_functions()))
+    def _function_name(contract: Union[ContractConstructor, ContractFunction]) -> str:
+        return 'constructor' if isinstance(contract, ContractConstructor) else contract.fn_name
+
+    def _simulate(self, contract: Union[ContractConstructor, ContractFunction], opts: Dict) -> Any:
+        try:
+            if isinstance(contract, ContractConstructor):
+                return self._w3.eth.call({**opts, 'data': contract.data_in_transaction})
+
+            return contract.call(opts)
+        except (ContractLogicError, ValueError) as e:
+            raise TransactionSimulationException(self._function_name(contract), str(e)) from e
+
+    def _allocate_nonce(self) -> int:
+        if self._nonce_manager is None:
+            return self._w3.eth.getTransactionCount(self._account.address)
+
+        return self._nonce_manager.allocate(self._w3, self._account.address)
+
+    def _release_nonce(self, nonce: int, error: Exception) -> NoReturn:
+        if self._nonce_manager is None:
+            return
+
+        if is_nonce_error(error):
+            logging.warning(f"Nonce {nonce} of {self._account.address} was rejected, resyncing: {error}")
+            self._nonce_manager.resync(self._w3, self._account.address)
+        else:
+            self._nonce_manager.release(self._account.address, nonce)
+
+    def _function_check(self, function_name: str) -> bool:
+        return function_name in self._function_index
 
     def ready_check(self) -> bool:
         return self._w3.isConnected()
 
-    def create(self, seller: str, solver: str, value: int, item_id: str) -> Dict:
+    def replace_transaction(self, transaction: Dict) -> Union[None, Tuple[Dict, str]]:
+        """
+        Re-sign a stuck transaction of this signer with the same nonce and a higher gas price.
+
+        Returns the replacement transaction and its hash, or None if it can't be replaced.
+        """
+        return self._supervisor.replace(transaction)
+
+    def wait(self, result: Dict) -> TxReceipt:
+        """Receipt of a transaction submitted with wait=False, which is re-sent with a higher gas price if stuck."""
+        tracked = TrackedTransaction(result['transaction'], result['tx_hash'])
+        return self._supervisor.wait(tracked, timeout=self._timeout)
+
+    def get_receipt(self, tx_hash: str) -> Union[None, TxReceipt]:
+        try:
+            return self._w3.eth.getTransactionReceipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    def create(
+            self,
+            seller: str,
+            solver: str,
+            value: int,
+            item_id: str,
+            wait: bool = True,
+            gas_tier: str = 'standard',
+            dry_run: bool = False,
+            on_broadcast: Union[None, Callable[[Dict], Any]] = None
+    ) -> Dict:
+        """
+        Deploy an escrow of `value` wei for `item_id`, bought by this signer.
+
+        The result holds the `contract_address` of the escrow as soon as the transaction is
+        broadcast, it is also passed to `on_broadcast` before waiting for the receipt.
+        """
         logging.info(f"Building contract with arguments = [{seller}, {solver}, {value}, {item_id}]")
 
         contract = self._build_contract()
         result = self._build_transaction(
             contract.constructor(seller, solver, item_id),
-            {'value': value}
+            {'value': value},
+            wait=wait,
+            gas_tier=gas_tier,
+            dry_run=dry_run,
+            on_broadcast=on_broadcast
         )
 
-        logging.info(f"Contract was built successfully: {result['tx_hash']}")
+        logging.info(f"Contract was submitted successfully: {result['tx_hash']}")
+
+        receipt = result['receipt']
+        if self._field_cache is not None and receipt is not None and receipt['status'] == 1:
+            # the constructor arguments are the escrow's immutable fields
+            self._field_cache.set(result['contract_address'], {
+                'seller': Web3.toChecksumAddress(seller),
+                'solver': Web3.toChecksumAddress(solver),
+                'buyer': self._account.address,
+                'value': value,
+                'item': item_id,
+            })
 
         return result
 
@@ -124,45 +336,67 @@ class ContractWrapper:
 
         logging.info(f"Called contract function with args: address='{address}',fn='{function_name}'")
 
-        if self._function_check(contract, function_name):
-            return contract.get_function_by_name(function_name).__call__(*args, **kwargs).call()
-        else:
+        if not self._function_check(function_name):
             raise FunctionNotFoundException
 
-    def build(self, address: str, function_name: str, *args: list, **kwargs: dict) -> Dict:
+        if self._field_cache is None or function_name not in IMMUTABLE_ESCROW_FIELDS or args or kwargs:
+            return contract.functions[function_name](*args, **kwargs).call()
+
+        cached = self._field_cache.get(address, (function_name,))
+        if function_name in cached:
+            return cached[function_name]
+
+        value = contract.functions[function_name]().call()
+        self._field_cache.set(address, {function_name: value})
+
+        return value
+
+    def build(
+            self,
+            address: str,
+            function_name: str,
+            *args: list,
+            wait: bool = True,
+            gas_tier: str = 'standard',
+            dry_run: bool = False,
+            **kwargs: dict
+    ) -> Dict:
         contract = self.get_contract(address)
 
         logging.info(f"Called building contract with args: address='{address}',fn='{function_name}'")
 
-        if self._function_check(contract, function_name):
-            return self._build_transaction(contract.get_function_by_name(function_name).__call__(*args, **kwargs))
+        if self._function_check(function_name):
+            return self._build_transaction(
+                contract.functions[function_name](*args, **kwargs),
+                wait=wait,
+                gas_tier=gas_tier,
+                dry_run=dry_run
+            )
         else:
             raise FunctionNotFoundException
 
-    def send(self, address: str) -> Dict:
+    def send(self, address: str, wait: bool = True, gas_tier: str = 'standard', dry_run: bool = False) -> Dict:
         logging.info(f"Sending contract, address='{address}'")
 
+        # the simulation checks the Created state and the seller as the caller
         contract = self.get_contract(address)
-        if contract.functions.state().call() != 0:
-            raise InvalidContractFunctionCall("Contract state is not Created. Cannot call 'sent()' function on it.")
-
-        result = self._build_transaction(contract.functions.sent())
+        result = self._build_transaction(contract.functions.sent(), wait=wait, gas_tier=gas_tier, dry_run=dry_run)
 
         logging.info(f"Contract was sent successfully: {result['tx_hash']}")
 
         return result
 
-    def confirm(self, address: str) -> Dict:
+    def confirm(self, address: str, wait: bool = True, gas_tier: str = 'standard', dry_run: bool = False) -> Dict:
         logging.info(f"Confirming receiving contract, address='{address}'")
 
+        # the simulation checks the Locked state and the buyer as the caller
         contract = self.get_contract(address)
-
-        if contract.functions.state().call() != 1:
-            raise InvalidContractFunctionCall(
-                "Contract state is not Locked. Cannot call 'confirmReceived()' function on it."
-            )
-
-        result = self._build_transaction(contract.functions.confirmReceived())
+        result = self._build_transaction(
+            contract.functions.confirmReceived(),
+            wait=wait,
+            gas_tier=gas_tier,
+            dry_run=dry_run
+        )
 
         logging.info(f"Contract receiving was confirmed successfully: {result['tx_hash']}")
 
@@ -171,6 +405,80 @@ class ContractWrapper:
     def get_contract(self, address: str) -> Union[Type[Contract], Contract]:
         return self._build_contract(address)
 
+    def read_many(
+            self,
+            addresses: Iterable[str],
+            function_names: Sequence[str] = ESCROW_VIEW_FUNCTIONS,
+            block_identifier: Union[str, int] = 'latest',
+            batch_size: int = 500
+    ) -> Dict[str, EscrowSnapshot]:
+        """
+        Read view functions of many escrow contracts with batched eth_call requests.
+
+        Returns an EscrowSnapshot per (checksum) address. Values of calls which failed are left None.
+        With a field cache immutable fields are only read once per contract, and the other fields
+        once per block ('latest' is resolved to the current block number first).
+        """
+        contract = self._build_contract()
+
+        for function_name in function_names:
+            if function_name not in EscrowSnapshot._fields or not self._function_check(function_name):
+                raise FunctionNotFoundException(function_name)
+
+        addresses = [Web3.toChecksumAddress(address) for address in addresses]
+        data = {name: contract.encodeABI(fn_name=name) for name in function_names}
+
+        values = defaultdict(dict)
+        cache_blocks = {}
+
+        if self._field_cache is not None:
+            if block_identifier == 'latest':
+                block_identifier = self._w3.eth.blockNumber
+
+            immutable, mutable = split_fields(function_names)
+            cache_blocks = {name: None for name in immutable}
+            if isinstance(block_identifier, int):
+                cache_blocks.update({name: block_identifier for name in mutable})
+
+            fields_by_block = defaultdict(list)
+            for name, block in cache_blocks.items():
+                fields_by_block[block].append(name)
+
+            for block, fields in fields_by_block.items():
+                for address, cached in self._field_cache.get_many(addresses, fields, block).items():
+                    values[address].update(cached)
+
+        keys = [(address, name) for address in addresses for name in function_names if name not in values[address]]
+        calls = [('eth_call', [{'to': address, 'data': data[name]}, block_identifier]) for address, name in keys]
+
+        logging.info(f"Reading {len(calls)} values of {len(addresses)} contracts")
+
+        results = []
+        for start in range(0, len(calls), batch_size):
+            results.extend(make_batch_request(self._w3, calls[start:start + batch_size]))
+
+        fetched = defaultdict(lambda: defaultdict(dict))
+        for (address, name), result in zip(keys, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Reading '{name}' of {address} failed: {result}")
+                continue
+
+            values[address][name] = self._decode_output(self._function_index[name], result)
+
+            if name in cache_blocks:
+                fetched[cache_blocks[name]][address][name] = values[address][name]
+
+        for block, block_values in fetched.items():
+            self._field_cache.set_many(block_values, block)
+
+        return {address: EscrowSnapshot(**values[address]) for address in addresses}
+
+    def _decode_output(self, fn_abi: dict, data: bytes) -> Any:
+        output_types = get_abi_output_types(fn_abi)
+        output = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, self._w3.codec.decode_abi(output_types, data))
+
+        return output[0] if len(output) == 1 else output
+
 
 if __name__ == '__main__':
     infura = 'bc71a2e7b3884039b7903a2870ca56b3'
@@ -0,0 +1,72 @@
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Union
+
+from eth_utils import event_abi_to_log_topic
+from hexbytes import HexBytes
+from web3 import Web3
+
+from .artifact import load_contract_data
+
+__all__ = [
+    'ESCROW_EVENTS',
+    'EscrowEvent',
+    'EscrowEventScanner'
+]
+
+ESCROW_EVENTS = ('Sent', 'ItemReceived', 'ItemNotOk', 'Refund', 'Aborted')
+
+
+class EscrowEvent(NamedTuple):
+    address: str
+    name: str
+    block_number: int
+    log_index: int
+    tx_hash: str
+
+
+class EscrowEventScanner:
+    """
+    Fetches lifecycle events of many escrow contracts with one eth_getLogs request
+    per block range (and per `address_chunk_size` addresses).
+    """
+
+    def __init__(self, w3: Web3, abi: Union[None, list] = None, address_chunk_size: int = 500) -> None:
+        if abi is None:
+            abi = load_contract_data()['abi']
+
+        self._w3 = w3
+        self._address_chunk_size = address_chunk_size
+        self._topics: Dict[bytes, str] = {
+            bytes(event_abi_to_log_topic(entry)): entry['name']
+            for entry in abi
+            if entry['type'] == 'event' and entry['name'] in ESCROW_EVENTS
+        }
+
+    def scan(self, addresses: Iterable[str], from_block: int, to_block: int) -> List[EscrowEvent]:
+        """Events of the given contracts in [from_block, to_block], in chain order."""
+        addresses = [Web3.toChecksumAddress(address) for address in addresses]
+        topics = [HexBytes(topic).hex() for topic in self._topics]
+
+        events = []
+        for start in range(0, len(addresses), self._address_chunk_size):
+            logs = self._w3.eth.getLogs({
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'address': addresses[start:start + self._address_chunk_size],
+                'topics': [topics],
+            })
+
+            for log in logs:
+                name = self._topics.get(bytes(log['topics'][0]))
+                if name is not None:
+                    events.append(EscrowEvent(
+                        address=log['address'],
+                        name=name,
+                        block_number=log['blockNumber'],
+                        log_index=log['logIndex'],
+                        tx_hash=HexBytes(log['transactionHash']).hex()
+                    ))
+
+        logging.info(f"Scanned blocks {from_block}-{to_block} of {len(addresses)} contracts: {len(events)} events")
+
+        return sorted(events, key=lambda event: (event.block_number, event.log_index))
@@ -0,0 +1,32 @@
+__all__ = [
+    'ContractException',
+    'W3ProviderNotConnectedException',
+    'FunctionNotFoundException',
+    'InvalidContractFunctionCall',
+    'TransactionSimulationException'
+]
+
+
+class ContractException(Exception):
+    pass
+
+
+class W3ProviderNotConnectedException(ContractException):
+    pass
+
+
+class FunctionNotFoundException(ContractException):
+    pass
+
+
+class InvalidContractFunctionCall(ContractException):
+    pass
+
+
+class TransactionSimulationException(InvalidContractFunctionCall):
+    """The transaction would revert: its eth_call simulation from the signer's address failed."""
+
+    def __init__(self, function_name: str, reason: str) -> None:
+        super().__init__(f"Simulation of '{function_name}' failed: {reason}")
+        self.function_name = function_name
+        self.reason = reason
@@ -0,0 +1,160 @@
+import abc
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Mapping, NoReturn, Sequence, Tuple, Union
+
+import redis
+from web3 import Web3
+
+__all__ = [
+    'IMMUTABLE_ESCROW_FIELDS',
+    'MUTABLE_ESCROW_FIELDS',
+    'EscrowFieldCache',
+    'LocalEscrowFieldCache',
+    'RedisEscrowFieldCache'
+]
+
+# view functions of Escrow.sol whose values are set by the constructor and never change
+IMMUTABLE_ESCROW_FIELDS = ('seller', 'buyer', 'solver', 'admin', 'value', 'reward', 'item')
+# view functions whose values are only fixed for a given block
+MUTABLE_ESCROW_FIELDS = ('state', 'problem_description')
+
+Values = Dict[str, Any]
+
+
+class EscrowFieldCache(abc.ABC):
+    """
+    Values of escrow view functions by contract address.
+
+    Immutable fields are stored with `block` None and kept for good, mutable fields are
+    stored per block number. Lookups return only the fields which were found.
+    """
+
+    @abc.abstractmethod
+    def get_many(
+            self,
+            addresses: Sequence[str],
+            fields: Sequence[str],
+            block: Union[None, int] = None
+    ) -> Dict[str, Values]:
+        ...
+
+    @abc.abstractmethod
+    def set_many(self, values: Mapping[str, Values], block: Union[None, int] = None) -> NoReturn:
+        ...
+
+    def get(self, address: str, fields: Sequence[str], block: Union[None, int] = None) -> Values:
+        return self.get_many([address], fields, block).get(address, {})
+
+    def set(self, address: str, values: Values, block: Union[None, int] = None) -> NoReturn:
+        self.set_many({address: values}, block)
+
+    @staticmethod
+    def _address(address: str) -> str:
+        return Web3.toChecksumAddress(address)
+
+
+class LocalEscrowFieldCache(EscrowFieldCache):
+    """In-process cache of the last `max_size` addresses (and address, block pairs)."""
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self._lock = threading.Lock()
+        self._max_size = max_size
+        self._entries: 'OrderedDict[Tuple[str, Union[None, int]], Values]' = OrderedDict()
+
+    def get_many(
+            self,
+            addresses: Sequence[str],
+            fields: Sequence[str],
+            block: Union[None, int] = None
+    ) -> Dict[str, Values]:
+        found = {}
+
+        with self._lock:
+            for address in addresses:
+                entry = self._entries.get((self._address(address), block))
+                if entry is None:
+                    continue
+
+                self._entries.move_to_end((self._address(address), block))
+                values = {field: entry[field] for field in fields if field in entry}
+                if values:
+                    found[address] = values
+
+        return found
+
+    def set_many(self, values: Mapping[str, Values], block: Union[None, int] = None) -> NoReturn:
+        with self._lock:
+            for address, fields in values.items():
+                key = (self._address(address), block)
+                self._entries[key] = {**self._entries.get(key, {}), **fields}
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+
+class RedisEscrowFieldCache(EscrowFieldCache):
+    """
+    Cache shared by all processes, one redis hash per address (and address, block pair).
+
+    Hashes of immutable fields don't expire, the ones of mutable fields after `block_ttl`
+    seconds. Redis being unavailable only makes lookups miss.
+    """
+
+    def __init__(self, url: str, prefix: str = 'escrow', block_ttl: int = 300) -> None:
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._block_ttl = block_ttl
+
+    def _key(self, address: str, block: Union[None, int]) -> str:
+        address = self._address(address)
+        return f'{self._prefix}:{address}' if block is None else f'{self._prefix}:{address}:{block}'
+
+    def get_many(
+            self,
+            addresses: Sequence[str],
+            fields: Sequence[str],
+            block: Union[None, int] = None
+    ) -> Dict[str, Values]:
+        pipeline = self._redis.pipeline(transaction=False)
+        for address in addresses:
+            pipeline.hmget(self._key(address, block), *fields)
+
+        try:
+            results = pipeline.execute()
+        except redis.RedisError as e:
+            logging.warning(f"Escrow field cache lookup failed: {e}")
+            return {}
+
+        found = {}
+        for address, result in zip(addresses, results):
+            values = {field: json.loads(value) for field, value in zip(fields, result) if value is not None}
+            if values:
+                found[address] = values
+
+        return found
+
+    def set_many(self, values: Mapping[str, Values], block: Union[None, int] = None) -> NoReturn:
+        pipeline = self._redis.pipeline(transaction=False)
+        for address, fields in values.items():
+            key = self._key(address, block)
+            pipeline.hset(key, mapping={field: json.dumps(value) for field, value in fields.items()})
+            if block is not None:
+                pipeline.expire(key, self._block_ttl)
+
+        try:
+            pipeline.execute()
+        except redis.RedisError as e:
+            logging.warning(f"Escrow field cache update failed: {e}")
+
+
+def split_fields(fields: Iterable[str]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """The immutable and the other fields of `fields`."""
+    fields = tuple(fields)
+    return (
+        tuple(field for field in fields if field in IMMUTABLE_ESCROW_FIELDS),
+        tuple(field for field in fields if field not in IMMUTABLE_ESCROW_FIELDS)
+    )
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Union
+
+from web3 import Web3
+from web3.contract import ContractConstructor, ContractFunction
+
+from .batch import make_batch_request
+from .exceptions import ContractException
+
+__all__ = [
+    'GAS_TIERS',
+    'GasEstimationException',
+    'GasEstimator',
+    'GasPriceOracle',
+    'block_gas_prices',
+    'block_requests',
+    'tier_prices'
+]
+
+# tier -> percentile of the gas prices paid in recent blocks
+GAS_TIERS = {
+    'slow': 30,
+    'standard': 60,
+    'fast': 90,
+}
+
+
+class GasEstimationException(ContractException):
+    pass
+
+
+def _percentile(values: list, percentile: int) -> int:
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percentile // 100)]
+
+
+def block_requests(head: int, sample_blocks: int) -> List[Tuple[str, list]]:
+    return [
+        ('eth_getBlockByNumber', [hex(number), True])
+        for number in range(max(0, head - sample_blocks + 1), head + 1)
+    ]
+
+
+def block_gas_prices(blocks: list) -> List[int]:
+    # some nodes leave gasPrice out of fee market transactions
+    return [
+        transaction['gasPrice']
+        for block in blocks if block and not isinstance(block, Exception)
+        for transaction in block['transactions'] if transaction.get('gasPrice') is not None
+    ]
+
+
+def tier_prices(gas_prices: List[int], min_price: int, max_price: int) -> Dict[str, int]:
+    return {
+        tier: min(max_price, max(min_price, _percentile(gas_prices, percentile)))
+        for tier, percentile in GAS_TIERS.items()
+    }
+
+
+class GasPriceOracle:
+    """
+    Gas prices per tier, sampled from the transactions of the last `sample_blocks` blocks
+    (fetched in one batched request) and cached for `ttl` seconds.
+    """
+
+    def __init__(
+            self,
+            w3: Web3,
+            ttl: float = 30,
+            sample_blocks: int = 20,
+            min_price: int = Web3.toWei(1, 'gwei'),
+            max_price: int = Web3.toWei(500, 'gwei')
+    ) -> None:
+        self._w3 = w3
+        self._ttl = ttl
+        self._sample_blocks = sample_blocks
+        self._min_price = min_price
+        self._max_price = max_price
+
+        self._lock = threading.Lock()
+        self._prices: Dict[str, int] = {}
+        self._sampled_at = 0.0
+
+    def price(self, tier: str = 'standard') -> int:
+        if tier not in GAS_TIERS:
+            raise ValueError(f"Unknown gas tier '{tier}', expected one of {', '.join(GAS_TIERS)}")
+
+        return self.prices()[tier]
+
+    def prices(self) -> Dict[str, int]:
+        with self._lock:
+            if not self._prices or time.monotonic() - self._sampled_at >= self._ttl:
+                self._prices = self._sample()
+                self._sampled_at = time.monotonic()
+
+                logging.info(f"Sampled gas prices: {self._prices}")
+
+            return self._prices
+
+    def _sample(self) -> Dict[str, int]:
+        blocks = make_batch_request(self._w3, block_requests(self._w3.eth.blockNumber, self._sample_blocks))
+
+        gas_prices = block_gas_prices(blocks)
+        if not gas_prices:
+            gas_prices = [self._w3.eth.gasPrice]
+
+        return tier_prices(gas_prices, self._min_price, self._max_price)
+
+
+class GasEstimator:
+    """
+    Gas limits from eth_estimateGas plus a safety `margin`.
+
+    Estimates are cached by contract function and shape of its arguments, i.e. the
+    length of the abi encoded call data (strings and bytes change it by 32 byte words).
+    """
+
+    def __init__(self, margin: float = 1.2, cache_size: int = 256) -> None:
+        self._margin = margin
+        self._cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[Tuple[str, int, bool], int]' = OrderedDict()
+
+    @staticmethod
+    def key(contract: Union[ContractConstructor, ContractFunction], value: int) -> Tuple[str, int, bool]:
+        # abi encoded call data has the same length for arguments of the same shape
+        if isinstance(contract, ContractConstructor):
+            name, data = 'constructor', contract.data_in_transaction
+        else:
+            name, data = contract.fn_name, contract._encode_transaction_data()
+
+        return name, len(data), bool(value)
+
+    def estimate(self, contract: Union[ContractConstructor, ContractFunction], transaction: Dict) -> int:
+        key = self.key(contract, transaction.get('value', 0))
+
+        limit = self.lookup(key)
+        if limit is not None:
+            return limit
+
+        try:
+            gas = contract.estimateGas(transaction)
+        except Exception as e:
+            raise GasEstimationException(f"Gas estimation of '{key[0]}' failed: {e}") from e
+
+        return self.store(key, gas)
+
+    def lookup(self, key: Tuple[str, int, bool]) -> Union[None, int]:
+        """Cached gas limit of a key(), None if it was not estimated yet."""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        return None
+
+    def store(self, key: Tuple[str, int, bool], gas: int) -> int:
+        """Cache the gas limit for an eth_estimateGas result and return it."""
+        limit = int(gas * self._margin)
+
+        with self._lock:
+            self._cache[key] = limit
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+        logging.info(f"Estimated gas of '{key[0]}': {gas}, limit {limit}")
+
+        return limit
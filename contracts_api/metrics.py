@@ -0,0 +1,206 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Sequence, Tuple, Union
+
+from eth_utils import function_abi_to_4byte_selector
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess, start_http_server
+from web3.providers import BaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .artifact import load_function_index
+from .batch import WrappingProvider
+
+__all__ = [
+    'Metrics',
+    'InstrumentedProvider',
+    'start_metrics_server',
+    'transaction_function'
+]
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+CONFIRMATION_BUCKETS = (5, 10, 15, 30, 60, 120, 180, 300, 600, 1200, 1800)
+GAS_BUCKETS = (25000, 50000, 100000, 200000, 300000, 500000, 1000000, 2000000)
+
+# method label of JSON-RPC batches, their calls are counted per method but timed as a whole
+BATCH = 'batch'
+
+
+class Metrics:
+    """
+    Prometheus metrics of contract wrappers, as counters and histograms with one label each:
+
+    * rpc_requests_total, rpc_errors_total (method) - JSON-RPC requests, batched calls included
+    * rpc_request_seconds (method) - duration of JSON-RPC requests, batches are timed as 'batch'
+    * rpc_throttled_seconds (method) - time requests waited for RPC quota (see RateLimitedProvider)
+    * transaction_sign_seconds (function) - signing of contract transactions
+    * transaction_confirmation_seconds (function) - from broadcast until the transaction is mined
+    * transaction_gas_used (function) - gas used by mined contract transactions
+
+    Every instance registers its metrics in a `registry` of its own. With PROMETHEUS_MULTIPROC_DIR
+    set, values are kept in that directory, so the metrics of all processes of a worker node
+    (recycled ones included) are served by one exporter (see start_metrics_server).
+    Wrappers without a Metrics instance are not instrumented at all.
+    """
+
+    HISTOGRAMS: Mapping[str, Tuple[str, Sequence[float], str]] = {
+        'rpc_request_seconds': ('method', LATENCY_BUCKETS, 'Duration of JSON-RPC requests'),
+        'rpc_throttled_seconds': ('method', LATENCY_BUCKETS, 'Time JSON-RPC requests waited for RPC quota'),
+        'transaction_sign_seconds': ('function', LATENCY_BUCKETS, 'Duration of signing contract transactions'),
+        'transaction_confirmation_seconds': (
+            'function', CONFIRMATION_BUCKETS, 'Time from broadcast until contract transactions are mined'
+        ),
+        'transaction_gas_used': ('function', GAS_BUCKETS, 'Gas used by mined contract transactions'),
+    }
+    COUNTERS: Mapping[str, Tuple[str, str]] = {
+        'rpc_requests_total': ('method', 'JSON-RPC requests'),
+        'rpc_errors_total': ('method', 'JSON-RPC requests answered with an error or failed'),
+    }
+
+    def __init__(self, namespace: str = 'contracts_api', registry: Union[None, CollectorRegistry] = None) -> None:
+        self.namespace = namespace
+        self.registry = registry if registry is not None else CollectorRegistry()
+
+        self._histograms = {
+            name: Histogram(name, description, [label], namespace=namespace, buckets=buckets, registry=self.registry)
+            for name, (label, buckets, description) in self.HISTOGRAMS.items()
+        }
+        self._counters = {
+            name: Counter(name, description, [label], namespace=namespace, registry=self.registry)
+            for name, (label, description) in self.COUNTERS.items()
+        }
+
+    def observe(self, name: str, label: str, value: float) -> None:
+        self._histograms[name].labels(label).observe(value)
+
+    def increment(self, name: str, label: str, amount: float = 1) -> None:
+        self._counters[name].labels(label).inc(amount)
+
+    @contextmanager
+    def timer(self, name: str, label: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, label, time.perf_counter() - started)
+
+    def observe_receipt(self, function: str, broadcast_seconds: float, receipt: Mapping[str, Any]) -> None:
+        """Confirmation latency and gas used of a mined transaction."""
+        self.observe('transaction_confirmation_seconds', function, broadcast_seconds)
+        self.observe('transaction_gas_used', function, receipt['gasUsed'])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Values of this process: {name: {label value: count or {'count', 'sum', 'buckets'}}}."""
+        snapshot: Dict[str, Dict[str, Any]] = {name: {} for name in (*self.COUNTERS, *self.HISTOGRAMS)}
+        prefix = f'{self.namespace}_'
+
+        for family in self.registry.collect():
+            for sample in family.samples:
+                name = sample.name[len(prefix):]
+                label = next(iter(sample.labels.values()), None)
+
+                if name in self.COUNTERS:
+                    snapshot[name][label] = sample.value
+                    continue
+
+                histogram_name, _, suffix = name.rpartition('_')
+                if histogram_name not in self.HISTOGRAMS or suffix not in ('bucket', 'count', 'sum'):
+                    continue
+
+                histogram = snapshot[histogram_name].setdefault(label, {'count': 0, 'sum': 0.0, 'buckets': {}})
+                if suffix == 'bucket':
+                    histogram['buckets'][float(sample.labels['le'])] = sample.value
+                else:
+                    histogram[suffix] = sample.value
+
+        return snapshot
+
+    def render(self) -> str:
+        """The metrics of this process in the Prometheus text exposition format."""
+        return generate_latest(self.registry).decode()
+
+
+class InstrumentedProvider(WrappingProvider):
+    """Counts and times every request passed to `provider` in `metrics`."""
+
+    def __init__(self, provider: BaseProvider, metrics: Metrics) -> None:
+        super().__init__(provider)
+        self.metrics = metrics
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        self.metrics.increment('rpc_requests_total', method)
+
+        started = time.perf_counter()
+        try:
+            response = super().make_request(method, params)
+        except Exception:
+            self.metrics.increment('rpc_errors_total', method)
+            raise
+        finally:
+            self.metrics.observe('rpc_request_seconds', method, time.perf_counter() - started)
+
+        if 'error' in response:
+            self.metrics.increment('rpc_errors_total', method)
+
+        return response
+
+    def send_batch(self, payload: List[dict]) -> List[dict]:
+        for request in payload:
+            self.metrics.increment('rpc_requests_total', request['method'])
+
+        with self.metrics.timer('rpc_request_seconds', BATCH):
+            responses = super().send_batch(payload)
+
+        if not isinstance(responses, list):
+            for request in payload:
+                self.metrics.increment('rpc_errors_total', request['method'])
+            return responses
+
+        methods = {request['id']: request['method'] for request in payload}
+        for response in responses:
+            if 'error' in response:
+                self.metrics.increment('rpc_errors_total', methods.get(response.get('id'), BATCH))
+
+        return responses
+
+
+def start_metrics_server(port: int, metrics: Union[None, Metrics] = None, address: str = '') -> bool:
+    """
+    Serve metrics to Prometheus from a daemon thread, False if the port can't be bound.
+
+    With PROMETHEUS_MULTIPROC_DIR set the metrics of all processes which write to that directory
+    are served, run one server per worker node. Otherwise the server serves `metrics`.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    elif metrics is not None:
+        registry = metrics.registry
+    else:
+        raise ValueError("Metrics to serve are needed without PROMETHEUS_MULTIPROC_DIR")
+
+    try:
+        start_http_server(port, address, registry=registry)
+    except OSError as e:
+        logging.warning(f"Metrics server could not listen on port {port}: {e}")
+        return False
+
+    logging.info(f"Serving contract metrics on port {port}")
+
+    return True
+
+
+_selectors: Dict[str, str] = {}
+
+
+def transaction_function(transaction: Mapping[str, Any]) -> str:
+    """Name of the escrow function a transaction calls, 'constructor' for deployments."""
+    if not transaction.get('to'):
+        return 'constructor'
+
+    if not _selectors:
+        for name, entry in load_function_index().items():
+            _selectors['0x' + function_abi_to_4byte_selector(entry).hex()] = name
+
+    return _selectors.get(str(transaction.get('data', ''))[:10].lower(), 'unknown')
@@ -0,0 +1,186 @@
+import abc
+import logging
+import threading
+from typing import Dict, NoReturn, Set, Union
+
+import redis
+from web3 import Web3
+
+__all__ = [
+    'NonceManager',
+    'LocalNonceManager',
+    'RedisNonceManager',
+    'is_nonce_error',
+    'is_underpriced_error'
+]
+
+# node error messages which mean the local nonce view drifted from the chain, a new transaction
+# is an underpriced replacement when its nonce is taken by a pending transaction
+NONCE_ERRORS = (
+    'nonce too low',
+    'nonce too high',
+    'already known',
+    'known transaction',
+    'replacement transaction underpriced',
+)
+
+
+def is_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(text in message for text in NONCE_ERRORS)
+
+
+def is_underpriced_error(error: Exception) -> bool:
+    """The node rejected the gas price, e.g. a replacement raised less than it requires."""
+    return 'underpriced' in str(error).lower()
+
+
+class NonceManager(abc.ABC):
+    """
+    Hands out transaction nonces per signing address without asking the chain every time.
+
+    A nonce which was allocated but never broadcast must be given back with release(),
+    otherwise every later transaction of the address is stuck behind the gap.
+
+    allocate() and resync() read the chain nonce through `w3`. Callers without a
+    synchronous connection (see AsyncContractWrapper) use allocate_tracked() and seed()
+    with a chain nonce they read themselves.
+    """
+
+    @abc.abstractmethod
+    def allocate_tracked(self, address: str) -> Union[None, int]:
+        """Next nonce of an address the manager already tracks, None for an unknown address."""
+
+    @abc.abstractmethod
+    def seed(self, address: str, chain_nonce: int, overwrite: bool = False) -> NoReturn:
+        """Start counting the address at `chain_nonce`, `overwrite` drops its counter and released nonces."""
+
+    @abc.abstractmethod
+    def release(self, address: str, nonce: int) -> NoReturn:
+        ...
+
+    def allocate(self, w3: Web3, address: str) -> int:
+        nonce = self.allocate_tracked(address)
+        if nonce is not None:
+            return nonce
+
+        # first use of the address: whoever seeds the counter wins, everyone else just increments it
+        self.seed(address, self._chain_nonce(w3, address))
+
+        return self.allocate_tracked(address)
+
+    def resync(self, w3: Web3, address: str) -> NoReturn:
+        chain_nonce = self._chain_nonce(w3, address)
+
+        logging.info(f"Resynced nonce of {address} from the chain: {chain_nonce}")
+
+        self.seed(address, chain_nonce, overwrite=True)
+
+    @staticmethod
+    def _chain_nonce(w3: Web3, address: str) -> int:
+        return w3.eth.getTransactionCount(address, 'pending')
+
+
+class LocalNonceManager(NonceManager):
+    """In-process nonce manager, only safe while a single process signs for an address."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next: Dict[str, int] = {}
+        self._released: Dict[str, Set[int]] = {}
+
+    def allocate_tracked(self, address: str) -> Union[None, int]:
+        with self._lock:
+            released = self._released.setdefault(address, set())
+            if released:
+                nonce = min(released)
+                released.remove(nonce)
+                return nonce
+
+            if address not in self._next:
+                return None
+
+            nonce = self._next[address]
+            self._next[address] += 1
+            return nonce
+
+    def seed(self, address: str, chain_nonce: int, overwrite: bool = False) -> NoReturn:
+        with self._lock:
+            if overwrite:
+                self._next[address] = chain_nonce
+                self._released.pop(address, None)
+            else:
+                self._next.setdefault(address, chain_nonce)
+
+    def release(self, address: str, nonce: int) -> NoReturn:
+        with self._lock:
+            if self._next.get(address) == nonce + 1:
+                self._next[address] = nonce
+            else:
+                self._released.setdefault(address, set()).add(nonce)
+
+
+class RedisNonceManager(NonceManager):
+    """
+    Nonce manager shared by all worker processes through an atomic redis counter.
+
+    Released nonces are reused before new ones are handed out. Counters expire after
+    `ttl` idle seconds, so an address is re-read from the chain after it was used elsewhere.
+    """
+
+    # KEYS: next, released; ARGV: ttl
+    ALLOCATE_SCRIPT = """
+        local released = redis.call('ZRANGE', KEYS[2], 0, 0)
+        if released[1] then
+            redis.call('ZREM', KEYS[2], released[1])
+            return tonumber(released[1])
+        end
+        if redis.call('EXISTS', KEYS[1]) == 0 then
+            return -1
+        end
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+        return redis.call('INCR', KEYS[1]) - 1
+    """
+
+    # KEYS: next, released; ARGV: nonce, ttl
+    RELEASE_SCRIPT = """
+        local nonce = tonumber(ARGV[1])
+        if tonumber(redis.call('GET', KEYS[1])) == nonce + 1 then
+            redis.call('SET', KEYS[1], nonce, 'EX', ARGV[2])
+        else
+            redis.call('ZADD', KEYS[2], nonce, nonce)
+            redis.call('EXPIRE', KEYS[2], ARGV[2])
+        end
+        return nonce
+    """
+
+    def __init__(self, url: str, prefix: str = 'nonce', ttl: int = 600) -> None:
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._ttl = ttl
+
+        self._allocate = self._redis.register_script(self.ALLOCATE_SCRIPT)
+        self._release = self._redis.register_script(self.RELEASE_SCRIPT)
+
+    def _keys(self, address: str) -> list:
+        address = address.lower()
+        return [f'{self._prefix}:{address}:next', f'{self._prefix}:{address}:released']
+
+    def allocate_tracked(self, address: str) -> Union[None, int]:
+        nonce = self._allocate(keys=self._keys(address), args=[self._ttl])
+        return nonce if nonce >= 0 else None
+
+    def seed(self, address: str, chain_nonce: int, overwrite: bool = False) -> NoReturn:
+        next_key, released_key = self._keys(address)
+
+        if not overwrite:
+            self._redis.set(next_key, chain_nonce, ex=self._ttl, nx=True)
+            return
+
+        pipeline = self._redis.pipeline()
+        pipeline.set(next_key, chain_nonce, ex=self._ttl)
+        pipeline.delete(released_key)
+        pipeline.execute()
+
+    def release(self, address: str, nonce: int) -> NoReturn:
+        self._release(keys=self._keys(address), args=[nonce, self._ttl])
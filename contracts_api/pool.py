@@ -0,0 +1,217 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NoReturn, Union
+
+from web3 import Web3
+
+from .contract_wrapper import ContractWrapper, W3ProviderNotConnectedException
+from .fieldcache import EscrowFieldCache
+from .gas import GasEstimator, GasPriceOracle
+from .metrics import Metrics
+from .nonce import NonceManager
+from .ratelimit import RateLimiter
+from .providers import connect
+from .receipts import ReceiptResolver
+
+__all__ = [
+    'ContractWrapperPool',
+    'get_wrapper_pool'
+]
+
+
+class ContractWrapperPool:
+    """
+    Keeps one live provider connection per process and hands out
+    per-signer ContractWrapper handles which share it.
+
+    Handles are kept in a bounded LRU keyed by private key. The connection is
+    health checked at most once per `health_check_interval` seconds and is
+    re-established (dropping all handles bound to it) when the check fails.
+
+    The connection uses the `provider_backend` (websocket, http, ipc or the in-process
+    tester chain, or a recorded cassette) at `provider_uri`, Infura's Ropsten endpoint by
+    default. With `record_rpc_to` all requests are recorded to a cassette at that path.
+    With `metrics` requests and transactions of all handles are counted and timed, with a
+    `rate_limiter` requests wait for (or without `rate_limit_wait` fail on exhausted) RPC quota.
+    All handles read escrow fields through the `field_cache`.
+
+    With `resolve_receipts_by_block` the handles wait for receipts through one
+    ReceiptResolver per connection instead of polling every transaction separately.
+    The resolver of a websocket connection fetches receipts on a websocket of its own.
+    """
+
+    def __init__(
+            self,
+            infura_key: str,
+            max_size: int = 32,
+            timeout: int = 600,
+            health_check_interval: float = 30,
+            reconnect_attempts: int = 3,
+            nonce_manager: Union[None, NonceManager] = None,
+            resolve_receipts_by_block: bool = False,
+            gas_price_ttl: float = 30,
+            gas_limit_margin: float = 1.2,
+            stuck_after: float = 180,
+            max_gas_price: int = Web3.toWei(200, 'gwei'),
+            provider_backend: str = 'websocket',
+            provider_uri: Union[None, str] = None,
+            record_rpc_to: Union[None, str] = None,
+            metrics: Union[None, Metrics] = None,
+            rate_limiter: Union[None, RateLimiter] = None,
+            rate_limit_wait: bool = True,
+            field_cache: Union[None, EscrowFieldCache] = None
+    ) -> None:
+        self._infura_key = infura_key
+        self._max_size = max_size
+        self._timeout = timeout
+        self._health_check_interval = health_check_interval
+        self._reconnect_attempts = reconnect_attempts
+        self._nonce_manager = nonce_manager
+        self._resolve_receipts_by_block = resolve_receipts_by_block
+        self._gas_price_ttl = gas_price_ttl
+        self._gas_estimator = GasEstimator(margin=gas_limit_margin)
+        self._stuck_after = stuck_after
+        self._max_gas_price = max_gas_price
+        self._provider_backend = provider_backend
+        self._provider_uri = provider_uri
+        self._record_rpc_to = record_rpc_to
+        self._metrics = metrics
+        self._rate_limiter = rate_limiter
+        self._rate_limit_wait = rate_limit_wait
+        self._field_cache = field_cache
+
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._w3: Union[None, Web3] = None
+        self._receipt_resolver: Union[None, ReceiptResolver] = None
+        self._gas_price_oracle: Union[None, GasPriceOracle] = None
+        self._last_health_check = 0.0
+        self._wrappers: 'OrderedDict[str, ContractWrapper]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._wrappers)
+
+    def get(self, private_key: str) -> ContractWrapper:
+        with self._lock:
+            w3 = self._get_w3()
+
+            wrapper = self._wrappers.get(private_key)
+            if wrapper is not None:
+                self._wrappers.move_to_end(private_key)
+                return wrapper
+
+            wrapper = ContractWrapper(
+                self._infura_key,
+                private_key,
+                timeout=self._timeout,
+                w3=w3,
+                nonce_manager=self._nonce_manager,
+                receipt_resolver=self._receipt_resolver,
+                gas_price_oracle=self._gas_price_oracle,
+                gas_estimator=self._gas_estimator,
+                stuck_after=self._stuck_after,
+                max_gas_price=self._max_gas_price,
+                metrics=self._metrics,
+                field_cache=self._field_cache
+            )
+            self._wrappers[private_key] = wrapper
+
+            if len(self._wrappers) > self._max_size:
+                self._wrappers.popitem(last=False)
+
+            return wrapper
+
+    def get_w3(self) -> Web3:
+        """The shared connection, for reads which do not need a signer."""
+        with self._lock:
+            return self._get_w3()
+
+    def reset(self) -> NoReturn:
+        """Drop the connection and all handles, the next get() reconnects."""
+        with self._lock:
+            if self._receipt_resolver is not None:
+                self._receipt_resolver.stop()
+
+            self._w3 = None
+            self._receipt_resolver = None
+            self._gas_price_oracle = None
+            self._wrappers.clear()
+            self._last_health_check = 0.0
+
+    def _get_w3(self) -> Web3:
+        if self._pid != os.getpid():
+            # a forked worker child must not share the parent's socket
+            logging.info("Contract Wrapper Pool was forked, reconnecting")
+            self._pid = os.getpid()
+            self.reset()
+
+        if self._w3 is None:
+            self._connect()
+        elif time.monotonic() - self._last_health_check >= self._health_check_interval:
+            if self._is_healthy(self._w3):
+                self._last_health_check = time.monotonic()
+            else:
+                logging.warning(f"Contract Wrapper Pool connection is unhealthy, reconnecting: {self._infura_key}")
+                self._connect()
+
+        return self._w3
+
+    def _connect(self) -> NoReturn:
+        self.reset()
+
+        for attempt in range(1, self._reconnect_attempts + 1):
+            w3 = self._new_connection()
+
+            if self._is_healthy(w3):
+                self._w3 = w3
+                self._last_health_check = time.monotonic()
+                self._gas_price_oracle = GasPriceOracle(w3, ttl=self._gas_price_ttl)
+
+                if self._resolve_receipts_by_block:
+                    # web3's WebsocketProvider can't be shared with the resolver thread
+                    resolver_w3 = self._new_connection() if self._provider_backend == 'websocket' else w3
+                    self._receipt_resolver = ReceiptResolver(resolver_w3)
+
+                logging.info(f"Contract Wrapper Pool connected, attempt {attempt}")
+                return
+
+            logging.warning(f"Contract Wrapper Pool connection attempt {attempt} failed")
+
+        raise W3ProviderNotConnectedException(
+            f'w3.py is not connected to the {self._provider_backend} provider: {self._provider_uri or self._infura_key}'
+        )
+
+    def _new_connection(self) -> Web3:
+        return connect(
+            self._provider_backend,
+            self._provider_uri,
+            infura_key=self._infura_key,
+            record_to=self._record_rpc_to,
+            metrics=self._metrics,
+            rate_limiter=self._rate_limiter,
+            rate_limit_wait=self._rate_limit_wait
+        )
+
+    @staticmethod
+    def _is_healthy(w3: Web3) -> bool:
+        try:
+            return w3.isConnected()
+        except Exception as e:
+            logging.warning(f"Contract Wrapper Pool health check failed: {e}")
+            return False
+
+
+_pools: Dict[str, ContractWrapperPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_wrapper_pool(infura_key: str, **kwargs: dict) -> ContractWrapperPool:
+    """Process wide pool for the given provider key, created on first use."""
+    with _pools_lock:
+        pool = _pools.get(infura_key)
+        if pool is None:
+            pool = _pools[infura_key] = ContractWrapperPool(infura_key, **kwargs)
+        return pool
@@ -0,0 +1,236 @@
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Union
+
+import requests
+from eth_account import Account
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.providers import BaseProvider, HTTPProvider, IPCProvider, WebsocketProvider
+from web3.providers.eth_tester import EthereumTesterProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .artifact import CONTRACT_PATH, load_contract_data
+from .balancer import LoadBalancedProvider
+from .cassette import RecordingProvider, ReplayProvider
+from .exceptions import ContractException
+from .metrics import InstrumentedProvider, Metrics
+from .ratelimit import RateLimitedProvider, RateLimiter
+
+__all__ = [
+    'PROVIDER_BACKENDS',
+    'ProviderConfigurationException',
+    'TestChain',
+    'get_test_chain',
+    'make_provider',
+    'connect'
+]
+
+PROVIDER_BACKENDS = ('websocket', 'http', 'ipc', 'tester', 'replay')
+
+_NONCE_GAP = re.compile(r'Expected (\d+), but got (\d+)')
+
+
+class ProviderConfigurationException(ContractException):
+    pass
+
+
+class _SerializedTesterProvider(EthereumTesterProvider):
+    """
+    eth-tester provider behaving more like a node for concurrent wrappers.
+
+    eth-tester is not thread safe, so requests run one at a time. It has no transaction pool
+    either: transactions with a nonce ahead of their sender's are held back (and their hash
+    returned) until the gap is filled. Reverts are answered with JSON-RPC errors.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._queued: Dict[str, Dict[int, str]] = {}
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        from eth_tester.exceptions import TransactionFailed
+
+        with self._lock:
+            try:
+                if method == 'eth_sendRawTransaction':
+                    return self._send_raw_transaction(params[0])
+
+                return super().make_request(method, params)
+            except TransactionFailed as e:
+                return RPCResponse({'error': {'code': -32000, 'message': str(e)}})
+
+    def _send_raw_transaction(self, raw_transaction: str) -> RPCResponse:
+        from eth_utils import ValidationError
+
+        sender = Account.recover_transaction(raw_transaction)
+
+        try:
+            response = super().make_request('eth_sendRawTransaction', [raw_transaction])
+        except ValidationError as e:
+            match = _NONCE_GAP.search(str(e))
+            if match is None or int(match.group(2)) <= int(match.group(1)):
+                return RPCResponse({'error': {'code': -32000, 'message': str(e)}})
+
+            self._queued.setdefault(sender, {})[int(match.group(2))] = raw_transaction
+            return RPCResponse({'result': Web3.keccak(hexstr=raw_transaction).hex()})
+
+        # transactions waiting for this one
+        queued = self._queued.get(sender, {})
+        while queued:
+            nonce = self.ethereum_tester.get_nonce(sender)
+            if nonce not in queued:
+                break
+            try:
+                super().make_request('eth_sendRawTransaction', [queued.pop(nonce)])
+            except Exception as e:
+                logging.warning(f"Queued test chain transaction of {sender} with nonce {nonce} failed: {e}")
+                break
+
+        return response
+
+
+class TestChain:
+    """
+    In-process eth-tester (py-evm) chain with funded accounts and an Escrow deployed from truffle/Contract.json.
+
+    `private_keys` sign for `accounts` (buyer, seller, solver, ... in this order), `escrow_address`
+    is an escrow bought by the first account from the second, with the third as the solver.
+    """
+
+    def __init__(self, escrow_value: int = Web3.toWei(1, 'ether')) -> None:
+        try:
+            from eth_tester import EthereumTester, PyEVMBackend
+        except ImportError as e:
+            raise ProviderConfigurationException(
+                "The 'tester' provider needs eth-tester with py-evm: pip install -r requirements-dev.txt"
+            ) from e
+
+        self.backend = PyEVMBackend()
+        self.tester = EthereumTester(self.backend)
+        self.provider = _SerializedTesterProvider(self.tester)
+        self.w3 = Web3(self.provider)
+
+        self.accounts: List[str] = [key.public_key.to_checksum_address() for key in self.backend.account_keys]
+        self.private_keys: List[str] = [key.to_hex() for key in self.backend.account_keys]
+
+        self.escrow_address = self.deploy_escrow(self.accounts[0], self.accounts[1], self.accounts[2], escrow_value)
+
+    def deploy_escrow(self, buyer: str, seller: str, solver: str, value: int, item_id: str = '0') -> str:
+        contract_data = load_contract_data(CONTRACT_PATH)
+        factory = self.w3.eth.contract(abi=contract_data['abi'], bytecode=contract_data['bytecode'])
+
+        tx_hash = factory.constructor(seller, solver, item_id).transact({'from': buyer, 'value': value})
+        address = self.w3.eth.waitForTransactionReceipt(tx_hash)['contractAddress']
+
+        logging.info(f"Deployed escrow to the test chain: {address}")
+
+        return address
+
+
+_test_chain: Union[None, TestChain] = None
+_test_chain_lock = threading.Lock()
+
+
+def get_test_chain() -> TestChain:
+    """The process wide test chain, every 'tester' provider connects to the same one."""
+    global _test_chain
+
+    with _test_chain_lock:
+        if _test_chain is None:
+            _test_chain = TestChain()
+
+        return _test_chain
+
+
+def _http_session(pool_size: int) -> requests.Session:
+    # keep-alive connections, reused by all requests to the endpoint
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def make_provider(
+        backend: str = 'websocket',
+        uri: Union[None, str] = None,
+        infura_key: Union[None, str] = None,
+        timeout: int = 10,
+        http_pool_size: int = 10,
+        record_to: Union[None, str] = None,
+        metrics: Union[None, Metrics] = None,
+        rate_limiter: Union[None, RateLimiter] = None,
+        rate_limit_wait: bool = True
+) -> BaseProvider:
+    """
+    Provider of the given backend.
+
+    Without an `uri` the websocket and http backends connect to Ropsten through Infura,
+    the ipc backend to the default geth socket path. Several comma separated uris are load
+    balanced, the first one is the primary (see LoadBalancedProvider). The replay backend serves
+    the cassette at `uri`; with `record_to` all requests are recorded to a cassette at that path, with
+    `metrics` they are counted and timed. With a `rate_limiter` requests wait for quota (or fail
+    right away without `rate_limit_wait`, see RateLimitedProvider).
+    """
+    if backend not in PROVIDER_BACKENDS:
+        raise ProviderConfigurationException(
+            f"Unknown provider backend '{backend}', expected one of {', '.join(PROVIDER_BACKENDS)}"
+        )
+
+    if uri is not None and ',' in uri:
+        provider = LoadBalancedProvider([
+            _make_provider(backend, endpoint_uri.strip(), infura_key, timeout, http_pool_size)
+            for endpoint_uri in uri.split(',')
+        ])
+    else:
+        provider = _make_provider(backend, uri, infura_key, timeout, http_pool_size)
+
+    if record_to is not None:
+        provider = RecordingProvider(provider, record_to)
+
+    if metrics is not None:
+        provider = InstrumentedProvider(provider, metrics)
+
+    if rate_limiter is not None:
+        provider = RateLimitedProvider(provider, rate_limiter, wait=rate_limit_wait, metrics=metrics)
+
+    return provider
+
+
+def _make_provider(
+        backend: str,
+        uri: Union[None, str],
+        infura_key: Union[None, str],
+        timeout: int,
+        http_pool_size: int
+) -> BaseProvider:
+    if backend == 'replay':
+        if uri is None:
+            raise ProviderConfigurationException("The replay provider needs the path of a cassette as its uri")
+
+        return ReplayProvider(uri)
+
+    if backend == 'tester':
+        return get_test_chain().provider
+
+    if backend == 'ipc':
+        return IPCProvider(uri, timeout=timeout)
+
+    if uri is None:
+        if infura_key is None:
+            raise ProviderConfigurationException(f"The {backend} provider needs an uri or an infura key")
+
+        scheme, path = ('wss', 'ws/v3') if backend == 'websocket' else ('https', 'v3')
+        uri = f'{scheme}://ropsten.infura.io/{path}/{infura_key}'
+
+    if backend == 'websocket':
+        return WebsocketProvider(uri, websocket_timeout=timeout)
+
+    return HTTPProvider(uri, request_kwargs={'timeout': timeout}, session=_http_session(http_pool_size))
+
+
+def connect(backend: str = 'websocket', uri: Union[None, str] = None, **kwargs: Any) -> Web3:
+    return Web3(make_provider(backend, uri, **kwargs))
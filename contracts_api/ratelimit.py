@@ -0,0 +1,223 @@
+import abc
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Tuple, Union
+
+import redis
+from web3.providers import BaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .batch import WrappingProvider
+from .exceptions import ContractException
+from .metrics import Metrics
+
+__all__ = [
+    'RateLimitExceededException',
+    'RateLimiter',
+    'LocalRateLimiter',
+    'RedisRateLimiter',
+    'RateLimitedProvider',
+    'METHOD_WEIGHTS'
+]
+
+# quota units of JSON-RPC methods, methods not listed weigh 1
+METHOD_WEIGHTS: Mapping[str, int] = {
+    'eth_getLogs': 5,
+    'eth_estimateGas': 2,
+    'eth_sendRawTransaction': 2,
+    'eth_getBlockByNumber': 2,
+}
+
+
+class RateLimitExceededException(ContractException):
+    pass
+
+
+class RateLimiter(abc.ABC):
+    """
+    Token bucket holding up to `burst` quota units, refilled with `rate` units per second.
+
+    acquire() takes units from the bucket. If there are not enough, the caller waits until the
+    bucket is refilled (at most `max_wait` seconds), or fails fast with RateLimitExceededException.
+    Waiting callers reserve their units right away, so they are served in the order they came.
+    A request heavier than `burst` could never be served, it takes the whole bucket instead.
+    """
+
+    def __init__(self, rate: float, burst: Union[None, float] = None, max_wait: float = 30) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.max_wait = max_wait
+
+    def acquire(self, weight: float = 1, wait: bool = True) -> float:
+        """Take `weight` units, returns the seconds the caller was throttled."""
+        max_wait = self.max_wait if wait else 0
+        weight = min(weight, self.burst)
+        delay = self._reserve(weight, max_wait)
+
+        if delay > max_wait:
+            raise RateLimitExceededException(f"RPC quota exhausted, {weight} units are available in {delay:.2f}s")
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    @abc.abstractmethod
+    def _reserve(self, weight: float, max_wait: float) -> float:
+        """Seconds until `weight` units are available; they are taken unless that is longer than `max_wait`."""
+
+    def _take(self, tokens: float, elapsed: float, weight: float, max_wait: float) -> Tuple[float, float]:
+        tokens = min(self.burst, tokens + elapsed * self.rate)
+        delay = max(0.0, (weight - tokens) / self.rate)
+
+        if delay <= max_wait:
+            tokens -= weight
+
+        return tokens, delay
+
+
+class LocalRateLimiter(RateLimiter):
+    """In-process token bucket, the quota is only respected while a single process uses it."""
+
+    def __init__(self, rate: float, burst: Union[None, float] = None, max_wait: float = 30) -> None:
+        super().__init__(rate, burst, max_wait)
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def _reserve(self, weight: float, max_wait: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, delay = self._take(self._tokens, now - self._updated_at, weight, max_wait)
+            self._updated_at = now
+
+            return delay
+
+
+class RedisRateLimiter(RateLimiter):
+    """Token bucket shared by all worker and web processes through redis, on the clock of the redis server."""
+
+    # KEYS: bucket; ARGV: rate, burst, weight, max_wait
+    RESERVE_SCRIPT = """
+        redis.replicate_commands()
+        local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+        local weight, max_wait = tonumber(ARGV[3]), tonumber(ARGV[4])
+
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+        local tokens = tonumber(bucket[1]) or burst
+        local updated_at = tonumber(bucket[2]) or now
+
+        tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+        local delay = math.max(0, (weight - tokens) / rate)
+
+        if delay <= max_wait then
+            tokens = tokens - weight
+        end
+
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+        redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+
+        return tostring(delay)
+    """
+
+    def __init__(
+            self,
+            url: str,
+            rate: float,
+            burst: Union[None, float] = None,
+            max_wait: float = 30,
+            key: str = 'rpc-rate-limit'
+    ) -> None:
+        super().__init__(rate, burst, max_wait)
+
+        self._redis = redis.Redis.from_url(url)
+        self._key = key
+
+        self._reserve_script = self._redis.register_script(self.RESERVE_SCRIPT)
+
+    def _reserve(self, weight: float, max_wait: float) -> float:
+        return float(self._reserve_script(keys=[self._key], args=[self.rate, self.burst, weight, max_wait]))
+
+
+class RateLimitedProvider(WrappingProvider):
+    """
+    Takes the weight of every request (`weights`, METHOD_WEIGHTS by default) from `limiter` before
+    passing it on to `provider`. Batches take the weights of all their calls at once, batches
+    heavier than the burst of the limiter are sent in parts which fit into it.
+
+    Without `wait` requests fail with RateLimitExceededException instead of waiting for quota.
+    The time requests were held back is summed up in `throttled_seconds`, and recorded in the
+    `rpc_throttled_seconds` histogram of `metrics`.
+    """
+
+    def __init__(
+            self,
+            provider: BaseProvider,
+            limiter: RateLimiter,
+            weights: Union[None, Mapping[str, float]] = None,
+            wait: bool = True,
+            metrics: Union[None, Metrics] = None
+    ) -> None:
+        super().__init__(provider)
+        self.limiter = limiter
+        self.weights = weights if weights is not None else METHOD_WEIGHTS
+        self.wait = wait
+        self.metrics = metrics
+
+        self._lock = threading.Lock()
+        self.throttled_seconds = 0.0
+        self.throttled_requests = 0
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        self._acquire(method, self.weights.get(method, 1))
+        return super().make_request(method, params)
+
+    def send_batch(self, payload: List[dict]) -> List[dict]:
+        responses = []
+
+        for chunk, weight in self._chunks(payload):
+            self._acquire('batch', weight)
+
+            chunk_responses = super().send_batch(chunk)
+            if not isinstance(chunk_responses, list):
+                # the node rejected the batch as a whole
+                return chunk_responses
+            responses.extend(chunk_responses)
+
+        return responses
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {'throttled_seconds': self.throttled_seconds, 'throttled_requests': self.throttled_requests}
+
+    def _chunks(self, payload: List[dict]) -> Iterator[Tuple[List[dict], float]]:
+        chunk, chunk_weight = [], 0
+        for request in payload:
+            weight = self.weights.get(request['method'], 1)
+
+            if chunk and chunk_weight + weight > self.limiter.burst:
+                yield chunk, chunk_weight
+                chunk, chunk_weight = [], 0
+
+            chunk.append(request)
+            chunk_weight += weight
+
+        if chunk:
+            yield chunk, chunk_weight
+
+    def _acquire(self, method: str, weight: float) -> None:
+        delay = self.limiter.acquire(weight, wait=self.wait)
+
+        if self.metrics is not None:
+            self.metrics.observe('rpc_throttled_seconds', method, delay)
+
+        if delay > 0:
+            logging.debug(f"{method} was throttled for {delay:.3f}s")
+            with self._lock:
+                self.throttled_seconds += delay
+                self.throttled_requests += 1
@@ -0,0 +1,196 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+from typing import Dict, Iterable, NoReturn, Union
+
+import websockets
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+from web3.providers import WebsocketProvider
+from web3.types import TxReceipt
+
+from .batch import make_batch_request
+
+__all__ = [
+    'ReceiptResolver',
+    'fetch_receipts'
+]
+
+
+def fetch_receipts(w3: Web3, tx_hashes: Iterable[str]) -> Dict[str, Union[None, TxReceipt]]:
+    """Receipts of many transactions in one batched round trip, None for the ones not mined yet."""
+    tx_hashes = [HexBytes(tx_hash).hex() for tx_hash in tx_hashes]
+    results = make_batch_request(w3, [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes])
+
+    receipts = {}
+    for tx_hash, result in zip(tx_hashes, results):
+        if isinstance(result, Exception):
+            logging.warning(f"Receipt request failed: {tx_hash}: {result}")
+            result = None
+        receipts[tx_hash] = result
+
+    return receipts
+
+
+class ReceiptResolver:
+    """
+    Resolves receipts of all outstanding transactions once per new block.
+
+    New block headers come from an `eth_subscribe('newHeads')` subscription on the
+    websocket endpoint of the provider (web3's WebsocketProvider pairs every send with
+    one recv, so notifications need a socket of their own). Other providers fall back
+    to polling the block number every `poll_interval` seconds. Receipts of all
+    outstanding hashes are then fetched with one batched request.
+
+    Receipts are fetched on `w3` from the resolver's thread, so `w3` must not share a
+    websocket with other threads (WebsocketProvider has no lock around its send/recv pairs).
+    A stopped resolver starts a new thread on the next watch().
+    """
+
+    def __init__(
+            self,
+            w3: Web3,
+            subscription_uri: Union[None, str] = None,
+            poll_interval: float = 2.0,
+            reconnect_delay: float = 5.0
+    ) -> None:
+        if subscription_uri is None and isinstance(w3.provider, WebsocketProvider):
+            subscription_uri = w3.provider.endpoint_uri
+
+        self._w3 = w3
+        self._subscription_uri = subscription_uri
+        self._poll_interval = poll_interval
+        self._reconnect_delay = reconnect_delay
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._stopped = threading.Event()
+        self._thread: Union[None, threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def watch(self, tx_hash: Union[str, bytes]) -> concurrent.futures.Future:
+        tx_hash = HexBytes(tx_hash).hex()
+
+        with self._lock:
+            future = self._pending.get(tx_hash)
+            if future is None:
+                future = self._pending[tx_hash] = concurrent.futures.Future()
+
+            if self._thread is None:
+                self._stopped = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._stopped,), name='receipt-resolver', daemon=True
+                )
+                self._thread.start()
+
+        return future
+
+    def wait(self, tx_hash: Union[str, bytes], timeout: float) -> TxReceipt:
+        future = self.watch(tx_hash)
+
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            self.forget(tx_hash)
+
+            raise TimeExhausted(
+                f"Transaction {HexBytes(tx_hash).hex()} is not in the chain after {timeout} seconds"
+            )
+
+    def forget(self, tx_hash: Union[str, bytes]) -> NoReturn:
+        with self._lock:
+            self._pending.pop(HexBytes(tx_hash).hex(), None)
+
+    def resolve_pending(self) -> int:
+        with self._lock:
+            tx_hashes = list(self._pending)
+
+        if not tx_hashes:
+            return 0
+
+        resolved = 0
+        for tx_hash, receipt in fetch_receipts(self._w3, tx_hashes).items():
+            if receipt is None:
+                continue
+
+            with self._lock:
+                future = self._pending.pop(tx_hash, None)
+
+            if future is not None:
+                future.set_result(receipt)
+                resolved += 1
+
+        logging.info(f"Resolved {resolved} of {len(tx_hashes)} pending receipts")
+
+        return resolved
+
+    def stop(self) -> NoReturn:
+        with self._lock:
+            self._stopped.set()
+            self._thread = None
+
+    def _run(self, stopped: threading.Event) -> NoReturn:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            loop.run_until_complete(self._follow_blocks(stopped))
+        finally:
+            loop.close()
+
+    async def _follow_blocks(self, stopped: threading.Event) -> NoReturn:
+        while not stopped.is_set():
+            try:
+                if self._subscription_uri is not None:
+                    await self._subscribe(stopped)
+                else:
+                    await self._poll(stopped)
+            except Exception as e:
+                logging.warning(f"Receipt resolver lost the block feed, reconnecting: {e}")
+                await asyncio.sleep(self._reconnect_delay)
+
+    async def _on_block(self) -> NoReturn:
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, self.resolve_pending)
+        except Exception as e:
+            logging.warning(f"Receipt resolution failed: {e}")
+
+    async def _subscribe(self, stopped: threading.Event) -> NoReturn:
+        async with websockets.connect(self._subscription_uri) as ws:
+            await ws.send(json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': 'eth_subscribe', 'params': ['newHeads']}))
+
+            response = json.loads(await ws.recv())
+            if 'error' in response:
+                raise ValueError(response['error'])
+
+            logging.info(f"Receipt resolver subscribed to new heads: {response['result']}")
+
+            # anything mined before the subscription existed
+            await self._on_block()
+
+            while not stopped.is_set():
+                try:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), timeout=self._poll_interval))
+                except asyncio.TimeoutError:
+                    continue
+
+                if message.get('method') == 'eth_subscription':
+                    await self._on_block()
+
+    async def _poll(self, stopped: threading.Event) -> NoReturn:
+        loop = asyncio.get_event_loop()
+        last_block = None
+
+        while not stopped.is_set():
+            block = await loop.run_in_executor(None, lambda: self._w3.eth.blockNumber)
+
+            if block != last_block:
+                last_block = block
+                await self._on_block()
+
+            await asyncio.sleep(self._poll_interval)
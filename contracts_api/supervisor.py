@@ -0,0 +1,159 @@
+import concurrent.futures
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, List, NoReturn, Tuple, Union
+
+from eth_account.signers.local import LocalAccount
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+from web3.types import TxReceipt
+
+from .nonce import is_nonce_error, is_underpriced_error
+from .receipts import fetch_receipts
+
+if TYPE_CHECKING:
+    from .receipts import ReceiptResolver
+
+__all__ = [
+    'TrackedTransaction',
+    'TransactionSupervisor'
+]
+
+
+class TrackedTransaction:
+    """A broadcast transaction and the hashes of all its same-nonce replacements."""
+
+    def __init__(self, transaction: Dict, tx_hash: str) -> None:
+        self.transaction = transaction
+        self.tx_hashes: List[str] = [tx_hash]
+        self.submitted_at = time.monotonic()
+
+    def replaced(self, transaction: Dict, tx_hash: str) -> NoReturn:
+        self.transaction = transaction
+        self.tx_hashes.append(tx_hash)
+        self.submitted_at = time.monotonic()
+
+
+class TransactionSupervisor:
+    """
+    Waits for transactions and re-signs the ones pending longer than `stuck_after` seconds
+    with the same nonce and a gas price raised by `bump_factor` (nodes require at least 10%),
+    up to `max_gas_price`. All replacement hashes are watched until one of them is mined.
+    A replacement the node rejects as underpriced is bumped again.
+    """
+
+    def __init__(
+            self,
+            w3: Web3,
+            account: LocalAccount,
+            stuck_after: float = 180,
+            bump_factor: float = 1.125,
+            max_gas_price: int = Web3.toWei(200, 'gwei'),
+            poll_interval: float = 1,
+            receipt_resolver: Union[None, 'ReceiptResolver'] = None
+    ) -> None:
+        self._w3 = w3
+        self._account = account
+        self._stuck_after = stuck_after
+        self._bump_factor = bump_factor
+        self._max_gas_price = max_gas_price
+        self._poll_interval = poll_interval
+        self._receipt_resolver = receipt_resolver
+
+    def bumped(self, transaction: Dict) -> Union[None, Dict]:
+        gas_price = transaction['gasPrice']
+        if gas_price >= self._max_gas_price:
+            return None
+
+        return {
+            **transaction,
+            'gasPrice': min(self._max_gas_price, max(int(gas_price * self._bump_factor), gas_price + 1))
+        }
+
+    def replace(self, transaction: Dict) -> Union[None, Tuple[Dict, str]]:
+        """Re-sign and broadcast the transaction at a higher gas price, None when it can't be replaced."""
+        bumped = transaction
+        while True:
+            bumped = self.bumped(bumped)
+            if bumped is None:
+                logging.warning(f"Transaction with nonce {transaction['nonce']} is stuck at the maximal gas price")
+                return None
+
+            signed = self._account.signTransaction(bumped)
+
+            try:
+                tx_hash = self._w3.eth.sendRawTransaction(signed.rawTransaction).hex()
+                break
+            except ValueError as e:
+                if is_underpriced_error(e):
+                    # the node wants a bigger raise, the transactions sent so far are still pending
+                    logging.info(f"Replacement with nonce {transaction['nonce']} is underpriced, bumping again: {e}")
+                    continue
+                if is_nonce_error(e):
+                    # one of the earlier versions was mined in the meantime
+                    logging.info(f"Transaction with nonce {transaction['nonce']} can't be replaced anymore: {e}")
+                    return None
+                raise
+
+        logging.info(
+            f"Replaced stuck transaction with nonce {transaction['nonce']}: {tx_hash}, gas price {bumped['gasPrice']}"
+        )
+
+        return bumped, tx_hash
+
+    def wait(self, tracked: TrackedTransaction, timeout: float) -> TxReceipt:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            now = time.monotonic()
+            wait_seconds = max(0.0, min(deadline, tracked.submitted_at + self._stuck_after) - now)
+
+            receipt = self._next_receipt(tracked.tx_hashes, wait_seconds)
+            if receipt is not None:
+                return receipt
+
+            now = time.monotonic()
+            if now >= deadline:
+                self._forget(tracked.tx_hashes)
+                raise TimeExhausted(
+                    f"Transactions {', '.join(tracked.tx_hashes)} are not in the chain after {timeout} seconds"
+                )
+
+            if now - tracked.submitted_at >= self._stuck_after:
+                replacement = self.replace(tracked.transaction)
+                if replacement is not None:
+                    tracked.replaced(*replacement)
+                else:
+                    tracked.submitted_at = now
+
+    def _forget(self, tx_hashes: List[str]) -> NoReturn:
+        if self._receipt_resolver is not None:
+            for tx_hash in tx_hashes:
+                self._receipt_resolver.forget(tx_hash)
+
+    def _next_receipt(self, tx_hashes: List[str], wait_seconds: float) -> Union[None, TxReceipt]:
+        if self._receipt_resolver is not None:
+            futures = [self._receipt_resolver.watch(tx_hash) for tx_hash in tx_hashes]
+            done, _ = concurrent.futures.wait(
+                futures,
+                timeout=wait_seconds,
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+
+            if not done:
+                return None
+
+            self._forget(tx_hashes)
+            return next(iter(done)).result()
+
+        deadline = time.monotonic() + wait_seconds
+
+        while True:
+            for receipt in fetch_receipts(self._w3, tx_hashes).values():
+                if receipt is not None:
+                    return receipt
+
+            if time.monotonic() >= deadline:
+                return None
+
+            time.sleep(min(self._poll_interval, max(0.0, deadline - time.monotonic())))
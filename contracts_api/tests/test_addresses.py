@@ -0,0 +1,31 @@
+import importlib.util
+from unittest import TestCase, skipUnless
+
+from web3 import Web3
+
+from ..addresses import create_address
+from ..contract_wrapper import ContractWrapper
+from ..providers import get_test_chain
+
+
+class CreateAddressTests(TestCase):
+    def test_known_addresses(self):
+        deployer = '0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0'
+
+        self.assertEqual(create_address(deployer, 0), '0xcd234A471b72ba2F1Ccf0A70FCABA648a5eeCD8d')
+        self.assertEqual(create_address(deployer, 1), '0x343c43A37D37dfF08AE8C4A11544c718AbB4fCF8')
+
+
+@skipUnless(importlib.util.find_spec('eth_tester'), 'eth-tester is not installed')
+class PrecomputedEscrowAddressTests(TestCase):
+    def test_address_is_known_at_broadcast(self):
+        chain = get_test_chain()
+        wrapper = ContractWrapper('key', chain.private_keys[0], w3=Web3(chain.provider))
+        broadcast = []
+
+        result = wrapper.create(chain.accounts[1], chain.accounts[2], 1000, '7', wait=False,
+                                on_broadcast=broadcast.append)
+        receipt = chain.w3.eth.waitForTransactionReceipt(result['tx_hash'])
+
+        self.assertEqual(result['contract_address'], receipt['contractAddress'])
+        self.assertEqual([entry['contract_address'] for entry in broadcast], [receipt['contractAddress']])
@@ -0,0 +1,211 @@
+import asyncio
+import json
+from unittest import TestCase
+from unittest.mock import patch
+
+from eth_abi import encode_single
+from hexbytes import HexBytes
+from web3 import Web3
+
+from ..aio import AsyncContractWrapper, AsyncRPCClient
+from ..batch import BatchRequestException
+from ..exceptions import TransactionSimulationException
+from ..nonce import LocalNonceManager
+
+PRIVATE_KEY = 'a3d3eb24d66c13a91f085e8431526540c243f88d147613a24edb05110d732a6a'
+FIRST = '0xE4EAB7DAa6582307118DD8b415a385A763A45eFA'
+SECOND = '0xAC4Ec8a1d878923388395381BDA9FC2E7760b6c0'
+
+
+class FakeWebsocket:
+    """Answers every request in reverse order of arrival, once `batch_size` of them were sent."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.sent = []
+        self.messages = asyncio.Queue()
+
+    async def send(self, message):
+        self.sent.append(json.loads(message))
+
+        if len(self.sent) == self.batch_size:
+            for request in reversed(self.sent):
+                if isinstance(request, list):
+                    response = [{'jsonrpc': '2.0', 'id': item['id'], 'result': hex(item['id'])} for item in request]
+                else:
+                    response = {'jsonrpc': '2.0', 'id': request['id'], 'result': hex(request['id'])}
+                await self.messages.put(json.dumps(response))
+
+    async def close(self):
+        await self.messages.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.messages.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+class AsyncRPCClientTests(TestCase):
+    def test_concurrent_requests_share_one_connection(self):
+        async def run():
+            ws = FakeWebsocket(batch_size=3)
+
+            async def connect(*args, **kwargs):
+                return ws
+
+            with patch('contracts_api.aio.websockets.connect', side_effect=connect) as websockets_connect:
+                async with AsyncRPCClient('ws://node') as client:
+                    results = await asyncio.gather(
+                        client.request('eth_blockNumber', []),
+                        client.request('eth_blockNumber', []),
+                        client.batch([('eth_chainId', []), ('eth_gasPrice', [])]),
+                    )
+
+            websockets_connect.assert_called_once()
+            return results
+
+        self.assertEqual(asyncio.run(run()), [1, 2, [3, 4]])
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+        self.batches = []
+
+    async def request(self, method, params):
+        self.requests.append((method, params))
+        response = self.responses[method]
+        if isinstance(response, Exception):
+            raise response
+        return response(params) if callable(response) else response
+
+    async def batch(self, calls):
+        self.batches.append(calls)
+        return self.responses['batch'](calls)
+
+    async def subscribe(self, event, callback):
+        return '0x1'
+
+    async def unsubscribe(self, subscription_id):
+        pass
+
+    async def close(self):
+        pass
+
+
+class AsyncContractWrapperTests(TestCase):
+    def wrapper(self, wrapper_kwargs=None, **responses):
+        self.client = FakeClient(responses)
+        return AsyncContractWrapper('key', PRIVATE_KEY, client=self.client, **(wrapper_kwargs or {}))
+
+    def transaction_responses(self, receipts):
+        return dict(
+            eth_call=HexBytes(b''),
+            eth_estimateGas=50000,
+            eth_blockNumber=0,
+            eth_gasPrice=Web3.toWei(10, 'gwei'),
+            eth_chainId=3,
+            eth_getTransactionCount=7,
+            eth_sendRawTransaction=lambda params: Web3.keccak(hexstr=params[0]),
+            batch=lambda calls: [{'transactions': []}] if calls[0][0] == 'eth_getBlockByNumber' else receipts(calls),
+        )
+
+    def test_call(self):
+        wrapper = self.wrapper(eth_call=HexBytes(encode_single('uint8', 2)))
+
+        self.assertEqual(asyncio.run(wrapper.call(FIRST, 'state')), 2)
+        self.assertEqual(self.client.requests[0][1][0]['to'], FIRST)
+
+    def test_reverting_transaction_is_not_sent(self):
+        wrapper = self.wrapper(eth_call=ValueError({'message': 'execution reverted'}))
+
+        with self.assertRaises(TransactionSimulationException):
+            asyncio.run(wrapper.send(FIRST))
+
+        self.assertEqual([method for method, _ in self.client.requests], ['eth_call'])
+
+    def test_concurrent_transactions(self):
+        def receipts(calls):
+            # the nonces are allocated in executor threads, only answer once both transactions are waited for
+            if len(calls) < 2:
+                return [None] * len(calls)
+            return [{'transactionHash': HexBytes(params[0]), 'status': 1} for _, params in calls]
+
+        wrapper = self.wrapper(**self.transaction_responses(receipts))
+        wrapper.NEW_BLOCK_TIMEOUT = 0.01
+
+        async def run():
+            return await asyncio.gather(wrapper.send(FIRST), wrapper.confirm(SECOND))
+
+        first, second = asyncio.run(run())
+
+        self.assertEqual({first['transaction']['nonce'], second['transaction']['nonce']}, {7, 8})
+        self.assertEqual(first['receipt']['status'], 1)
+        # both receipts are fetched with one batch
+        self.assertEqual(len(self.client.batches[-1]), 2)
+
+    def test_failed_receipt_request_is_retried(self):
+        results = iter([[BatchRequestException('busy')], [{'status': 1}]])
+        wrapper = self.wrapper(batch=lambda calls: next(results))
+        wrapper.NEW_BLOCK_TIMEOUT = 0
+
+        receipt = asyncio.run(wrapper.wait_for_receipt('0x01', timeout=5))
+
+        self.assertEqual(receipt, {'status': 1})
+
+    def test_nonces_come_from_the_shared_manager(self):
+        nonce_manager = LocalNonceManager()
+        nonce_manager.seed(Web3().eth.account.from_key(PRIVATE_KEY).address, 12)
+        wrapper = self.wrapper({'nonce_manager': nonce_manager}, **self.transaction_responses(lambda calls: []))
+
+        result = asyncio.run(wrapper.send(FIRST, wait=False))
+
+        self.assertEqual(result['transaction']['nonce'], 12)
+        self.assertNotIn('eth_getTransactionCount', [method for method, _ in self.client.requests])
+
+    def test_underpriced_replacement_is_bumped_again(self):
+        sent = []
+
+        def send_raw_transaction(params):
+            sent.append(params[0])
+            if len(sent) == 1:
+                raise ValueError({'message': 'replacement transaction underpriced'})
+            return Web3.keccak(hexstr=params[0])
+
+        responses = self.transaction_responses(lambda calls: [])
+        responses['eth_sendRawTransaction'] = send_raw_transaction
+        wrapper = self.wrapper({'max_gas_price': Web3.toWei(12, 'gwei')}, **responses)
+        transaction = {'to': FIRST, 'value': 0, 'data': '0x', 'gas': 50000, 'chainId': 3, 'nonce': 7,
+                       'gasPrice': Web3.toWei(10, 'gwei')}
+
+        bumped, tx_hash = asyncio.run(wrapper.replace_transaction(transaction))
+
+        self.assertEqual(bumped['gasPrice'], Web3.toWei(12, 'gwei'))
+        self.assertEqual(tx_hash, Web3.keccak(hexstr=sent[-1]).hex())
+        self.assertEqual(len(sent), 2)
+
+    def test_stuck_transaction_is_replaced(self):
+        sent = []
+
+        def receipts(calls):
+            # only the replacement is mined
+            return [{'status': 1} if len(sent) > 1 and params[0] == sent[-1] else None for _, params in calls]
+
+        def send_raw_transaction(params):
+            sent.append(Web3.keccak(hexstr=params[0]).hex())
+            return sent[-1]
+
+        responses = self.transaction_responses(receipts)
+        responses['eth_sendRawTransaction'] = send_raw_transaction
+        wrapper = self.wrapper({'stuck_after': 0.05}, **responses)
+        wrapper.NEW_BLOCK_TIMEOUT = 0.01
+
+        result = asyncio.run(wrapper.send(FIRST))
+
+        self.assertEqual(result['receipt'], {'status': 1})
+        self.assertEqual(len(sent), 2)
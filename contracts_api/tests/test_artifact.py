@@ -0,0 +1,51 @@
+import hashlib
+import json
+import pathlib
+import tempfile
+from unittest import TestCase
+
+from ..artifact import CONTRACT_PATH, CONTRACTS_DIR, build_artifact, load_contract_data
+
+
+class ArtifactTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.source = pathlib.Path(directory.name) / 'Contract.json'
+        self.target = pathlib.Path(directory.name) / 'Contract.slim.json'
+        self.source.write_bytes(CONTRACT_PATH.read_bytes())
+
+    def test_build_keeps_only_abi_and_bytecode(self):
+        build_artifact(self.source, self.target)
+
+        with open(self.target) as input_file:
+            artifact = json.load(input_file)
+
+        self.assertEqual(set(artifact), {'source_sha256', 'abi', 'bytecode'})
+        self.assertLess(self.target.stat().st_size, self.source.stat().st_size)
+
+    def test_load_is_memoized(self):
+        self.assertIs(load_contract_data(self.source, self.target), load_contract_data(self.source, self.target))
+
+    def test_stale_artifact_is_rebuilt(self):
+        build_artifact(self.source, self.target)
+        self.target.write_text(self.target.read_text().replace('"source_sha256":"', '"source_sha256":"0'))
+
+        artifact = load_contract_data(self.source, self.target)
+
+        source_sha256 = hashlib.sha256(self.source.read_bytes()).hexdigest()
+        self.assertEqual(artifact['source_sha256'], source_sha256)
+        with open(self.target) as input_file:
+            self.assertEqual(json.load(input_file)['source_sha256'], source_sha256)
+
+    def test_artifact_of_another_source_is_reported(self):
+        contract_data = json.loads(self.source.read_text())
+        self.source.write_text(json.dumps({**contract_data, 'source': (CONTRACTS_DIR / 'Escrow.sol').read_text()}))
+        build_artifact(self.source, self.target)
+
+        self.source.write_text(json.dumps({**contract_data, 'source': 'contract Escrow {}'}))
+        with self.assertLogs(level='WARNING') as logs:
+            build_artifact(self.source, self.target)
+
+        self.assertIn('run truffle compile', logs.output[0])
@@ -0,0 +1,118 @@
+import importlib.util
+import time
+from unittest import TestCase, skipUnless
+
+from web3 import Web3
+from web3.providers import BaseProvider
+
+from ..balancer import LoadBalancedProvider, NoHealthyEndpointException
+from ..contract_wrapper import ContractWrapper
+from ..providers import get_test_chain
+
+
+class FakeNode(BaseProvider):
+    """Stand-in node answering eth_blockNumber with its `block`, after `delay` seconds."""
+
+    def __init__(self, block, delay=0.0, down=False, rate_limited=False):
+        self.block = block
+        self.delay = delay
+        self.down = down
+        self.rate_limited = rate_limited
+        self.requests = []
+
+    def make_request(self, method, params):
+        self.requests.append(method)
+        time.sleep(self.delay)
+
+        if self.down:
+            raise ConnectionError(f'node {self.block} is down')
+        if self.rate_limited:
+            return {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32005, 'message': 'daily request count exceeded'}}
+        if method == 'eth_call':
+            return {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32000, 'message': 'execution reverted'}}
+        if method == 'eth_sendRawTransaction':
+            return {'jsonrpc': '2.0', 'id': 0, 'result': '0x' + '00' * 31 + hex(self.block)[2:].zfill(2)}
+
+        return {'jsonrpc': '2.0', 'id': 0, 'result': hex(self.block)}
+
+
+class LoadBalancedProviderTests(TestCase):
+    def test_reads_go_to_the_fastest_endpoint(self):
+        slow, fast = FakeNode(1, delay=0.02), FakeNode(2)
+        w3 = Web3(LoadBalancedProvider([slow, fast]))
+
+        # the first requests measure both endpoints
+        w3.eth.blockNumber
+        slow.down = True
+        w3.eth.blockNumber
+        slow.down = False
+
+        self.assertEqual([w3.eth.blockNumber for _ in range(5)], [2] * 5)
+
+    def test_broadcasts_go_to_the_primary(self):
+        primary, secondary = FakeNode(1, delay=0.02), FakeNode(2)
+        provider = LoadBalancedProvider([primary, secondary])
+
+        for _ in range(3):
+            provider.make_request('eth_blockNumber', [])
+        provider.make_request('eth_sendRawTransaction', ['0x01'])
+
+        self.assertEqual(primary.requests[-1], 'eth_sendRawTransaction')
+        self.assertNotIn('eth_sendRawTransaction', secondary.requests)
+
+    def test_failover_when_the_primary_is_down(self):
+        primary, secondary = FakeNode(1, down=True), FakeNode(2)
+        w3 = Web3(LoadBalancedProvider([primary, secondary]))
+
+        self.assertEqual(w3.eth.sendRawTransaction('0x01').hex(), '0x' + '00' * 31 + '02')
+
+    def test_rate_limited_endpoint_is_skipped(self):
+        w3 = Web3(LoadBalancedProvider([FakeNode(1, rate_limited=True), FakeNode(2)]))
+
+        self.assertEqual(w3.eth.blockNumber, 2)
+
+    def test_request_errors_are_not_retried(self):
+        first, second = FakeNode(1), FakeNode(2)
+        w3 = Web3(LoadBalancedProvider([first, second]))
+
+        with self.assertRaises(ValueError):
+            w3.eth.call({'to': '0x' + '1' * 40})
+
+        self.assertEqual(first.requests + second.requests, ['eth_call'])
+
+    def test_circuit_breaker(self):
+        flaky, healthy = FakeNode(1, down=True), FakeNode(2, delay=0.01)
+        provider = LoadBalancedProvider([flaky, healthy], failure_threshold=2, reset_after=60)
+        w3 = Web3(provider)
+
+        for _ in range(2):
+            w3.eth.getTransactionCount('0x' + '1' * 40)
+        self.assertEqual(provider.stats()[0]['state'], 'open')
+
+        flaky.down = False
+        w3.eth.getTransactionCount('0x' + '1' * 40)
+        self.assertEqual(len(flaky.requests), 2)
+
+        # after reset_after one trial request closes the breaker again
+        provider.endpoints[0].reset_after = 0
+        self.assertEqual(w3.eth.getTransactionCount('0x' + '1' * 40), 1)
+        self.assertEqual(provider.stats()[0]['state'], 'closed')
+
+    def test_all_endpoints_down(self):
+        provider = LoadBalancedProvider([FakeNode(1, down=True), FakeNode(2, down=True)], failure_threshold=1)
+
+        for _ in range(2):
+            with self.assertRaises(NoHealthyEndpointException):
+                provider.make_request('eth_blockNumber', [])
+
+
+@skipUnless(importlib.util.find_spec('eth_tester'), 'eth-tester is not installed')
+class TestChainFailoverTests(TestCase):
+    def test_wrapper_transactions_fail_over(self):
+        chain = get_test_chain()
+        address = chain.deploy_escrow(chain.accounts[0], chain.accounts[1], chain.accounts[2], 1000)
+        w3 = Web3(LoadBalancedProvider([FakeNode(1, down=True), chain.provider]))
+
+        result = ContractWrapper('key', chain.private_keys[1], w3=w3).send(address)
+
+        self.assertEqual(result['receipt']['status'], 1)
@@ -0,0 +1,88 @@
+import importlib.util
+import itertools
+import os
+import tempfile
+from unittest import TestCase, skipUnless
+
+from web3 import Web3
+from web3.providers import BaseProvider
+
+from ..batch import make_batch_request
+from ..cassette import CassetteMissException, RecordingProvider, ReplayProvider
+from ..contract_wrapper import ContractWrapper
+from ..providers import get_test_chain
+
+
+class FakeNode(BaseProvider):
+    """Answers eth_blockNumber with an increasing block number, batches included."""
+
+    supports_batch = True
+
+    def __init__(self):
+        self.request_counter = itertools.count()
+        self.blocks = itertools.count(100)
+        self.requests = 0
+
+    def make_request(self, method, params):
+        self.requests += 1
+        return {'jsonrpc': '2.0', 'id': 0, 'result': hex(next(self.blocks))}
+
+    def send_batch(self, payload):
+        self.requests += 1
+        return [{'jsonrpc': '2.0', 'id': request['id'], 'result': hex(next(self.blocks))} for request in payload]
+
+
+class CassetteTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cassette.jsonl')
+
+    def record(self, provider):
+        recording = RecordingProvider(provider, self.path)
+        self.addCleanup(recording.close)
+        return Web3(recording)
+
+
+class CassetteTests(CassetteTestCase):
+    def test_replays_repeated_requests_in_order(self):
+        w3 = self.record(FakeNode())
+        recorded = [w3.eth.blockNumber for _ in range(3)]
+
+        replay = Web3(ReplayProvider(self.path))
+
+        self.assertEqual([replay.eth.blockNumber for _ in range(3)], recorded)
+        # the last response is repeated once all were replayed
+        self.assertEqual(replay.eth.blockNumber, recorded[-1])
+
+    def test_replays_batches(self):
+        node = FakeNode()
+        w3 = self.record(node)
+        recorded = make_batch_request(w3, [('eth_blockNumber', [])] * 2)
+
+        replay = Web3(ReplayProvider(self.path))
+
+        self.assertEqual(make_batch_request(replay, [('eth_blockNumber', [])] * 2), recorded)
+        self.assertEqual(node.requests, 1)
+
+    def test_unrecorded_request(self):
+        self.record(FakeNode()).eth.blockNumber
+
+        with self.assertRaises(CassetteMissException):
+            Web3(ReplayProvider(self.path)).eth.chainId
+
+
+@skipUnless(importlib.util.find_spec('eth_tester'), 'eth-tester is not installed')
+class TestChainCassetteTests(CassetteTestCase):
+    def wrapper(self, w3):
+        return ContractWrapper('key', get_test_chain().private_keys[0], w3=w3)
+
+    def test_replays_wrapper_calls(self):
+        chain = get_test_chain()
+        w3 = self.record(chain.provider)
+
+        recorded = self.wrapper(w3).call(chain.escrow_address, 'seller')
+
+        replay = Web3(ReplayProvider(self.path))
+
+        self.assertEqual(self.wrapper(replay).call(chain.escrow_address, 'seller'), recorded)
@@ -0,0 +1,85 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from eth_abi import encode_single
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+
+from ..contract_wrapper import ContractWrapper, EscrowSnapshot, FunctionNotFoundException
+from ..exceptions import TransactionSimulationException
+from ..batch import BatchRequestException
+
+PRIVATE_KEY = 'a3d3eb24d66c13a91f085e8431526540c243f88d147613a24edb05110d732a6a'
+FIRST = '0xE4EAB7DAa6582307118DD8b415a385A763A45eFA'
+SECOND = '0xAC4Ec8a1d878923388395381BDA9FC2E7760b6c0'
+SELLER = '0x046db58752d0076CFE0B38ca0eBa1fb9Df53a0f7'
+
+
+class ReadManyTests(TestCase):
+    def setUp(self):
+        self.wrapper = ContractWrapper('key', PRIVATE_KEY, w3=Web3())
+
+    def test_reads_all_contracts_in_one_batch(self):
+        def batch(w3, calls):
+            self.assertEqual(len(calls), 4)
+            return [
+                encode_single('uint8', 1),
+                encode_single('address', SELLER),
+                BatchRequestException('execution reverted'),
+                encode_single('address', SELLER),
+            ]
+
+        with patch('contracts_api.contract_wrapper.make_batch_request', side_effect=batch) as make_batch_request:
+            snapshots = self.wrapper.read_many([FIRST, SECOND.lower()], ['state', 'seller'])
+
+        make_batch_request.assert_called_once()
+        self.assertEqual(snapshots, {
+            FIRST: EscrowSnapshot(state=1, seller=SELLER),
+            SECOND: EscrowSnapshot(seller=SELLER),
+        })
+
+    def test_unknown_function(self):
+        with self.assertRaises(FunctionNotFoundException):
+            self.wrapper.read_many([FIRST], ['withdraw'])
+
+
+class ContractCacheTests(TestCase):
+    def test_contracts_are_cached_per_address(self):
+        wrapper = ContractWrapper('key', PRIVATE_KEY, w3=Web3(), contract_cache_size=1)
+
+        contract = wrapper.get_contract(FIRST)
+        self.assertIs(wrapper.get_contract(FIRST), contract)
+        self.assertEqual(contract.address, FIRST)
+
+        wrapper.get_contract(SECOND)
+        self.assertIsNot(wrapper.get_contract(FIRST), contract)
+
+    def test_function_check_uses_abi_index(self):
+        wrapper = ContractWrapper('key', PRIVATE_KEY, w3=Web3())
+
+        self.assertTrue(wrapper._function_check('confirmReceived'))
+        self.assertFalse(wrapper._function_check('Sent'))
+
+
+class PreflightTests(TestCase):
+    def setUp(self):
+        self.wrapper = ContractWrapper('key', PRIVATE_KEY, w3=Web3())
+        self.eth = self.wrapper._w3.eth
+
+    def test_reverting_transaction_is_not_signed(self):
+        with patch.object(self.eth, 'call', side_effect=ContractLogicError('execution reverted')), \
+                patch.object(self.eth, 'sendRawTransaction') as send_raw_transaction:
+            with self.assertRaises(TransactionSimulationException) as context:
+                self.wrapper.build(FIRST, 'refund')
+
+        self.assertEqual(context.exception.function_name, 'refund')
+        self.assertEqual(context.exception.reason, 'execution reverted')
+        send_raw_transaction.assert_not_called()
+
+    def test_simulation_is_called_from_the_signer(self):
+        with patch.object(self.eth, 'call', return_value=b'') as call:
+            result = self.wrapper.send(FIRST, dry_run=True)
+
+        self.assertEqual(call.call_args[0][0]['from'], self.wrapper._account.address)
+        self.assertEqual(result['tx_hash'], None)
+        self.assertEqual(result['result'], [])
@@ -0,0 +1,48 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+
+from ..artifact import load_contract_data
+from ..events import EscrowEvent, EscrowEventScanner
+
+ADDRESS = '0xE4EAB7DAa6582307118DD8b415a385A763A45eFA'
+
+
+def log(event, block_number):
+    return {
+        'address': ADDRESS,
+        'topics': [event_abi_to_log_topic(event)],
+        'data': '0x',
+        'blockNumber': block_number,
+        'logIndex': 0,
+        'transactionHash': '0x01',
+    }
+
+
+def event_abi(name):
+    return next(entry for entry in load_contract_data()['abi'] if entry.get('name') == name)
+
+
+class EscrowEventScannerTests(TestCase):
+    def test_events_in_chain_order(self):
+        w3 = Web3()
+
+        with patch.object(w3.eth, 'getLogs', return_value=[log(event_abi('ItemReceived'), 3),
+                                                           log(event_abi('Sent'), 2)]):
+            events = EscrowEventScanner(w3, load_contract_data()['abi']).scan([ADDRESS.lower()], 1, 3)
+
+        self.assertEqual(events, [
+            EscrowEvent(ADDRESS, 'Sent', 2, 0, '0x01'),
+            EscrowEvent(ADDRESS, 'ItemReceived', 3, 0, '0x01'),
+        ])
+
+    def test_default_abi_is_the_escrow_artifact(self):
+        w3 = Web3()
+
+        with patch.object(w3.eth, 'getLogs', return_value=[log(event_abi('ItemNotOk'), 2)]) as get_logs:
+            events = EscrowEventScanner(w3).scan([ADDRESS], 1, 3)
+
+        self.assertEqual(len(get_logs.call_args[0][0]['topics'][0]), 5)
+        self.assertEqual(events, [EscrowEvent(ADDRESS, 'ItemNotOk', 2, 0, '0x01')])
@@ -0,0 +1,79 @@
+import importlib.util
+from unittest import TestCase, skipUnless
+
+from web3 import Web3
+
+from ..contract_wrapper import ContractWrapper
+from ..fieldcache import LocalEscrowFieldCache
+from ..metrics import InstrumentedProvider, Metrics
+from ..providers import get_test_chain
+
+ADDRESS = '0xE4EAB7DAa6582307118DD8b415a385A763A45eFA'
+
+
+class LocalEscrowFieldCacheTests(TestCase):
+    def test_fields_by_block(self):
+        cache = LocalEscrowFieldCache()
+        cache.set(ADDRESS.lower(), {'seller': ADDRESS, 'value': 1000})
+        cache.set(ADDRESS, {'state': 1}, block=10)
+
+        self.assertEqual(cache.get(ADDRESS, ('seller', 'value', 'item')), {'seller': ADDRESS, 'value': 1000})
+        self.assertEqual(cache.get(ADDRESS, ('state',), block=10), {'state': 1})
+        self.assertEqual(cache.get(ADDRESS, ('state',), block=11), {})
+
+    def test_bounded_size(self):
+        cache = LocalEscrowFieldCache(max_size=1)
+        cache.set(ADDRESS, {'value': 1})
+        cache.set(ADDRESS, {'state': 1}, block=10)
+
+        self.assertEqual(cache.get(ADDRESS, ('value',)), {})
+
+
+@skipUnless(importlib.util.find_spec('eth_tester'), 'eth-tester is not installed')
+class WrapperFieldCacheTests(TestCase):
+    def setUp(self):
+        self.chain = get_test_chain()
+        self.metrics = Metrics()
+        self.cache = LocalEscrowFieldCache()
+
+    def wrapper(self, key_index):
+        w3 = Web3(InstrumentedProvider(self.chain.provider, self.metrics))
+        return ContractWrapper('key', self.chain.private_keys[key_index], w3=w3, field_cache=self.cache)
+
+    def eth_calls(self):
+        return self.metrics.snapshot()['rpc_requests_total'].get('eth_call', 0)
+
+    def test_created_escrow_fields_are_cached(self):
+        buyer = self.wrapper(0)
+        address = buyer.create(self.chain.accounts[1], self.chain.accounts[2], 1000, '7')['receipt']['contractAddress']
+        calls = self.eth_calls()
+
+        self.assertEqual(buyer.call(address, 'seller'), self.chain.accounts[1])
+        self.assertEqual(buyer.call(address, 'item'), '7')
+        self.assertEqual(self.eth_calls(), calls)
+
+    def test_immutable_fields_are_read_once(self):
+        address = self.chain.deploy_escrow(self.chain.accounts[0], self.chain.accounts[1], self.chain.accounts[2], 1000)
+        wrapper = self.wrapper(0)
+
+        reward = wrapper.call(address, 'reward')
+        self.assertEqual(wrapper.call(address, 'reward'), reward)
+        wrapper.call(address, 'state')
+        wrapper.call(address, 'state')
+
+        self.assertEqual(self.eth_calls(), 3)
+
+    def test_read_many_caches_mutable_fields_per_block(self):
+        address = self.chain.deploy_escrow(self.chain.accounts[0], self.chain.accounts[1], self.chain.accounts[2], 1000)
+        wrapper = self.wrapper(1)
+
+        first = wrapper.read_many([address], ('state', 'seller'))[address]
+        self.assertEqual(wrapper.read_many([address], ('state', 'seller'))[address], first)
+
+        wrapper.send(address)
+        after_send = wrapper.read_many([address], ('state', 'seller'))[address]
+
+        self.assertEqual((first.state, after_send.state), (0, 1))
+        self.assertEqual(after_send.seller, self.chain.accounts[1])
+        # seller once, state once per block, and the simulation of sent()
+        self.assertEqual(self.metrics.snapshot()['rpc_requests_total']['eth_call'], 4)
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from web3 import Web3
+
+from ..contract_wrapper import ContractWrapper
+from ..gas import GasEstimationException, GasEstimator, GasPriceOracle
+
+PRIVATE_KEY = 'a3d3eb24d66c13a91f085e8431526540c243f88d147613a24edb05110d732a6a'
+ADDRESS = '0xE4EAB7DAa6582307118DD8b415a385A763A45eFA'
+
+
+class GasPriceOracleTests(TestCase):
+    def setUp(self):
+        self.w3 = MagicMock()
+        self.w3.eth.blockNumber = 100
+        self.w3.manager.request_blocking.side_effect = lambda method, params: {
+            'transactions': [{'gasPrice': Web3.toWei(price, 'gwei')} for price in range(1, 11)]
+        }
+
+    def test_tiers(self):
+        oracle = GasPriceOracle(self.w3, sample_blocks=3)
+
+        self.assertEqual(oracle.prices(), {
+            'slow': Web3.toWei(4, 'gwei'),
+            'standard': Web3.toWei(7, 'gwei'),
+            'fast': Web3.toWei(10, 'gwei'),
+        })
+        self.assertEqual(self.w3.manager.request_blocking.call_count, 3)
+
+    def test_prices_are_cached(self):
+        oracle = GasPriceOracle(self.w3, ttl=60, sample_blocks=3)
+        oracle.price('fast')
+        oracle.price('slow')
+
+        self.assertEqual(self.w3.manager.request_blocking.call_count, 3)
+
+    def test_unknown_tier(self):
+        with self.assertRaises(ValueError):
+            GasPriceOracle(self.w3).price('instant')
+
+
+class GasEstimatorTests(TestCase):
+    def setUp(self):
+        self.contract = ContractWrapper('key', PRIVATE_KEY, w3=Web3()).get_contract(ADDRESS)
+        self.estimator = GasEstimator(margin=1.5)
+
+    def function(self, description, gas=40000):
+        function = self.contract.functions.problem(description)
+        function.estimateGas = MagicMock(return_value=gas)
+        return function
+
+    def test_estimates_are_cached_by_argument_shape(self):
+        self.assertEqual(self.estimator.estimate(self.function('broken'), {}), 60000)
+
+        same_shape = self.function('damaged', gas=1)
+        self.assertEqual(self.estimator.estimate(same_shape, {}), 60000)
+        same_shape.estimateGas.assert_not_called()
+
+        longer = self.function('x' * 40, gas=50000)
+        self.assertEqual(self.estimator.estimate(longer, {}), 75000)
+
+    def test_failed_estimation(self):
+        function = self.function('broken')
+        function.estimateGas.side_effect = ValueError('execution reverted')
+
+        with self.assertRaises(GasEstimationException):
+            self.estimator.estimate(function, {})
@@ -0,0 +1,119 @@
+import importlib.util
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, skipUnless
+
+from web3 import Web3
+from web3.providers import BaseProvider
+
+from ..batch import make_batch_request
+from ..metrics import InstrumentedProvider, Metrics, transaction_function
+from ..pool import ContractWrapperPool
+from ..providers import get_test_chain
+
+
+class FakeNode(BaseProvider):
+    supports_batch = True
+
+    def __init__(self):
+        self.request_counter = itertools.count()
+
+    def make_request(self, method, params):
+        if method == 'eth_chainId':
+            return {'jsonrpc': '2.0', 'id': 0, 'error': {'code': -32601, 'message': 'not supported'}}
+        return {'jsonrpc': '2.0', 'id': 0, 'result': '0x1'}
+
+    def send_batch(self, payload):
+        return [{'jsonrpc': '2.0', 'id': request['id'], 'result': '0x1'} for request in payload]
+
+
+class InstrumentedProviderTests(TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.w3 = Web3(InstrumentedProvider(FakeNode(), self.metrics))
+
+    def test_counts_and_times_requests(self):
+        self.w3.eth.blockNumber
+        self.w3.eth.blockNumber
+        with self.assertRaises(ValueError):
+            self.w3.eth.chainId
+
+        snapshot = self.metrics.snapshot()
+
+        self.assertEqual(snapshot['rpc_requests_total'], {'eth_blockNumber': 2, 'eth_chainId': 1})
+        self.assertEqual(snapshot['rpc_errors_total'], {'eth_chainId': 1})
+        self.assertEqual(snapshot['rpc_request_seconds']['eth_blockNumber']['count'], 2)
+
+    def test_batched_calls_are_counted_per_method(self):
+        make_batch_request(self.w3, [('eth_getBalance', ['0x' + '1' * 40, 'latest'])] * 3)
+
+        snapshot = self.metrics.snapshot()
+
+        self.assertEqual(snapshot['rpc_requests_total'], {'eth_getBalance': 3})
+        self.assertEqual(snapshot['rpc_request_seconds']['batch']['count'], 1)
+
+    def test_render(self):
+        self.w3.eth.blockNumber
+
+        text = self.metrics.render()
+
+        self.assertIn('contracts_api_rpc_requests_total{method="eth_blockNumber"} 1.0', text)
+        self.assertIn('contracts_api_rpc_request_seconds_bucket{le="+Inf",method="eth_blockNumber"} 1.0', text)
+        self.assertIn('# TYPE contracts_api_transaction_gas_used histogram', text)
+
+
+class MultiprocessMetricsTests(TestCase):
+    def test_values_of_exited_processes_are_kept(self):
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': metrics_dir}
+
+            def run(code):
+                return subprocess.run(
+                    [sys.executable, '-c', 'from contracts_api.metrics import *\n' + code],
+                    env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True
+                ).stdout
+
+            # two recycled pool processes
+            for _ in range(2):
+                run("Metrics().increment('rpc_requests_total', 'eth_call')")
+
+            text = run(
+                "from prometheus_client import CollectorRegistry, generate_latest, multiprocess\n"
+                "registry = CollectorRegistry()\n"
+                "multiprocess.MultiProcessCollector(registry)\n"
+                "print(generate_latest(registry).decode())"
+            )
+
+        self.assertIn('contracts_api_rpc_requests_total{method="eth_call"} 2.0', text)
+
+
+class TransactionFunctionTests(TestCase):
+    def test_function_of_transaction(self):
+        contract = Web3().eth.contract(abi=[{
+            'type': 'function', 'name': 'sent', 'inputs': [], 'outputs': [], 'stateMutability': 'nonpayable'
+        }])
+        data = contract.encodeABI('sent')
+
+        self.assertEqual(transaction_function({'to': '0x' + '1' * 40, 'data': data}), 'sent')
+        self.assertEqual(transaction_function({'data': '0x6080'}), 'constructor')
+
+
+@skipUnless(importlib.util.find_spec('eth_tester'), 'eth-tester is not installed')
+class WrapperMetricsTests(TestCase):
+    def test_transactions_are_measured(self):
+        chain = get_test_chain()
+        address = chain.deploy_escrow(chain.accounts[0], chain.accounts[1], chain.accounts[2], 1000)
+        metrics = Metrics()
+        pool = ContractWrapperPool('key', provider_backend='tester', metrics=metrics)
+
+        pool.get(chain.private_keys[1]).send(address)
+
+        snapshot = metrics.snapshot()
+
+        self.assertEqual(snapshot['transaction_sign_seconds']['sent']['count'], 1)
+        self.assertEqual(snapshot['transaction_confirmation_seconds']['sent']['count'], 1)
+        self.assertGreater(snapshot['transaction_gas_used']['sent']['sum'], 21000)
+        self.assertEqual(snapshot['rpc_requests_total']['eth_sendRawTransaction'], 1)
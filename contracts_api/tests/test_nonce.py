@@ -0,0 +1,46 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from ..nonce import LocalNonceManager, is_nonce_error, is_underpriced_error
+
+ADDRESS = '0x046db58752d0076CFE0B38ca0eBa1fb9Df53a0f7'
+
+
+class LocalNonceManagerTests(TestCase):
+    def setUp(self):
+        self.w3 = MagicMock()
+        self.w3.eth.getTransactionCount.return_value = 5
+        self.manager = LocalNonceManager()
+
+    def test_allocates_sequentially_after_one_chain_read(self):
+        nonces = [self.manager.allocate(self.w3, ADDRESS) for _ in range(3)]
+
+        self.assertEqual(nonces, [5, 6, 7])
+        self.w3.eth.getTransactionCount.assert_called_once_with(ADDRESS, 'pending')
+
+    def test_release_of_last_nonce_rewinds(self):
+        nonce = self.manager.allocate(self.w3, ADDRESS)
+        self.manager.release(ADDRESS, nonce)
+
+        self.assertEqual(self.manager.allocate(self.w3, ADDRESS), nonce)
+
+    def test_released_gap_is_reused_first(self):
+        first = self.manager.allocate(self.w3, ADDRESS)
+        self.manager.allocate(self.w3, ADDRESS)
+        self.manager.release(ADDRESS, first)
+
+        self.assertEqual(self.manager.allocate(self.w3, ADDRESS), first)
+        self.assertEqual(self.manager.allocate(self.w3, ADDRESS), 7)
+
+    def test_resync(self):
+        self.manager.allocate(self.w3, ADDRESS)
+        self.w3.eth.getTransactionCount.return_value = 9
+        self.manager.resync(self.w3, ADDRESS)
+
+        self.assertEqual(self.manager.allocate(self.w3, ADDRESS), 9)
+
+    def test_nonce_errors(self):
+        self.assertTrue(is_nonce_error(ValueError({'code': -32000, 'message': 'nonce too low'})))
+        self.assertFalse(is_nonce_error(ValueError({'code': -32000, 'message': 'insufficient funds'})))
+        self.assertTrue(is_underpriced_error(ValueError({'code': -32000, 'message': 'transaction underpriced'})))
+        self.assertFalse(is_underpriced_error(ValueError({'code': -32000, 'message': 'nonce too low'})))
@@ -0,0 +1,73 @@
+import importlib.util
+from unittest import TestCase, skipUnless
+from unittest.mock import patch, MagicMock
+
+from ..contract_wrapper import W3ProviderNotConnectedException
+from ..pool import ContractWrapperPool
+from ..providers import get_test_chain
+
+
+class ContractWrapperPoolTests(TestCase):
+    def setUp(self):
+        patcher = patch('contracts_api.pool.connect', side_effect=lambda *args, **kwargs: MagicMock())
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_shares_connection_between_signers(self):
+        pool = ContractWrapperPool('key')
+        first = pool.get('a' * 64)
+        second = pool.get('b' * 64)
+
+        self.assertIs(pool.get('a' * 64), first)
+        self.assertIs(first._w3, second._w3)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_bounded_size(self):
+        pool = ContractWrapperPool('key', max_size=2)
+        first = pool.get('a' * 64)
+        pool.get('b' * 64)
+        pool.get('c' * 64)
+
+        self.assertEqual(len(pool), 2)
+        self.assertIsNot(pool.get('a' * 64), first)
+
+    def test_reconnect_on_failed_health_check(self):
+        pool = ContractWrapperPool('key', health_check_interval=0)
+        first = pool.get('a' * 64)
+        first._w3.isConnected.return_value = False
+
+        second = pool.get('a' * 64)
+
+        self.assertIsNot(first._w3, second._w3)
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_gives_up_after_reconnect_attempts(self):
+        self.connect.side_effect = lambda *args, **kwargs: MagicMock(isConnected=MagicMock(return_value=False))
+        pool = ContractWrapperPool('key', reconnect_attempts=2)
+
+        with self.assertRaises(W3ProviderNotConnectedException):
+            pool.get('a' * 64)
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_receipt_resolver_has_its_own_websocket(self):
+        pool = ContractWrapperPool('key', resolve_receipts_by_block=True)
+        wrapper = pool.get('a' * 64)
+
+        self.assertEqual(self.connect.call_count, 2)
+        self.assertIsNot(pool._receipt_resolver._w3, wrapper._w3)
+
+
+@skipUnless(importlib.util.find_spec('eth_tester'), 'eth-tester is not installed')
+class TesterProviderTests(TestCase):
+    def test_wrappers_run_on_the_test_chain(self):
+        chain = get_test_chain()
+        address = chain.deploy_escrow(chain.accounts[0], chain.accounts[1], chain.accounts[2], 1000)
+        pool = ContractWrapperPool('key', provider_backend='tester')
+
+        seller = pool.get(chain.private_keys[1])
+        self.assertEqual(seller.call(address, 'state'), 0)
+
+        result = seller.send(address)
+
+        self.assertEqual(result['receipt']['status'], 1)
+        self.assertEqual(seller.call(address, 'state'), 1)
@@ -0,0 +1,88 @@
+import itertools
+from unittest import TestCase
+
+from web3 import Web3
+from web3.providers import BaseProvider
+
+from ..batch import make_batch_request
+from ..metrics import Metrics
+from ..ratelimit import LocalRateLimiter, RateLimitExceededException, RateLimitedProvider
+
+
+class FakeNode(BaseProvider):
+    supports_batch = True
+
+    def __init__(self):
+        self.request_counter = itertools.count()
+        self.batches = []
+
+    def make_request(self, method, params):
+        return {'jsonrpc': '2.0', 'id': 0, 'result': '0x1'}
+
+    def send_batch(self, payload):
+        self.batches.append(payload)
+        return [{'jsonrpc': '2.0', 'id': request['id'], 'result': '0x1'} for request in payload]
+
+
+class LocalRateLimiterTests(TestCase):
+    def test_burst_then_waits_for_refill(self):
+        limiter = LocalRateLimiter(rate=100, burst=2)
+
+        self.assertEqual([limiter.acquire(), limiter.acquire()], [0, 0])
+        self.assertGreater(limiter.acquire(), 0)
+
+    def test_fail_fast(self):
+        limiter = LocalRateLimiter(rate=1, burst=1)
+        limiter.acquire()
+
+        with self.assertRaises(RateLimitExceededException):
+            limiter.acquire(wait=False)
+
+    def test_wait_is_bounded(self):
+        limiter = LocalRateLimiter(rate=1, burst=3, max_wait=0.5)
+        limiter.acquire(weight=2)
+
+        with self.assertRaises(RateLimitExceededException):
+            limiter.acquire(weight=3)
+
+        # the failed request took no quota
+        self.assertEqual(limiter.acquire(), 0)
+
+    def test_request_heavier_than_burst_takes_the_bucket(self):
+        limiter = LocalRateLimiter(rate=10, burst=10, max_wait=1)
+
+        self.assertEqual(limiter.acquire(weight=500), 0)
+        self.assertLess(limiter.acquire(weight=500), 1.1)
+
+
+class RateLimitedProviderTests(TestCase):
+    def test_weights_and_throttling_are_reported(self):
+        metrics = Metrics()
+        provider = RateLimitedProvider(FakeNode(), LocalRateLimiter(rate=200, burst=3),
+                                       weights={'eth_getLogs': 3}, metrics=metrics)
+        w3 = Web3(provider)
+
+        w3.eth.blockNumber
+        provider.make_request('eth_getLogs', [{}])
+
+        self.assertEqual(provider.stats()['throttled_requests'], 1)
+        self.assertGreater(provider.stats()['throttled_seconds'], 0)
+        self.assertEqual(metrics.snapshot()['rpc_throttled_seconds']['eth_getLogs']['count'], 1)
+
+    def test_batches_take_the_weight_of_all_calls(self):
+        limiter = LocalRateLimiter(rate=1, burst=3)
+        w3 = Web3(RateLimitedProvider(FakeNode(), limiter, wait=False))
+
+        self.assertEqual(len(make_batch_request(w3, [('eth_blockNumber', [])] * 3)), 3)
+
+        with self.assertRaises(RateLimitExceededException):
+            make_batch_request(w3, [('eth_blockNumber', [])])
+
+    def test_batches_heavier_than_burst_are_split(self):
+        node = FakeNode()
+        w3 = Web3(RateLimitedProvider(node, LocalRateLimiter(rate=1000, burst=4), weights={'eth_gasPrice': 3}))
+
+        results = make_batch_request(w3, [('eth_blockNumber', [])] * 5 + [('eth_gasPrice', [])] * 2)
+
+        self.assertEqual(len(results), 7)
+        self.assertEqual([len(batch) for batch in node.batches], [4, 2, 1])
@@ -0,0 +1,78 @@
+import json
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+
+from ..batch import BatchRequestException, make_batch_request
+from ..receipts import ReceiptResolver
+
+TX_HASH = '0x' + '11' * 32
+OTHER_TX_HASH = '0x' + '22' * 32
+
+
+class BatchRequestTests(TestCase):
+    def test_responses_are_matched_by_id(self):
+        w3 = Web3(Web3.HTTPProvider('http://127.0.0.1:8545'))
+
+        def post(endpoint_uri, data, **kwargs):
+            first, second = json.loads(data)
+            return json.dumps([
+                {'jsonrpc': '2.0', 'id': second['id'], 'error': {'code': -32000, 'message': 'failed'}},
+                {'jsonrpc': '2.0', 'id': first['id'], 'result': '0x10'},
+            ]).encode()
+
+        with patch('contracts_api.batch.make_post_request', side_effect=post) as make_post_request:
+            block, error = make_batch_request(w3, [('eth_blockNumber', []), ('eth_gasPrice', [])])
+
+        make_post_request.assert_called_once()
+        self.assertEqual(block, 16)
+        self.assertIsInstance(error, BatchRequestException)
+
+
+class ReceiptResolverTests(TestCase):
+    def setUp(self):
+        self.receipts = {}
+        self.w3 = MagicMock()
+        self.w3.eth.blockNumber = 1
+        self.w3.manager.request_blocking.side_effect = lambda method, params: self.receipts.get(params[0])
+
+    def test_resolves_all_pending_in_one_pass(self):
+        resolver = ReceiptResolver(self.w3, poll_interval=0.01)
+        resolver._thread = MagicMock()  # resolve by hand, without the block feed
+        first = resolver.watch(TX_HASH)
+        second = resolver.watch(OTHER_TX_HASH)
+
+        self.receipts[TX_HASH] = {'status': 1}
+        self.assertEqual(resolver.resolve_pending(), 1)
+
+        self.assertEqual(first.result(0), {'status': 1})
+        self.assertFalse(second.done())
+        self.assertEqual(len(resolver), 1)
+
+    def test_wait_is_resolved_by_new_block(self):
+        resolver = ReceiptResolver(self.w3, poll_interval=0.01)
+        self.addCleanup(resolver.stop)
+        self.receipts[TX_HASH] = {'status': 1}
+
+        self.assertEqual(resolver.wait(TX_HASH, timeout=5), {'status': 1})
+
+    def test_wait_timeout(self):
+        resolver = ReceiptResolver(self.w3, poll_interval=0.01)
+        self.addCleanup(resolver.stop)
+
+        with self.assertRaises(TimeExhausted):
+            resolver.wait(TX_HASH, timeout=0.05)
+        self.assertEqual(len(resolver), 0)
+
+    def test_restarts_after_stop(self):
+        resolver = ReceiptResolver(self.w3, poll_interval=0.01)
+        self.addCleanup(resolver.stop)
+        self.receipts[TX_HASH] = {'status': 1}
+        resolver.wait(TX_HASH, timeout=5)
+
+        resolver.stop()
+        self.receipts[OTHER_TX_HASH] = {'status': 1}
+
+        self.assertEqual(resolver.wait(OTHER_TX_HASH, timeout=5), {'status': 1})
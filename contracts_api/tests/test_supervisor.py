@@ -0,0 +1,72 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+
+from ..supervisor import TrackedTransaction, TransactionSupervisor
+
+TRANSACTION = {'from': '0xE4EAB7DAa6582307118DD8b415a385A763A45eFA', 'nonce': 7, 'gasPrice': Web3.toWei(10, 'gwei')}
+
+
+class TransactionSupervisorTests(TestCase):
+    def setUp(self):
+        self.w3 = MagicMock()
+        self.w3.eth.sendRawTransaction.return_value = HexBytes('0x02')
+        self.account = MagicMock()
+        self.supervisor = TransactionSupervisor(
+            self.w3, self.account, stuck_after=0, max_gas_price=Web3.toWei(12, 'gwei'), poll_interval=0
+        )
+
+    def test_bump_is_capped(self):
+        self.assertEqual(self.supervisor.bumped(TRANSACTION)['gasPrice'], Web3.toWei(11.25, 'gwei'))
+        self.assertEqual(
+            self.supervisor.bumped({**TRANSACTION, 'gasPrice': Web3.toWei(11.5, 'gwei')})['gasPrice'],
+            Web3.toWei(12, 'gwei')
+        )
+        self.assertIsNone(self.supervisor.bumped({**TRANSACTION, 'gasPrice': Web3.toWei(12, 'gwei')}))
+
+    def test_replacement_keeps_nonce(self):
+        transaction, tx_hash = self.supervisor.replace(TRANSACTION)
+
+        self.assertEqual(tx_hash, '0x02')
+        self.assertEqual(transaction['nonce'], 7)
+        self.account.signTransaction.assert_called_once_with(transaction)
+
+    def test_mined_transaction_is_not_replaced(self):
+        self.w3.eth.sendRawTransaction.side_effect = ValueError({'message': 'nonce too low'})
+
+        self.assertIsNone(self.supervisor.replace(TRANSACTION))
+
+    def test_underpriced_replacement_is_bumped_again(self):
+        self.w3.eth.sendRawTransaction.side_effect = [
+            ValueError({'message': 'replacement transaction underpriced'}), HexBytes('0x03')
+        ]
+
+        transaction, tx_hash = self.supervisor.replace(TRANSACTION)
+
+        self.assertEqual(tx_hash, '0x03')
+        self.assertEqual(transaction['gasPrice'], Web3.toWei(12, 'gwei'))
+
+    def test_underpriced_replacement_stops_at_maximal_gas_price(self):
+        self.w3.eth.sendRawTransaction.side_effect = ValueError({'message': 'replacement transaction underpriced'})
+
+        self.assertIsNone(self.supervisor.replace(TRANSACTION))
+        self.assertEqual(self.w3.eth.sendRawTransaction.call_count, 2)
+
+    def test_wait_returns_receipt_of_replacement(self):
+        receipts = iter([{'0x01': None}, {'0x01': None, '0x02': {'status': 1}}])
+
+        with patch('contracts_api.supervisor.fetch_receipts', side_effect=lambda w3, hashes: next(receipts)):
+            receipt = self.supervisor.wait(TrackedTransaction(TRANSACTION, '0x01'), timeout=10)
+
+        self.assertEqual(receipt, {'status': 1})
+        self.assertEqual(self.w3.eth.sendRawTransaction.call_count, 1)
+
+    def test_wait_times_out(self):
+        with patch('contracts_api.supervisor.fetch_receipts', return_value={'0x01': None}):
+            with self.assertRaises(TimeExhausted):
+                TransactionSupervisor(self.w3, self.account, poll_interval=0).wait(
+                    TrackedTransaction(TRANSACTION, '0x01'), timeout=0
+                )
@@ -158,8 +158,100 @@ LOGOUT_URL = 'account/logout/'
 
 INFURA_KEY = os.getenv('INFURA_KEY')
 
+# Chain provider of the contract wrappers: websocket, http (keep-alive session), ipc, tester (in-process
+# eth-tester chain with the Escrow contract deployed) or replay (recorded cassette).
+# Without a CONTRACT_PROVIDER_URI Infura's Ropsten is used. Several comma separated uris are load balanced:
+# reads go to the fastest healthy endpoint, transactions to the first one with the others as fallback.
+CONTRACT_PROVIDER = os.getenv('CONTRACT_PROVIDER', 'websocket')
+CONTRACT_PROVIDER_URI = os.getenv('CONTRACT_PROVIDER_URI') or None
+# Record all JSON-RPC requests of the workers to this JSONL cassette, replay it with
+# CONTRACT_PROVIDER=replay and CONTRACT_PROVIDER_URI=<cassette>
+RPC_RECORD_CASSETTE = os.getenv('RPC_RECORD_CASSETTE') or None
+
+# Count and time JSON-RPC requests and contract transactions of the workers. With a CONTRACT_METRICS_PORT
+# every worker node serves the metrics of all its processes to Prometheus on that port, the processes keep
+# them in the PROMETHEUS_MULTIPROC_DIR directory (environment variable, one empty directory per node).
+CONTRACT_METRICS = env.bool('CONTRACT_METRICS', default=False)
+CONTRACT_METRICS_PORT = int(os.getenv('CONTRACT_METRICS_PORT', 0)) or None
+
+# RPC quota of all workers and web processes together, in requests per second (weighted, see
+# contracts_api.METHOD_WEIGHTS) with bursts of up to RPC_RATE_LIMIT_BURST; 0 disables the limit.
+# Requests wait up to RPC_RATE_LIMIT_MAX_WAIT seconds for quota, or fail right away without RPC_RATE_LIMIT_WAIT.
+# The bucket is kept in redis at RPC_RATE_LIMIT_REDIS_URL (in-process if empty).
+RPC_RATE_LIMIT = float(os.getenv('RPC_RATE_LIMIT', 0))
+RPC_RATE_LIMIT_BURST = float(os.getenv('RPC_RATE_LIMIT_BURST', 0)) or None
+RPC_RATE_LIMIT_WAIT = env.bool('RPC_RATE_LIMIT_WAIT', default=True)
+RPC_RATE_LIMIT_MAX_WAIT = float(os.getenv('RPC_RATE_LIMIT_MAX_WAIT', 30))
+RPC_RATE_LIMIT_REDIS_URL = os.getenv('RPC_RATE_LIMIT_REDIS_URL', 'redis://redis:6379/1')
+
+# Escrow view function values are cached in redis (in-process if empty): constructor set fields for good,
+# state and problem_description per block for ESCROW_FIELD_CACHE_BLOCK_TTL seconds
+ESCROW_FIELD_CACHE_REDIS_URL = os.getenv('ESCROW_FIELD_CACHE_REDIS_URL', 'redis://redis:6379/2')
+ESCROW_FIELD_CACHE_BLOCK_TTL = int(os.getenv('ESCROW_FIELD_CACHE_BLOCK_TTL', 300))
+
+# Per worker process pool of contract wrappers sharing one provider connection
+CONTRACT_WRAPPER_POOL_SIZE = int(os.getenv('CONTRACT_WRAPPER_POOL_SIZE', 32))
+CONTRACT_WRAPPER_HEALTH_CHECK_INTERVAL = int(os.getenv('CONTRACT_WRAPPER_HEALTH_CHECK_INTERVAL', 30))
+CONTRACT_WRAPPER_TIMEOUT = int(os.getenv('CONTRACT_WRAPPER_TIMEOUT', 600))
+# Wait for receipts through one new block subscription per worker instead of polling each transaction
+RESOLVE_RECEIPTS_BY_BLOCK = env.bool('RESOLVE_RECEIPTS_BY_BLOCK', default=False)
+
+# Gas price tier (slow, standard, fast) of contract transactions, sampled prices are cached for GAS_PRICE_TTL seconds
+CONTRACT_GAS_TIER = os.getenv('CONTRACT_GAS_TIER', 'standard')
+GAS_PRICE_TTL = int(os.getenv('GAS_PRICE_TTL', 30))
+GAS_LIMIT_MARGIN = float(os.getenv('GAS_LIMIT_MARGIN', 1.2))
+
+# Transactions pending longer than STUCK_TRANSACTION_AFTER seconds are re-sent with a higher gas price (in gwei)
+STUCK_TRANSACTION_AFTER = int(os.getenv('STUCK_TRANSACTION_AFTER', 180))
+MAX_GAS_PRICE = int(os.getenv('MAX_GAS_PRICE', 200))
+
+# Views simulate contract transactions (eth_call from the signer) before queueing them, this adds an
+# eth_call round trip to the node to the response time of every transition request
+CONTRACT_PREFLIGHT_IN_VIEWS = env.bool('CONTRACT_PREFLIGHT_IN_VIEWS', default=False)
+
+# Nonces of signing addresses are allocated from redis, shared by all workers (in-process if empty)
+NONCE_REDIS_URL = os.getenv('NONCE_REDIS_URL', 'redis://redis:6379/1')
+
+# Return from contract tasks as soon as the transaction is broadcast, receipts are
+# picked up by the periodic catalogue.tasks.confirm_pending_transactions task
+ASYNC_TX_CONFIRMATION = env.bool('ASYNC_TX_CONFIRMATION', default=False)
+PENDING_TRANSACTIONS_CHECK_INTERVAL = int(os.getenv('PENDING_TRANSACTIONS_CHECK_INTERVAL', 15))
+
 CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+
+# Queues: 'priority' for transitions users wait for, 'transitions' for batched transitions and receipt checks,
+# 'deploy' for escrow deployments and 'email'. Each queue is consumed by a worker node of its own (see
+# WORKER_QUEUE_CONCURRENCY), so the priority lane is never stuck behind batches, deployments or emails.
+CELERY_TASK_DEFAULT_QUEUE = 'transitions'
+CELERY_TASK_ROUTES = {
+    'catalogue.tasks.send_product': {'queue': 'priority'},
+    'catalogue.tasks.receive_product': {'queue': 'priority'},
+    'catalogue.tasks.problem': {'queue': 'priority'},
+    'catalogue.tasks.refund': {'queue': 'priority'},
+    'catalogue.tasks.no_refund': {'queue': 'priority'},
+    'catalogue.tasks.transition_products': {'queue': 'transitions'},
+    'catalogue.tasks.confirm_pending_transactions': {'queue': 'transitions'},
+    'catalogue.tasks.submit_new_smart_contract': {'queue': 'deploy'},
+    'accounts.tasks.send_confirmation_email': {'queue': 'email'},
+}
+
+# Worker concurrency per queue, `python -m smartcontract.worker deploy` runs a worker of the deploy queue,
+# a worker of several queues runs one node per queue, each with the concurrency of its queue
+WORKER_QUEUE_CONCURRENCY = {
+    'priority': int(os.getenv('PRIORITY_QUEUE_CONCURRENCY', 4)),
+    'transitions': int(os.getenv('TRANSITIONS_QUEUE_CONCURRENCY', 2)),
+    'deploy': int(os.getenv('DEPLOY_QUEUE_CONCURRENCY', 2)),
+    'email': int(os.getenv('EMAIL_QUEUE_CONCURRENCY', 1)),
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'confirm-pending-transactions': {
+        'task': 'catalogue.tasks.confirm_pending_transactions',
+        'schedule': PENDING_TRANSACTIONS_CHECK_INTERVAL,
+        'options': {'expires': PENDING_TRANSACTIONS_CHECK_INTERVAL},
+    },
+}
@@ -0,0 +1,105 @@
+"""
+Celery worker nodes of a subset of the task queues, one node per queue with its concurrency
+from WORKER_QUEUE_CONCURRENCY:
+
+    python -m smartcontract.worker deploy
+    python -m smartcontract.worker priority transitions email [--loglevel debug ...]
+
+Without queues a node is started for each of them. Other options are passed on to every
+`celery worker`. Several nodes run as child processes which are stopped together: when one
+of them exits, or on SIGTERM / SIGINT. Each of them serves its metrics on its own port,
+CONTRACT_METRICS_PORT + the position of its queue, from a subdirectory of PROMETHEUS_MULTIPROC_DIR.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Sequence
+
+from django.conf import settings
+
+from smartcontract.celery import app
+
+
+def worker_argv(queue: str, options: Sequence[str] = ()) -> List[str]:
+    """`celery worker` arguments of the node consuming `queue`."""
+    if queue not in settings.WORKER_QUEUE_CONCURRENCY:
+        raise ValueError(f"Unknown queue: {queue}")
+
+    return [
+        'worker',
+        '--loglevel', 'info',
+        '--queues', queue,
+        '--concurrency', str(settings.WORKER_QUEUE_CONCURRENCY[queue]),
+        '--hostname', f'{queue}@%h',
+        *options
+    ]
+
+
+def node_environ(queue: str, index: int) -> Dict[str, str]:
+    """Environment of the node of `queue`, nodes started together don't share their metrics."""
+    environ = dict(os.environ)
+
+    if environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(environ['PROMETHEUS_MULTIPROC_DIR'], queue)
+    if settings.CONTRACT_METRICS_PORT:
+        environ['CONTRACT_METRICS_PORT'] = str(settings.CONTRACT_METRICS_PORT + index)
+
+    return environ
+
+
+def run_worker_nodes(queues: Sequence[str], options: Sequence[str] = ()) -> int:
+    """Run a worker node per queue until one of them exits, returns its exit code."""
+    argvs = [worker_argv(queue, options) for queue in queues]
+
+    nodes = [
+        subprocess.Popen(
+            [sys.executable, '-m', 'celery', '-A', 'smartcontract', *argv],
+            env=node_environ(queue, index)
+        )
+        for index, (queue, argv) in enumerate(zip(queues, argvs))
+    ]
+
+    def stop(signum, frame=None):
+        for node in nodes:
+            if node.poll() is None:
+                node.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while all(node.poll() is None for node in nodes):
+        time.sleep(1)
+
+    exited = next(node for node in nodes if node.returncode is not None)
+
+    stop(signal.SIGTERM)
+    for node in nodes:
+        node.wait()
+
+    return exited.returncode
+
+
+def main(argv: Sequence[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('queues', nargs='*', metavar='queue',
+                        help=f"queues to consume: {', '.join(settings.WORKER_QUEUE_CONCURRENCY)}")
+    args, options = parser.parse_known_args(argv)
+
+    queues = args.queues or list(settings.WORKER_QUEUE_CONCURRENCY)
+
+    try:
+        argvs = [worker_argv(queue, options) for queue in queues]
+    except ValueError as e:
+        parser.error(str(e))
+
+    if len(queues) == 1:
+        app.worker_main(argvs[0])
+    else:
+        sys.exit(run_worker_nodes(queues, options))
+
+
+if __name__ == '__main__':
+    main()